@@ -0,0 +1,266 @@
+"""
+Admission control and load shedding.
+
+Every costly route belongs to an admission class with its own concurrency
+cap and waiting-queue depth. A request that cannot start right away waits
+in its class queue, highest priority first. It is turned away early with a
+503 and Retry-After when:
+
+  - the queue is full and nothing of lower priority can be evicted, or
+  - the estimated wait (requests ahead / concurrency x observed service time)
+    already exceeds the client's deadline.
+
+Such a request would only time out on the client after we had paid for its
+extraction. Service time per class is an exponentially weighted average of
+completed requests, seeded with a per-class guess.
+
+Clients send their deadline as X-Request-Timeout (seconds, see deadline.py)
+and their priority as X-Priority (high, normal, low; default normal). Batch requests
+always run at low priority. Routes not listed here (health checks, job
+polling) are never queued.
+
+    ADMISSION                         on (default) or off
+    ADMISSION_<CLASS>_CONCURRENCY     override a class cap, e.g. ADMISSION_VISION_CONCURRENCY=6
+    ADMISSION_<CLASS>_QUEUE           override a class queue depth
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from .deadline import remaining, request_timeout
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# Weight of the newest observation in the service-time average
+_EWMA_WEIGHT = 0.2
+
+
+@dataclass
+class AdmissionClass:
+    name: str
+    routes: Tuple[str, ...]         # regexes over "METHOD /path"
+    concurrency: int
+    queue: int
+    service_seconds: float          # initial service-time estimate
+    default_deadline: float         # assumed client patience when no header is sent
+    priority: Optional[str] = None  # forced priority for every request of the class
+    patterns: List[Pattern] = field(default_factory=list, repr=False)
+
+    def __post_init__(self):
+        prefix = f"ADMISSION_{self.name.upper()}_"
+        self.concurrency = max(1, int(os.getenv(prefix + "CONCURRENCY", str(self.concurrency))))
+        self.queue = max(0, int(os.getenv(prefix + "QUEUE", str(self.queue))))
+        self.patterns = [re.compile(route) for route in self.routes]
+
+    def matches(self, method: str, path: str) -> bool:
+        target = f"{method} {path.rstrip('/') or '/'}"
+        return any(pattern.fullmatch(target) for pattern in self.patterns)
+
+
+# First match wins, so the /json variants come before the upload routes
+CLASSES = [
+    AdmissionClass(
+        name="batch",
+        routes=(r"POST /api/batch/[^/]+",),
+        concurrency=1, queue=2, service_seconds=600.0, default_deadline=3600.0, priority="low",
+    ),
+    AdmissionClass(
+        name="json_analysis",
+        routes=(r"POST /api/(rating|contract_analyze|lease_analyze)/json",),
+        concurrency=8, queue=32, service_seconds=20.0, default_deadline=120.0,
+    ),
+    AdmissionClass(
+        name="vision",
+        routes=(
+            r"POST /api/(rating|contract_analyze|lease_analyze|extract_quote_vision)",
+            r"POST /extraction/upload",
+            r"POST /document-extract/extract-logo",
+        ),
+        concurrency=4, queue=16, service_seconds=60.0, default_deadline=180.0,
+    ),
+    AdmissionClass(
+        name="quiz",
+        routes=(r"POST /quiz/generate",),
+        concurrency=4, queue=8, service_seconds=15.0, default_deadline=60.0,
+    ),
+    AdmissionClass(
+        name="concierge",
+        routes=(r"POST /concierge(/stream)?",),
+        concurrency=16, queue=64, service_seconds=5.0, default_deadline=30.0,
+    ),
+]
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Gate:
+    """Concurrency slots and a priority-ordered waiting queue for one class."""
+
+    def __init__(self, admission: AdmissionClass):
+        self.admission = admission
+        self.active = 0
+        self.service_seconds = admission.service_seconds
+        self._waiting: List[list] = []  # heap of [priority, seq, future]
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+
+    def _waiting_count(self) -> int:
+        return sum(1 for entry in self._waiting if not entry[2].done())
+
+    def estimated_wait(self, priority: int) -> float:
+        ahead = sum(1 for p, _, fut in self._waiting if p <= priority and not fut.done())
+        if self.active < self.admission.concurrency and ahead == 0:
+            return 0.0
+        return (ahead + 1) * self.service_seconds / self.admission.concurrency
+
+    def _evict_lowest(self, priority: int) -> bool:
+        """Shed the newest waiter of lower priority than priority to make room."""
+        candidates = [entry for entry in self._waiting if entry[0] > priority and not entry[2].done()]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        victim[2].set_exception(Rejected("Displaced by higher-priority requests", self.service_seconds))
+        return True
+
+    async def acquire(self, priority: int, deadline: float) -> None:
+        if self.active < self.admission.concurrency and self._waiting_count() == 0:
+            self.active += 1
+            return
+        wait = self.estimated_wait(priority)
+        if wait > deadline:
+            raise Rejected(f"Estimated wait {wait:.0f}s exceeds the request deadline of {deadline:g}s", wait)
+        if self._waiting_count() >= self.admission.queue and not self._evict_lowest(priority):
+            raise Rejected("Too many requests queued", wait)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future]
+        heapq.heappush(self._waiting, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), deadline)
+        except asyncio.TimeoutError:
+            if future.done() and not future.exception():
+                # Granted at the last moment; hand the slot on
+                self.release(None)
+            else:
+                future.cancel()
+            raise Rejected(f"Waited the full deadline of {deadline:g}s", self.service_seconds)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and not future.exception():
+                self.release(None)
+            else:
+                future.cancel()
+            raise
+
+    def release(self, elapsed: Optional[float]) -> None:
+        if elapsed is not None:
+            self.service_seconds += _EWMA_WEIGHT * (elapsed - self.service_seconds)
+        while self._waiting:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                # The slot passes straight to the waiter; active stays the same
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "waiting": self._waiting_count(),
+            "concurrency": self.admission.concurrency,
+            "queue": self.admission.queue,
+            "service_seconds": round(self.service_seconds, 2),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+def _enabled() -> bool:
+    return os.getenv("ADMISSION", "on").lower() not in ("off", "false", "0")
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers") or []:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def request_deadline(scope, default: float) -> float:
+    """Seconds the client is still willing to wait, from the request deadline or the class default."""
+    left = remaining()
+    if left is None:
+        left = request_timeout(scope)
+    return left if left is not None else default
+
+
+class AdmissionMiddleware:
+    """ASGI middleware; holds the slot until the response body has been sent, streaming included."""
+
+    def __init__(self, app, classes: Optional[List[AdmissionClass]] = None):
+        self.app = app
+        self.gates = [_Gate(admission) for admission in (classes if classes is not None else CLASSES)]
+
+    def _gate_for(self, method: str, path: str) -> Optional[_Gate]:
+        for gate in self.gates:
+            if gate.admission.matches(method, path):
+                return gate
+        return None
+
+    def stats(self) -> Dict[str, Dict]:
+        return {gate.admission.name: gate.stats() for gate in self.gates}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled():
+            await self.app(scope, receive, send)
+            return
+        gate = self._gate_for(scope["method"], scope["path"])
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        admission = gate.admission
+        priority_name = admission.priority or (_header(scope, b"x-priority") or "normal").lower()
+        priority = PRIORITIES.get(priority_name, PRIORITIES["normal"])
+        deadline = request_deadline(scope, admission.default_deadline)
+        try:
+            await gate.acquire(priority, deadline)
+        except Rejected as e:
+            gate.rejected += 1
+            print(f"[admission] {admission.name} shed {scope['method']} {scope['path']}: {e.reason} "
+                  f"(active {gate.active}, waiting {gate._waiting_count()})")
+            await _reject(send, e)
+            return
+
+        gate.admitted += 1
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(time.monotonic() - started)
+
+
+async def _reject(send, rejection: Rejected) -> None:
+    body = json.dumps({"detail": f"Server busy: {rejection.reason}. Please retry later."}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(max(1, math.ceil(rejection.retry_after))).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
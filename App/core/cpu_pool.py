@@ -0,0 +1,125 @@
+"""
+Process pool for CPU-bound stages.
+
+PDF text extraction and rendering, image preprocessing, quality checks and
+page fingerprints hold the GIL for tens to hundreds of milliseconds per
+page. Run inline, they stall every other request on the event loop; a
+thread pool would not help for the same reason. run_cpu() sends such a
+function to a shared process pool instead, records how long it queued and
+ran per stage, and logs the slow ones.
+
+The pool is created on first use. If a worker dies (a malformed PDF can
+crash PyMuPDF), the broken pool is dropped and the next call starts a
+fresh one; the failed call raises as usual.
+
+Deliberately not sent here: the analyzers' JSON repair passes and prompt
+json.dumps/json.loads. They run inside the synchronous model-call helpers,
+right after a blocking HTTP call, where there is no loop to hand back to;
+a process hop would only add pickling. Repairing a malformed 30KB model
+response takes 10-20ms and only happens on the error path. Move them here
+once those helpers are async.
+
+    CPU_POOL_WORKERS       worker processes (default: cpu count; IMAGE_PREPROCESS_WORKERS is still read)
+    CPU_SLOW_LOG_SECONDS   log stages that queue and run longer than this (default 1)
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+_POOL_LOCK = Lock()
+
+
+@dataclass
+class StageTiming:
+    calls: int = 0
+    failures: int = 0
+    run_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    max_run_seconds: float = 0.0
+
+
+_TIMINGS: Dict[str, StageTiming] = {}
+
+
+def _configured_workers() -> int:
+    configured = os.getenv("CPU_POOL_WORKERS") or os.getenv("IMAGE_PREPROCESS_WORKERS") or "0"
+    return int(configured) or os.cpu_count() or 1
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _POOL, _POOL_WORKERS
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL_WORKERS = _configured_workers()
+                _POOL = ProcessPoolExecutor(max_workers=_POOL_WORKERS)
+                print(f"[cpu] started process pool with {_POOL_WORKERS} worker(s)")
+    return _POOL
+
+
+def pool_size() -> int:
+    """Worker count of the pool (started if needed); for splitting work into one batch per worker."""
+    get_pool()
+    return _POOL_WORKERS
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _timed(fn: Callable[..., T], args: Tuple[Any, ...]) -> Tuple[T, float, float]:
+    """Runs in the worker: fn's result, when it started, and how long it ran."""
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+def _record(stage: str, run_seconds: float, wait_seconds: float, failed: bool = False) -> None:
+    timing = _TIMINGS.setdefault(stage, StageTiming())
+    timing.calls += 1
+    timing.failures += int(failed)
+    timing.run_seconds += run_seconds
+    timing.wait_seconds += wait_seconds
+    timing.max_run_seconds = max(timing.max_run_seconds, run_seconds)
+
+
+async def run_cpu(stage: str, fn: Callable[..., T], *args: Any) -> T:
+    """fn(*args) in the process pool. fn and its arguments must be picklable (module-level function)."""
+    pool = get_pool()
+    submitted = time.time()
+    try:
+        result, started, run_seconds = await asyncio.get_running_loop().run_in_executor(pool, _timed, fn, args)
+    except BrokenProcessPool:
+        print(f"[cpu] worker died during {stage}; restarting the pool")
+        _discard_pool(pool)
+        _record(stage, time.time() - submitted, 0.0, failed=True)
+        raise
+    except Exception:
+        _record(stage, time.time() - submitted, 0.0, failed=True)
+        raise
+    wait_seconds = max(0.0, started - submitted)
+    _record(stage, run_seconds, wait_seconds)
+    if run_seconds + wait_seconds >= float(os.getenv("CPU_SLOW_LOG_SECONDS", "1")):
+        print(f"[cpu] {stage} ran {run_seconds:.2f}s after {wait_seconds:.2f}s queued")
+    return result
+
+
+def cpu_stats() -> Dict[str, Dict[str, float]]:
+    """Per-stage call counts and queue / run seconds since start."""
+    return {
+        stage: {**asdict(timing), "mean_run_seconds": round(timing.run_seconds / max(1, timing.calls), 4)}
+        for stage, timing in _TIMINGS.items()
+    }
@@ -0,0 +1,106 @@
+"""
+Request-scoped deadline budget.
+
+Clients say how long they are willing to wait with the X-Request-Timeout
+header or a `timeout` query parameter, in seconds. DeadlineMiddleware turns
+that into an absolute deadline for the request, held in a context variable
+so it follows the request through every analyzer without threading it
+through signatures. Outbound model calls take their timeout from
+budget_timeout(), which shrinks the stage's usual timeout to the time left
+and raises DeadlineExceeded when nothing useful is left. Optional stages
+(flag translation, narrative generation) check has_budget() first and fall
+back to untranslated flags or a deterministic narrative.
+
+Without a header or parameter there is no deadline, and every stage keeps
+its usual fixed timeout.
+
+    DEADLINE_RESERVE_SECONDS   kept back for scoring and response assembly (default 2)
+"""
+import os
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+from urllib.parse import parse_qs
+
+# Rough cost of the optional stages; they are skipped when less than this is left
+TRANSLATION_SECONDS = 15.0
+NARRATIVE_SECONDS = 30.0
+
+# A model call with less time than this would only fail
+_MIN_CALL_SECONDS = 1.0
+
+_DEADLINE: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before a required stage could start."""
+
+
+def _reserve() -> float:
+    return float(os.getenv("DEADLINE_RESERVE_SECONDS", "2"))
+
+
+def start_deadline(seconds: Optional[float]) -> Token:
+    """Start (or with None, clear) the current request's deadline, seconds from now."""
+    return _DEADLINE.set(time.monotonic() + seconds if seconds is not None else None)
+
+
+def reset_deadline(token: Token) -> None:
+    _DEADLINE.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None without a deadline."""
+    deadline = _DEADLINE.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget_timeout(default: Optional[float], stage: str = "model call") -> Optional[float]:
+    """Timeout for an outbound call: default, capped to the remaining budget."""
+    left = remaining()
+    if left is None:
+        return default
+    left -= _reserve()
+    if left < _MIN_CALL_SECONDS:
+        raise DeadlineExceeded(f"Request timeout budget exhausted before {stage}")
+    return left if default is None else min(default, left)
+
+
+def has_budget(seconds: float) -> bool:
+    """True when an optional stage of about this many seconds still fits."""
+    left = remaining()
+    return left is None or left - _reserve() >= seconds
+
+
+def request_timeout(scope) -> Optional[float]:
+    """Client budget in seconds from X-Request-Timeout or ?timeout=, if given and positive."""
+    raw = None
+    for key, value in scope.get("headers") or []:
+        if key.lower() == b"x-request-timeout":
+            raw = value.decode("latin-1")
+            break
+    if raw is None:
+        query = parse_qs((scope.get("query_string") or b"").decode("latin-1"))
+        raw = (query.get("timeout") or [None])[0]
+    try:
+        seconds = float(raw) if raw is not None else None
+    except ValueError:
+        return None
+    return seconds if seconds is not None and seconds > 0 else None
+
+
+class DeadlineMiddleware:
+    """ASGI middleware; starts the clock when the request arrives, before any queueing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = start_deadline(request_timeout(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
@@ -0,0 +1,44 @@
+"""
+Stage progress for long analyses.
+
+The background job runner wants to show which stage an analysis is in
+(reading uploads, extraction, scoring, narrative) without every analyzer
+taking a callback argument. track_progress() installs a reporter in a
+context variable, like the request deadline in deadline.py, and the
+analyzers call report_progress() as they reach each stage. Outside a job
+there is no reporter and report_progress() does nothing.
+"""
+from contextvars import ContextVar, Token
+from typing import Callable, Optional, Tuple
+
+# reporter(stage, percent)
+Reporter = Callable[[str, int], None]
+
+INGESTING = ("reading uploads", 10)
+EXTRACTING = ("extracting", 25)
+SCORING = ("scoring", 70)
+NARRATIVE = ("writing narrative", 80)
+
+_REPORTER: ContextVar[Optional[Reporter]] = ContextVar("progress_reporter", default=None)
+
+
+def track_progress(reporter: Optional[Reporter]) -> Token:
+    """Send this context's stage reports to reporter (None stops reporting)."""
+    return _REPORTER.set(reporter)
+
+
+def reset_progress(token: Token) -> None:
+    _REPORTER.reset(token)
+
+
+def report_progress(stage: Tuple[str, int]) -> None:
+    """Record that the current analysis has reached stage, one of the (name, percent) constants above."""
+    reporter = _REPORTER.get()
+    if reporter is None:
+        return
+    name, percent = stage
+    try:
+        reporter(name, percent)
+    except Exception as e:
+        # Progress is informational; never fail an analysis over it
+        print(f"[progress] could not report {name}: {str(e)}")
@@ -1,14 +1,16 @@
-import os, httpx
-from cachetools import LRUCache
-from typing import List, Optional
+import os, json, httpx
+from typing import AsyncIterator, List, Optional, Tuple
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from App.services.chatbot.chatbot_schemas import ChatRequest, ChatResponse
+from App.services.chatbot.context_window import build_context, schedule_summary
+from App.services.chatbot.conversation_store import build_store
 from App.core.config import settings
 
 router = APIRouter(prefix="/concierge", tags=["concierge"])
 
-MAX_THREADS = 10000
-memory: LRUCache[str, List[dict]] = LRUCache(maxsize=MAX_THREADS)
+# Conversation history; CONCIERGE_STORE=sqlite shares it across worker processes
+store = build_store()
 
 # Buyer scenario detection keywords
 SCENARIO_KEYWORDS = {
@@ -112,15 +114,8 @@ def build_scenario_context(scenario: str, region: Optional[str] = None) -> str:
     
     return base_context
 
-@router.post("", response_model=ChatResponse)
-async def concierge(
-    req: ChatRequest,
-    thread_id: str = Query(..., description="unique conversation id")
-):
-    api_key = settings.GROQ_API_KEY
-    if not api_key:
-        raise HTTPException(500, "GROQ_API_KEY not set")
-
+async def _prepare_turn(req: ChatRequest, thread_id: str) -> Tuple[dict, Optional[List[dict]]]:
+    """Groq payload for this turn, and the thread history to save the reply to (None for explanations)"""
     # Check if user is asking for an explanation
     explanation_keywords = ["what is", "meaning of", "explain", "define"]
     is_explanation_request = any(keyword in req.message.lower() for keyword in explanation_keywords)
@@ -172,7 +167,7 @@ async def concierge(
             base_prompt += f" The user mentioned these potential red flags: {', '.join(red_flags)}. Gently alert them to question these items."
         
         # Server-side memory
-        history = memory.get(thread_id, [])
+        history = await store.get(thread_id)
         if not history:
             history = [{"role": "system", "content": base_prompt}]
             # Start with scenario-appropriate opening
@@ -192,7 +187,8 @@ async def concierge(
             history[0]["content"] = base_prompt
         
         history.append({"role": "user", "content": req.message})
-        messages = history
+        # System prompt, summary of older turns and the recent turns that fit the token budget
+        messages = build_context(history)
 
     payload = {
         "model": settings.GROQ_MODEL,
@@ -200,6 +196,71 @@ async def concierge(
         "max_tokens": 550,  # Slightly increased for more nuanced responses
         "temperature": 0.7 if not is_explanation_request else 0.3
     }
+    return payload, None if is_explanation_request else history
+
+
+async def _save_reply(thread_id: str, history: Optional[List[dict]], reply: str) -> None:
+    """Save to memory if it's a roleplay conversation"""
+    if history is None:
+        return
+    history.append({"role": "assistant", "content": reply})
+    await store.put(thread_id, history)
+    schedule_summary(store, thread_id, history)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _relay(api_key: str, payload: dict, thread_id: str, history: Optional[List[dict]]) -> AsyncIterator[str]:
+    """Relays Groq's streamed chunks as SSE; leaving early (client gone) closes the upstream request."""
+    chunks: List[str] = []
+    completed = False
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            async with client.stream(
+                "POST",
+                settings.GROQ_URL,
+                headers={
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={**payload, "stream": True}
+            ) as r:
+                if r.is_error:
+                    await r.aread()
+                    r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    content = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if content:
+                        chunks.append(content)
+                        yield _sse("token", {"content": content})
+        reply = "".join(chunks).strip()
+        await _save_reply(thread_id, history, reply)
+        completed = True
+        yield _sse("done", {"reply": reply})
+    except Exception as e:
+        yield _sse("error", {"detail": f"Groq error: {e}"})
+    finally:
+        if not completed:
+            print(f"[concierge] stream for {thread_id} stopped after {len(chunks)} chunk(s); reply not saved")
+
+
+@router.post("", response_model=ChatResponse)
+async def concierge(
+    req: ChatRequest,
+    thread_id: str = Query(..., description="unique conversation id")
+):
+    api_key = settings.GROQ_API_KEY
+    if not api_key:
+        raise HTTPException(500, "GROQ_API_KEY not set")
+
+    payload, history = await _prepare_turn(req, thread_id)
 
     async with httpx.AsyncClient(timeout=30) as client:
         try:
@@ -213,12 +274,33 @@ async def concierge(
             )
             r.raise_for_status()
             reply = r.json()["choices"][0]["message"]["content"].strip()
-
-            # Save to memory if it's a roleplay conversation
-            if not is_explanation_request:
-                history.append({"role": "assistant", "content": reply})
-                memory[thread_id] = history
-                
+            await _save_reply(thread_id, history, reply)
             return ChatResponse(reply=reply)
         except Exception as e:
             raise HTTPException(502, f"Groq error: {e}")
+
+
+@router.post("/stream")
+async def concierge_stream(
+    req: ChatRequest,
+    thread_id: str = Query(..., description="unique conversation id")
+):
+    """
+    Same conversation as POST /concierge, streamed as server-sent events:
+
+    - **token**: `{"content": ...}` for each chunk of the reply as Groq produces it
+    - **done**: `{"reply": ...}`, the full reply, once it has been saved to the thread
+    - **error**: `{"detail": ...}` if the upstream call fails
+
+    Disconnecting cancels the upstream call; a partial reply is not saved.
+    """
+    api_key = settings.GROQ_API_KEY
+    if not api_key:
+        raise HTTPException(500, "GROQ_API_KEY not set")
+
+    payload, history = await _prepare_turn(req, thread_id)
+    return StreamingResponse(
+        _relay(api_key, payload, thread_id, history),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
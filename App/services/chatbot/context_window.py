@@ -0,0 +1,168 @@
+"""
+Concierge context window.
+
+build_context() sends the system prompt, the running summary of older
+turns (if there is one) and as many recent turns as fit in
+CONCIERGE_CONTEXT_TOKENS, always including the new user message. The
+prompt no longer grows with the thread.
+
+Turns that fall out of the window are folded into the summary by
+schedule_summary() once the reply has been returned: one model call
+rewrites the summary from the previous one plus the folded turns, and the
+stored thread becomes [system prompt, summary, recent turns]. Folding
+stops at half the budget so it runs every few turns, not on every one.
+Until a summary lands, turns outside the window are just not sent, so
+reply latency never waits on it.
+
+Token counts are estimates (about four characters per token plus a
+per-message overhead). There is no local tokenizer for the Groq models,
+and the budget only needs to stay conservative.
+
+    CONCIERGE_CONTEXT_TOKENS       prompt budget per turn (default 3000)
+    CONCIERGE_SUMMARY_MAX_TOKENS   summary length (default 300)
+"""
+import asyncio
+import contextvars
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from App.core.config import settings
+from App.services.chatbot.conversation_store import ConversationStore, Messages
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+_SUMMARY_PROMPT = (
+    "You summarize a negotiation roleplay between a car buyer (user) and SmartDealer, the dealer (assistant). "
+    "Merge the existing summary with the new turns into one summary of at most 150 words. "
+    "Keep every price, payment, rate, fee, add-on, concession and open question, and who proposed what. "
+    "Write it in the language of the conversation. Reply with the summary only."
+)
+
+# Summaries in flight in this process, and strong references to their tasks
+_IN_FLIGHT: Set[str] = set()
+_TASKS: Set[asyncio.Task] = set()
+
+
+def context_budget() -> int:
+    return int(os.getenv("CONCIERGE_CONTEXT_TOKENS", "3000"))
+
+
+def estimate_tokens(message: Dict[str, str]) -> int:
+    return (len(message.get("content") or "") + 3) // 4 + _MESSAGE_OVERHEAD_TOKENS
+
+
+def is_summary(message: Dict[str, str]) -> bool:
+    return message.get("role") == "system" and (message.get("content") or "").startswith(SUMMARY_PREFIX)
+
+
+def split_thread(history: Messages) -> Tuple[Messages, Messages]:
+    """(leading system messages: prompt and summary, the turns after them)."""
+    head = 0
+    while head < len(history) and history[head].get("role") == "system":
+        head += 1
+    return history[:head], history[head:]
+
+
+def _summary_text(head: Messages) -> Optional[str]:
+    for message in head:
+        if is_summary(message):
+            return message["content"][len(SUMMARY_PREFIX):]
+    return None
+
+
+def _recent_count(turns: Messages, allowance: int) -> int:
+    """How many of the latest turns fit in allowance tokens; at least one."""
+    used = count = 0
+    for message in reversed(turns):
+        used += estimate_tokens(message)
+        if used > allowance and count:
+            break
+        count += 1
+    return count
+
+
+def build_context(history: Messages, budget: Optional[int] = None) -> Messages:
+    """System prompt, summary and the most recent turns within budget tokens."""
+    budget = context_budget() if budget is None else budget
+    head, turns = split_thread(history)
+    allowance = budget - sum(estimate_tokens(m) for m in head)
+    return head + turns[len(turns) - _recent_count(turns, allowance):]
+
+
+def turns_to_fold(history: Messages, budget: Optional[int] = None) -> int:
+    """Oldest turns to fold into the summary: none while the thread fits, else down to half the budget."""
+    budget = context_budget() if budget is None else budget
+    head, turns = split_thread(history)
+    head_tokens = sum(estimate_tokens(m) for m in head)
+    if head_tokens + sum(estimate_tokens(m) for m in turns) <= budget:
+        return 0
+    return len(turns) - _recent_count(turns, (budget - head_tokens) // 2)
+
+
+async def _summarize(previous: Optional[str], turns: Messages) -> str:
+    lines = [f"{'SmartDealer' if m.get('role') == 'assistant' else 'Buyer'}: {m.get('content', '')}" for m in turns]
+    prompt = f"Existing summary: {previous or '(none)'}\n\nNew turns:\n" + "\n".join(lines)
+    payload = {
+        "model": settings.GROQ_MODEL,
+        "messages": [
+            {"role": "system", "content": _SUMMARY_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "max_tokens": int(os.getenv("CONCIERGE_SUMMARY_MAX_TOKENS", "300")),
+        "temperature": 0.2,
+    }
+    async with httpx.AsyncClient(timeout=30) as client:
+        r = await client.post(
+            settings.GROQ_URL,
+            headers={
+                "Authorization": f"Bearer {settings.GROQ_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            json=payload
+        )
+        r.raise_for_status()
+        return r.json()["choices"][0]["message"]["content"].strip()
+
+
+async def summarize_thread(store: ConversationStore, thread_id: str) -> None:
+    history = await store.get(thread_id)
+    fold = turns_to_fold(history)
+    if not fold:
+        return
+    head, turns = split_thread(history)
+    previous = _summary_text(head)
+    summary = await _summarize(previous, turns[:fold])
+
+    # The thread may have moved on (or been summarized by another worker) during the call
+    latest = await store.get(thread_id)
+    latest_head, latest_turns = split_thread(latest)
+    if _summary_text(latest_head) != previous or latest_turns[:fold] != turns[:fold]:
+        print(f"[concierge] {thread_id} changed during summarization; keeping it as is")
+        return
+    prompt = [m for m in latest_head if not is_summary(m)]
+    await store.put(thread_id, prompt + [{"role": "system", "content": SUMMARY_PREFIX + summary}] + latest_turns[fold:])
+    print(f"[concierge] {thread_id}: folded {fold} turn(s) into the summary")
+
+
+async def _summarize_in_background(store: ConversationStore, thread_id: str) -> None:
+    try:
+        await summarize_thread(store, thread_id)
+    except Exception as e:
+        print(f"[concierge] summary for {thread_id} failed: {str(e)}")
+    finally:
+        _IN_FLIGHT.discard(thread_id)
+
+
+def schedule_summary(store: ConversationStore, thread_id: str, history: Messages) -> None:
+    """Fold old turns into the summary in the background when history has outgrown the budget."""
+    if thread_id in _IN_FLIGHT or not turns_to_fold(history):
+        return
+    _IN_FLIGHT.add(thread_id)
+    # Fresh context: the summary must not inherit the request's deadline
+    task = asyncio.create_task(_summarize_in_background(store, thread_id), context=contextvars.Context())
+    _TASKS.add(task)
+    task.add_done_callback(_TASKS.discard)
@@ -0,0 +1,201 @@
+"""
+Concierge conversation history.
+
+A store maps a thread id to its message list ({"role", "content"} dicts,
+system prompt first). get() always returns a fresh copy, so a turn that
+fails upstream leaves the stored thread untouched until put() is called.
+
+Two implementations:
+
+  - MemoryConversationStore: per process, bounded by the total size of the
+    stored threads rather than their count, least recently used evicted
+    first, with TTL expiry. Threads live in their serialized form, so the
+    byte accounting is exact.
+  - SqliteConversationStore: one SQLite file (WAL mode) shared by every
+    worker process on the host, so a thread's next message finds its
+    history whichever worker takes it, and survives restarts.
+
+Either way a single thread is capped at CONCIERGE_MAX_THREAD_BYTES; the
+oldest turns after the leading system messages (prompt and summary) are
+dropped first.
+
+    CONCIERGE_STORE              memory (default) or sqlite
+    CONCIERGE_STORE_PATH         SQLite file (default App/core/.concierge.sqlite3)
+    CONCIERGE_MAX_BYTES          memory store: total bytes kept (default 64MB)
+    CONCIERGE_MAX_THREAD_BYTES   per-thread cap (default 256KB)
+    CONCIERGE_TTL_SECONDS        idle time before a thread expires (default 86400)
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+Messages = List[Dict[str, str]]
+
+# Expired SQLite rows are deleted at most this often
+_PURGE_INTERVAL_SECONDS = 300
+
+
+def _encode(messages: Messages) -> bytes:
+    return json.dumps(messages, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fit_thread(messages: Messages, max_bytes: int) -> bytes:
+    """Serialized thread within max_bytes, dropping the oldest turns after the leading system messages."""
+    encoded = _encode(messages)
+    if len(encoded) <= max_bytes:
+        return encoded
+    keep_from = 0
+    while keep_from < len(messages) and messages[keep_from].get("role") == "system":
+        keep_from += 1
+    head, turns = messages[:keep_from], list(messages[keep_from:])
+    while turns and len(encoded) > max_bytes:
+        turns.pop(0)
+        encoded = _encode(head + turns)
+    return encoded
+
+
+class ConversationStore(ABC):
+    """Thread id -> message list."""
+
+    def __init__(self, max_thread_bytes: int, ttl_seconds: float):
+        self.max_thread_bytes = max_thread_bytes
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    async def get(self, thread_id: str) -> Messages:
+        """The thread's messages, or [] for an unknown or expired thread."""
+
+    @abstractmethod
+    async def put(self, thread_id: str, messages: Messages) -> None:
+        """Store the thread, capped at max_thread_bytes."""
+
+    @abstractmethod
+    async def delete(self, thread_id: str) -> None:
+        """Forget the thread; unknown ids are ignored."""
+
+
+class MemoryConversationStore(ConversationStore):
+    def __init__(self, max_bytes: int, max_thread_bytes: int, ttl_seconds: float):
+        super().__init__(max_thread_bytes, ttl_seconds)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._threads: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()  # id -> (json, last used)
+
+    def _drop(self, thread_id: str) -> None:
+        encoded, _ = self._threads.pop(thread_id)
+        self.total_bytes -= len(encoded)
+
+    def _expire(self, now: float) -> None:
+        # Least recently used first, so the expired threads are all at the front
+        while self._threads:
+            thread_id, (_, used) = next(iter(self._threads.items()))
+            if now - used < self.ttl_seconds:
+                break
+            self._drop(thread_id)
+
+    async def get(self, thread_id: str) -> Messages:
+        now = time.time()
+        self._expire(now)
+        entry = self._threads.get(thread_id)
+        if entry is None:
+            return []
+        self._threads[thread_id] = (entry[0], now)
+        self._threads.move_to_end(thread_id)
+        return json.loads(entry[0])
+
+    async def put(self, thread_id: str, messages: Messages) -> None:
+        now = time.time()
+        encoded = fit_thread(messages, self.max_thread_bytes)
+        if thread_id in self._threads:
+            self._drop(thread_id)
+        self._threads[thread_id] = (encoded, now)
+        self.total_bytes += len(encoded)
+        self._expire(now)
+        while self.total_bytes > self.max_bytes and len(self._threads) > 1:
+            self._drop(next(iter(self._threads)))
+
+    async def delete(self, thread_id: str) -> None:
+        if thread_id in self._threads:
+            self._drop(thread_id)
+
+
+class SqliteConversationStore(ConversationStore):
+    def __init__(self, path: str, max_thread_bytes: int, ttl_seconds: float):
+        super().__init__(max_thread_bytes, ttl_seconds)
+        self.path = path
+        self._last_purge = 0.0
+        self._purge_lock = Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS threads ("
+                "thread_id TEXT PRIMARY KEY, messages BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A connection per call: the methods run on worker threads, and WAL handles the other processes.
+        # The connection's own context manager only commits; closing() releases the file handle.
+        with closing(sqlite3.connect(self.path, timeout=10)) as db, db:
+            yield db
+
+    def _get(self, thread_id: str) -> Messages:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT messages FROM threads WHERE thread_id = ? AND updated_at > ?",
+                (thread_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def _put(self, thread_id: str, encoded: bytes) -> None:
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO threads (thread_id, messages, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET messages = excluded.messages, updated_at = excluded.updated_at",
+                (thread_id, encoded, now),
+            )
+            with self._purge_lock:
+                purge = now - self._last_purge >= _PURGE_INTERVAL_SECONDS
+                if purge:
+                    self._last_purge = now
+            if purge:
+                db.execute("DELETE FROM threads WHERE updated_at <= ?", (now - self.ttl_seconds,))
+
+    def _delete(self, thread_id: str) -> None:
+        with self._connect() as db:
+            db.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+    async def get(self, thread_id: str) -> Messages:
+        return await asyncio.to_thread(self._get, thread_id)
+
+    async def put(self, thread_id: str, messages: Messages) -> None:
+        await asyncio.to_thread(self._put, thread_id, fit_thread(messages, self.max_thread_bytes))
+
+    async def delete(self, thread_id: str) -> None:
+        await asyncio.to_thread(self._delete, thread_id)
+
+
+def build_store(kind: Optional[str] = None) -> ConversationStore:
+    kind = (kind or os.getenv("CONCIERGE_STORE", "memory")).lower()
+    max_thread_bytes = int(os.getenv("CONCIERGE_MAX_THREAD_BYTES", str(256 * 1024)))
+    ttl_seconds = float(os.getenv("CONCIERGE_TTL_SECONDS", "86400"))
+    if kind == "sqlite":
+        path = os.getenv("CONCIERGE_STORE_PATH") or os.path.join(os.getcwd(), "App", "core", ".concierge.sqlite3")
+        print(f"[concierge] SQLite conversation store at {path}")
+        return SqliteConversationStore(path, max_thread_bytes, ttl_seconds)
+    if kind != "memory":
+        raise ValueError(f"Unknown CONCIERGE_STORE: {kind} (expected memory or sqlite)")
+    max_bytes = int(os.getenv("CONCIERGE_MAX_BYTES", str(64 * 1024 * 1024)))
+    return MemoryConversationStore(max_bytes, max_thread_bytes, ttl_seconds)
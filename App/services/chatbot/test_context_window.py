@@ -0,0 +1,133 @@
+import asyncio
+import os
+
+# Settings are read at import; the summary call itself is stubbed below
+for _name, _value in (("gcp_project_id", "test"), ("gcp_processor_id", "test"), ("GROQ_URL", "http://groq.invalid"),
+                      ("GROQ_MODEL", "test"), ("GROQ_API_KEY", "test")):
+    os.environ.setdefault(_name, _value)
+
+import pytest
+
+from App.services.chatbot import context_window
+from App.services.chatbot.context_window import SUMMARY_PREFIX, build_context, summarize_thread, turns_to_fold
+from App.services.chatbot.conversation_store import MemoryConversationStore
+
+BUDGET = 200
+PROMPT = {"role": "system", "content": "You are SmartDealer."}
+
+
+def _turns(start: int, count: int):
+    # 100 characters: 29 estimated tokens per turn
+    return [
+        {"role": "user" if n % 2 == 0 else "assistant", "content": f"turn {n:03d} " + "x" * 91}
+        for n in range(start, start + count)
+    ]
+
+
+def _summary(text: str):
+    return {"role": "system", "content": SUMMARY_PREFIX + text}
+
+
+@pytest.fixture
+def store():
+    return MemoryConversationStore(max_bytes=1 << 20, max_thread_bytes=1 << 20, ttl_seconds=3600)
+
+
+class _StubSummarizer:
+    """Stands in for the model call: records its inputs, runs an optional hook, returns a canned summary."""
+
+    def __init__(self):
+        self.calls = []
+        self.hook = None
+
+    async def __call__(self, previous, turns):
+        self.calls.append((previous, [t["content"][:8] for t in turns]))
+        if self.hook is not None:
+            await self.hook()
+        return f"summary #{len(self.calls)}"
+
+
+@pytest.fixture
+def summarize(monkeypatch):
+    stub = _StubSummarizer()
+    monkeypatch.setattr(context_window, "_summarize", stub)
+    monkeypatch.setenv("CONCIERGE_CONTEXT_TOKENS", str(BUDGET))
+    return stub
+
+
+def test_no_fold_within_budget(store, summarize):
+    history = [PROMPT] + _turns(0, 5)  # 10 + 5 * 29 = 155 tokens
+    assert turns_to_fold(history, BUDGET) == 0
+    assert build_context(history, BUDGET) == history
+
+    async def scenario():
+        await store.put("t", history)
+        await summarize_thread(store, "t")
+        return await store.get("t")
+
+    assert asyncio.run(scenario()) == history
+    assert summarize.calls == []
+
+
+def test_fold_over_budget(store, summarize):
+    history = [PROMPT] + _turns(0, 8)  # 242 tokens
+    fold = turns_to_fold(history, BUDGET)
+    assert fold == 5  # down to half the budget: 3 recent turns
+
+    async def scenario():
+        await store.put("t", history)
+        await summarize_thread(store, "t")
+        return await store.get("t")
+
+    assert asyncio.run(scenario()) == [PROMPT, _summary("summary #1")] + _turns(5, 3)
+    assert summarize.calls == [(None, [f"turn {n:03d}" for n in range(5)])]
+
+
+def test_summary_replaces_the_previous_one(store, summarize):
+    history = [PROMPT, _summary("older summary")] + _turns(10, 8)
+
+    async def scenario():
+        await store.put("t", history)
+        await summarize_thread(store, "t")
+        return await store.get("t")
+
+    stored = asyncio.run(scenario())
+    previous, folded = summarize.calls[0]
+    assert previous == "older summary"
+    assert stored[:2] == [PROMPT, _summary("summary #1")]
+    assert [m for m in stored if m["content"].startswith(SUMMARY_PREFIX)] == [_summary("summary #1")]
+    assert stored[2:] == history[2 + len(folded):]
+
+
+def test_turns_added_during_the_summary_are_kept(store, summarize):
+    history = [PROMPT] + _turns(0, 8)
+
+    async def new_turn_arrives():
+        latest = await store.get("t")
+        await store.put("t", latest + _turns(8, 2))
+
+    summarize.hook = new_turn_arrives
+
+    async def scenario():
+        await store.put("t", history)
+        await summarize_thread(store, "t")
+        return await store.get("t")
+
+    assert asyncio.run(scenario()) == [PROMPT, _summary("summary #1")] + _turns(5, 5)
+
+
+def test_thread_rewritten_during_the_summary_is_left_alone(store, summarize):
+    history = [PROMPT] + _turns(0, 8)
+    rewritten = [PROMPT, _summary("from another worker")] + _turns(5, 3)
+
+    async def other_worker_summarized():
+        await store.put("t", rewritten)
+
+    summarize.hook = other_worker_summarized
+
+    async def scenario():
+        await store.put("t", history)
+        await summarize_thread(store, "t")
+        return await store.get("t")
+
+    assert asyncio.run(scenario()) == rewritten
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from App.services.chatbot import conversation_store
+from App.services.chatbot.conversation_store import (
+    ConversationStore,
+    MemoryConversationStore,
+    SqliteConversationStore,
+    fit_thread,
+)
+
+SYSTEM = [{"role": "system", "content": "You are the concierge."}, {"role": "system", "content": "Summary: trade-in."}]
+
+
+def _thread(turns: int, size: int = 100):
+    return SYSTEM + [
+        {"role": "user" if n % 2 == 0 else "assistant", "content": f"{n:03d}" + "x" * size}
+        for n in range(turns)
+    ]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(conversation_store, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        ConversationStore(1024, 60)
+
+
+def test_fit_thread_keeps_system_messages():
+    messages = _thread(10)
+    encoded = fit_thread(messages, 700)
+    kept = json.loads(encoded)
+    assert len(encoded) <= 700
+    assert kept[:2] == SYSTEM
+    # Oldest turns go first; the newest survive
+    assert kept[2:] == messages[-len(kept) + 2:]
+    assert len(kept) < len(messages)
+    assert fit_thread(messages, 1 << 20) == conversation_store._encode(messages)
+
+
+def test_memory_store_evicts_least_recently_used_by_bytes(clock):
+    one_thread = len(fit_thread(_thread(2), 1 << 20))
+    store = MemoryConversationStore(max_bytes=one_thread * 2 + 10, max_thread_bytes=1 << 20, ttl_seconds=3600)
+
+    async def scenario():
+        await store.put("a", _thread(2))
+        await store.put("b", _thread(2))
+        await store.get("a")  # a is now the most recently used
+        await store.put("c", _thread(2))
+        return [await store.get(thread_id) for thread_id in ("a", "b", "c")]
+
+    a, b, c = asyncio.run(scenario())
+    assert a == _thread(2) and c == _thread(2)
+    assert b == []
+    assert store.total_bytes == one_thread * 2
+
+
+def test_memory_store_ttl(clock):
+    store = MemoryConversationStore(max_bytes=1 << 20, max_thread_bytes=1 << 20, ttl_seconds=60)
+
+    async def scenario():
+        await store.put("old", _thread(2))
+        clock.now += 30
+        await store.put("new", _thread(2))
+        clock.now += 45  # old idle for 75s, new for 45s
+        return await store.get("old"), await store.get("new")
+
+    old, new = asyncio.run(scenario())
+    assert old == [] and new == _thread(2)
+    assert list(store._threads) == ["new"]
+
+
+def test_sqlite_round_trip(tmp_path, clock):
+    path = str(tmp_path / "concierge.sqlite3")
+    store = SqliteConversationStore(path, max_thread_bytes=700, ttl_seconds=60)
+    messages = _thread(10)
+
+    async def scenario():
+        await store.put("t1", messages)
+        # A second store on the same file, as another worker process would have
+        other = SqliteConversationStore(path, max_thread_bytes=700, ttl_seconds=60)
+        stored = await other.get("t1")
+        clock.now += 61
+        expired = await other.get("t1")
+        clock.now -= 61
+        await other.delete("t1")
+        return stored, expired, await store.get("t1")
+
+    stored, expired, deleted = asyncio.run(scenario())
+    assert stored == json.loads(fit_thread(messages, 700))
+    assert stored[:2] == SYSTEM
+    assert expired == []
+    assert deleted == []
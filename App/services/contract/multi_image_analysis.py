@@ -1,5 +1,13 @@
 from App.services.rate_helper.ocr_normalizer import OCRNormalizer
-from App.services.rate_helper.ocr_normalization_schema import NormalizedLineItem
+from App.services.rate_helper.records import LineItemRecord
+from App.services.extraction.document_bundle import DocumentBundle, VisionImage, anthropic_source_block, ingest_uploads
+from App.services.extraction.image_preprocess import preprocess_bundle, vision_pages
+from App.services.extraction.image_quality import UnreadablePageError, check_bundle
+from App.services.extraction.page_dedupe import dedupe_bundle, merged_uploads
+from App.services.extraction.page_selection import select_pages
+from App.services.extraction.request_body import JsonBody
+from App.core.progress import EXTRACTING, INGESTING, NARRATIVE, SCORING, report_progress
+from App.core.deadline import DeadlineExceeded, NARRATIVE_SECONDS, TRANSLATION_SECONDS, budget_timeout, has_budget, remaining
 from App.services.rate_helper.discount_detector import DiscountDetector
 from App.services.rate_helper.discount_schema import DiscountLineItem, DiscountTotals
 from typing import List, Optional, Dict, Tuple
@@ -7,14 +15,13 @@ from dotenv import load_dotenv
 from fastapi import UploadFile
 import os
 import json
-import base64
 import requests
 import re
 
 # FIXED IMPORT: Was improperly importing from .rating_schema
 from .multi_image_analysis_schema import (
     MultiImageAnalysisResponse, Flag, NormalizedPricing, 
-    APRData, TermData, TradeData, Narrative
+    APRData, TermData, TradeData, Narrative, ScoreResponse
 )
 from App.services.extraction.gemini_extractor import GeminiExtractor
 from App.services.rate_helper.audit_classifier import AuditClassifier, AuditClassification
@@ -22,13 +29,9 @@ from App.services.rate_helper.gap_logic import GAPLogic, GAPRecommendation
 from App.services.rate_helper.audit_flags import AuditFlagBuilder, AuditFlag
 from App.services.rate_helper.audit_summary import AuditSummary
 from App.services.rate_helper.json_to_parsed import convert_extracted_json_to_parsed
-from App.services.rate_helper.scoring_engine import (
-    load_rules,
-    build_active_flags,
-    compute_flags_from_parsed,
-    score_flags,
-    ActiveFlag,
-)
+from App.services.rate_helper.narrative_templates import build_narrative, fill_narrative
+from App.services.rate_helper.scoring_engine import score_parsed, ANALYSIS_MODES
+from App.services.rate_helper.score_response import output_flags, score_only_response
 from App.services.rate_helper.pricing_caps_loader import load_pricing_caps, get_pricing_cap
 
 load_dotenv()
@@ -59,12 +62,12 @@ class MultiImageAnalyzer:
         os.makedirs(cache_dir, exist_ok=True)
         return cache_dir
 
-    def _make_cache_key(self, base64_images: List[str]) -> str:
+    def _make_cache_key(self, base64_images: List[VisionImage]) -> str:
         """Create a stable cache key for the given image contents."""
         import hashlib
         hasher = hashlib.sha256()
         for img in base64_images:
-            hasher.update(img.encode("utf-8"))
+            hasher.update(img.encode("utf-8") if isinstance(img, str) else img.sha256.encode("utf-8"))
         return hasher.hexdigest()
 
     def _load_cached_extraction(self, cache_key: str) -> Optional[dict]:
@@ -120,6 +123,9 @@ class MultiImageAnalyzer:
         language = self._normalize_language(language)
         if language.lower() == "english":
             return flags
+        if not has_budget(TRANSLATION_SECONDS):
+            print(f"[deadline] {remaining():.0f}s left, flags stay untranslated")
+            return flags
 
         flags_payload = [
             {"type": f.type, "message": f.message, "item": f.item}
@@ -150,7 +156,7 @@ class MultiImageAnalyzer:
             "temperature": 0.0,
             "max_tokens": 1000
         }
-        response = requests.post(self.api_url, headers=headers, json=payload, timeout=120)
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(120))
         response.raise_for_status()
         parsed_translation = self._parse_api_response(response.json())
         translated_list = parsed_translation.get("flags", []) if isinstance(parsed_translation, dict) else []
@@ -245,6 +251,9 @@ class MultiImageAnalyzer:
         language = self._normalize_language(language)
         if language.lower() == "english":
             return payload
+        if not has_budget(TRANSLATION_SECONDS):
+            print(f"[deadline] {remaining():.0f}s left, text stays untranslated")
+            return payload
 
         headers = {
             "x-api-key": self.api_key or "",
@@ -268,7 +277,7 @@ class MultiImageAnalyzer:
             "temperature": 0.0,
             "max_tokens": 2000
         }
-        response = requests.post(self.api_url, headers=headers, json=payload_request, timeout=120)
+        response = requests.post(self.api_url, headers=headers, json=payload_request, timeout=budget_timeout(120))
         response.raise_for_status()
         translated = self._parse_json_object(response.json())
         if isinstance(translated, dict) and translated:
@@ -1242,31 +1251,16 @@ Before returning JSON:
 
         return prompt
     
-    async def _validate_files(self, files: List[UploadFile]) -> List[UploadFile]:
-        """Validate uploaded files"""
-        validated = []
-        for file in files:
-            file_ext = os.path.splitext(file.filename)[1].lower()
-            if file_ext not in self.ALLOWED_EXTENSIONS:
-                raise ValueError(f"Invalid file type: {file.filename}")
-            contents = await file.read()
-            if len(contents) > self.MAX_FILE_SIZE:
-                raise ValueError(f"File too large: {file.filename}")
-            await file.seek(0)
-            validated.append(file)
-        return validated
-    
-    async def _convert_files_to_base64(self, files: List[UploadFile]) -> List[str]:
-        """Convert files to base64"""
-        base64_images = []
-        for file in files:
-            contents = await file.read()
-            base64_content = base64.b64encode(contents).decode('utf-8')
-            base64_images.append(base64_content)
-            await file.seek(0)
-        return base64_images
+    async def _ingest_files(self, files: List[UploadFile]) -> DocumentBundle:
+        """
+        Read each upload once (type/size checks, hash, MIME sniffing), reject
+        illegible photos as uploaded, then preprocess the images and merge retakes
+        """
+        documents = await ingest_uploads(files, self.MAX_FILE_SIZE, self.ALLOWED_EXTENSIONS)
+        await check_bundle(documents)
+        return await dedupe_bundle(await preprocess_bundle(documents))
     
-    def _call_openai_api(self, base64_images: List[str], language: str = "English") -> dict:
+    def _call_openai_api(self, base64_images: List[VisionImage], language: str = "English") -> dict:
         """Call Claude Messages API with contract documents"""
         headers = {
             "x-api-key": self.api_key or "",
@@ -1306,14 +1300,7 @@ Analyze these contract documents comprehensively and return ONLY valid JSON matc
 
         if base64_images:
             for base64_image in base64_images:
-                user_content.append({
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": base64_image
-                    }
-                })
+                user_content.append(anthropic_source_block(base64_image))
 
         system_text = f"""!!!ABSOLUTE PRIORITY - LANGUAGE OVERRIDE - THIS OVERRIDES EVERYTHING!!!
 
@@ -1366,8 +1353,8 @@ Write fluently and naturally in {language}. NO ENGLISH TEXT IN FLAGS OR NARRATIV
             response = requests.post(
                 self.api_url,
                 headers=headers,
-                json=payload,
-                timeout=120
+                data=JsonBody(payload),
+                timeout=budget_timeout(120)
             )
             response.raise_for_status()
             return response.json()
@@ -1807,6 +1794,10 @@ Write fluently and naturally in {language}. NO ENGLISH TEXT IN FLAGS OR NARRATIV
 
     def _call_narrative_api(self, parsed: dict, score: float, red_flags: list, green_flags: list, blue_flags: list, language: str) -> dict:
         """Call OpenAI to generate narrative sections from the full parsed data and final flags."""
+        if not has_budget(NARRATIVE_SECONDS):
+            # Callers fill every section from their deterministic defaults
+            print(f"[deadline] {remaining():.0f}s left, skipping narrative generation")
+            return {}
         flags_payload = {
             "red_flags": [{"type": f.type, "message": f.message, "item": f.item, "deduction": f.deduction} for f in red_flags],
             "green_flags": [{"type": f.type, "message": f.message, "item": f.item, "bonus": f.bonus} for f in green_flags],
@@ -1863,7 +1854,7 @@ Return ONLY a JSON object with exactly these keys:
             "max_tokens": 2000
         }
         try:
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=self.API_TIMEOUT)
+            response = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(self.API_TIMEOUT))
             response.raise_for_status()
             raw = self._parse_json_object(response.json())
             return raw
@@ -1928,17 +1919,19 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
         for attempt in range(self.MAX_RETRIES):
             try:
                 print(f"JSON full-analysis API call attempt {attempt + 1}/{self.MAX_RETRIES}...")
-                resp = requests.post(self.api_url, headers=headers, json=payload, timeout=self.API_TIMEOUT)
+                resp = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(self.API_TIMEOUT))
                 resp.raise_for_status()
                 print("JSON full-analysis API call successful.")
                 return resp.json()
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 last_error = e
                 if attempt < self.MAX_RETRIES - 1:
                     import time; time.sleep(2)
         raise RuntimeError(f"JSON analysis API failed after {self.MAX_RETRIES} attempts: {last_error}")
 
-    def _normalize_line_items(self, line_items: List[Dict]) -> List[NormalizedLineItem]:
+    def _normalize_line_items(self, line_items: List[Dict]) -> List[LineItemRecord]:
         """Normalize OCR line items using the OCR normalizer before scoring."""
         normalized = []
         for item in line_items:
@@ -1947,17 +1940,13 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
             raw_text = item.get("description", "") or item.get("item", "") or item.get("name", "")
             amount_raw = str(item.get("amount", "0"))
             if raw_text:
-                normalized_item = self.ocr_normalizer.normalize_line_item(
+                normalized_item = self.ocr_normalizer.normalize_line_item_record(
                     raw_text=raw_text,
                     amount_raw=amount_raw
                 )
                 normalized.append(normalized_item)
         return normalized
 
-    async def _optimize_images(self, files: List[UploadFile]) -> List[UploadFile]:
-        """Optimize images (placeholder)"""
-        return files
-    
     def _extract_trade_data(self, parsed: dict) -> 'TradeData':
         """
         Extract trade data using simple keyword detection from OCR text.
@@ -2186,18 +2175,36 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
             status=trade_status
         )
     
-    async def analyze_images(self, files: List[UploadFile] = None, language: str = "English", base64_images: List[str] = None, parsed_data: dict = None) -> 'MultiImageAnalysisResponse':
-        """Main analysis entry point. Accepts files, base64_images, or pre-extracted parsed_data dict."""
+    async def analyze_images(self, files: List[UploadFile] = None, language: str = "English", base64_images: List[str] = None, parsed_data: dict = None, mode: str = "full") -> 'MultiImageAnalysisResponse':
+        """Main analysis entry point. Accepts files, base64_images, or pre-extracted parsed_data dict.
+
+        mode="score_only" returns a ScoreResponse: score, badge and flags from the rules
+        engine, with no narrative or translation calls. mode="template" returns the full
+        response with the template narrative (English, untranslated flags, no model call
+        after extraction).
+        """
+        if mode not in ANALYSIS_MODES:
+            raise ValueError(f"Invalid mode: {mode} (expected one of {', '.join(ANALYSIS_MODES)})")
+        score_only = mode == "score_only"
+        template = mode == "template"
+        skipped_pages: List[dict] = []
         try:
             if parsed_data is None and base64_images is None and files is not None:
-                validated_files = await self._validate_files(files)
+                report_progress(INGESTING)
+                documents = await self._ingest_files(files)
+                skipped_pages = merged_uploads(documents)
                 try:
-                    parsed_data = await self.gemini_extractor.extract_quote_data(validated_files)
+                    report_progress(EXTRACTING)
+                    parsed_data = await self.gemini_extractor.extract_quote_data(documents)
                     if isinstance(parsed_data, dict):
                         parsed_data["has_vision_extraction"] = True
                 except Exception as e:
                     print(f"[contract] Gemini extraction failed, falling back to Claude vision: {str(e)}")
-                    base64_images = await self._convert_files_to_base64(validated_files)
+                    selection = await select_pages(documents)
+                    skipped_pages = merged_uploads(documents) + selection.skipped_pages()
+                    report_progress(EXTRACTING)
+                    # Documents, not base64 strings: each page is encoded only while the request body is sent
+                    base64_images = list(await vision_pages(selection.bundle))
 
             if parsed_data is not None:
                 # Always run through converter for consistent structure
@@ -2205,15 +2212,20 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
                 parsed = convert_extracted_json_to_parsed(parsed_data)
                 print("JSON path: using split deterministic scoring + narrative generation...")
             elif base64_images is None:
-                validated_files = await self._validate_files(files)
-                if not validated_files:
+                report_progress(INGESTING)
+                documents = await self._ingest_files(files)
+                if not len(documents):
                     raise ValueError("No valid image files provided")
 
-                base64_images = await self._convert_files_to_base64(validated_files)
+                selection = await select_pages(documents)
+                skipped_pages = merged_uploads(documents) + selection.skipped_pages()
+                report_progress(EXTRACTING)
+                # Documents, not base64 strings: each page is encoded only while the request body is sent
+                base64_images = list(await vision_pages(selection.bundle))
                 api_response = self._call_openai_api(base64_images, language=language)
                 parsed = self._parse_api_response(api_response)
             else:
-                base64_images = [img.split(",", 1)[1] if img.startswith("data:") and "," in img else img for img in base64_images]
+                base64_images = [img.split(",", 1)[1] if isinstance(img, str) and img.startswith("data:") and "," in img else img for img in base64_images]
                 api_response = self._call_openai_api(base64_images, language=language)
                 parsed = self._parse_api_response(api_response)
             
@@ -2228,62 +2240,22 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
             if parsed.get("selling_price") is None and parsed.get("sale_price") is not None:
                 parsed["selling_price"] = parsed.get("sale_price")
 
-            # --- SmartBuyer scoring engine (rules-driven) ---
-            rules = load_rules()
-            upstream_flags = build_active_flags(parsed.get("flags", []), rules.flag_registry, "upstream")
-            computed_flags = compute_flags_from_parsed(parsed, rules, mode="CONTRACT")
-            all_flags = upstream_flags + computed_flags
-
-            scoring_result = score_flags(
-                all_flags,
-                rules,
-                parsed.get("audit_status", "COMPLETE")
-            )
-
-            def _to_output_flag(active_flag: "ActiveFlag") -> Flag:
-                deduction = None
-                bonus = None
-                if active_flag.points < 0:
-                    deduction = int(round(abs(active_flag.adjusted_points)))
-                elif active_flag.points > 0:
-                    bonus = int(round(abs(active_flag.points)))
-                return Flag(
-                    type=active_flag.flag_id,
-                    message=active_flag.message,
-                    item=active_flag.group,
-                    deduction=deduction,
-                    bonus=bonus
-                )
+            if score_only:
+                return score_only_response(parsed, "CONTRACT", ScoreResponse, self._assign_badge, skipped_pages)
 
-            red_flags: List[Flag] = []
-            green_flags: List[Flag] = []
-            blue_flags: List[Flag] = []
-            for active_flag in scoring_result.flags:
-                if active_flag.suppressed or active_flag.group == "SYSTEM":
-                    continue
-                flag_obj = _to_output_flag(active_flag)
-                if active_flag.group == "POSITIVE":
-                    green_flags.append(flag_obj)
-                elif active_flag.group == "DEALER_CONDUCT":
-                    red_flags.append(flag_obj)
-                else:
-                    blue_flags.append(flag_obj)
-
-            # Manually inject the GAP blue flag if GAP is missing from line items
-            has_gap = False
-            for item in parsed.get("line_items", []):
-                if isinstance(item, dict):
-                    desc = str(item.get("description") or item.get("item") or "").lower()
-                    if "gap" in desc.split() or "guaranteed asset" in desc or "debt cancellation" in desc:
-                        has_gap = True
-                        break
-            if not has_gap:
-                blue_flags.append(Flag(type="Protection Review", message="GAP not shown on quote — ask before finalizing", item="GAP"))
-
-
-            red_flags = self._translate_flags(red_flags, language)
-            green_flags = self._translate_flags(green_flags, language)
-            blue_flags = self._translate_flags(blue_flags, language)
+            report_progress(SCORING)
+            # --- SmartBuyer scoring engine (rules-driven) ---
+            scoring_result = score_parsed(parsed, mode="CONTRACT")
+            groups = output_flags(parsed, scoring_result)
+            red_flags = [Flag(**flag) for flag in groups["red_flags"]]
+            green_flags = [Flag(**flag) for flag in groups["green_flags"]]
+            blue_flags = [Flag(**flag) for flag in groups["blue_flags"]]
+
+            report_progress(NARRATIVE)
+            if not template:
+                red_flags = self._translate_flags(red_flags, language)
+                green_flags = self._translate_flags(green_flags, language)
+                blue_flags = self._translate_flags(blue_flags, language)
 
             if not red_flags:
                 red_flags.append(Flag(type="General", message="No major issues identified — verify all terms and pricing before finalizing.", item="General"))
@@ -2296,7 +2268,9 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
             score_value = float(scoring_result.score_int)
             trade_data = self._extract_trade_data(parsed)
 
-            if not parsed.get("_ai_narrative_done"):
+            if template:
+                narrative_obj, _ai_buyer_msg_override = {}, None
+            elif not parsed.get("_ai_narrative_done"):
                 ai_result = self._call_narrative_api(parsed, score_value, red_flags, green_flags, blue_flags, language)
                 narrative_obj = ai_result.get("narrative", {}) if isinstance(ai_result, dict) else {}
                 if not isinstance(narrative_obj, dict):
@@ -2309,24 +2283,13 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
             if "trust_score_summary" in narrative_obj and "smartbuyer_score_summary" not in narrative_obj:
                 narrative_obj["smartbuyer_score_summary"] = narrative_obj.pop("trust_score_summary")
 
-            defaults = {
-                "vehicle_overview": f"Deal analysis for {parsed.get('dealer_name', 'this dealer')}.",
-                "smartbuyer_score_summary": f"SmartBuyer Score: {score_value}/100.",
-                "score_breakdown": f"Final Score: {score_value}",
-                "market_comparison": "Market comparison pending.",
-                "gap_logic": "GAP analysis pending.",
-                "vsc_logic": "VSC analysis pending.",
-                "apr_bonus_rule": "APR analysis pending.",
-                "lease_audit": "N/A - Purchase Agreement",
-                "trade": trade_data.status if trade_data else "No trade-in on this deal.",
-                "negotiation_insight": "Review all flags before signing.",
-                "final_recommendation": "Proceed with caution based on the flags above.",
-            }
-            for k, v in defaults.items():
-                if not narrative_obj.get(k):
-                    narrative_obj[k] = v
+            # Template text for every section the model left empty (all of them in template mode)
+            template_obj, template_msg = build_narrative(
+                parsed, score_value, red_flags, green_flags, blue_flags, trade_data.status if trade_data else None, kind="contract"
+            )
+            fill_narrative(narrative_obj, template_obj)
 
-            buyer_msg = _ai_buyer_msg_override or f"Your SmartBuyer score is {score_value}/100 — review the flags above."
+            buyer_msg = _ai_buyer_msg_override or template_msg
             narrative = Narrative(**narrative_obj)
 
             return MultiImageAnalysisResponse(
@@ -2359,8 +2322,11 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
                     status=(trade_data.status if trade_data else "No trade identified")
                 ),
                 bundle_abuse=parsed.get("bundle_abuse", {"active": False, "deduction": 0}),
-                narrative=narrative
+                narrative=narrative,
+                skipped_pages=skipped_pages
             )
+        except UnreadablePageError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Contract analysis failed: {str(e)}")
 
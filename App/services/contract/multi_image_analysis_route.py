@@ -1,49 +1,72 @@
 from fastapi import APIRouter, HTTPException, File, UploadFile, Form
-from typing import List
-from .multi_image_analysis_schema import MultiImageAnalysisResponse, ContractJsonRequest
+from typing import List, Union
+from .multi_image_analysis_schema import MultiImageAnalysisResponse, ContractJsonRequest, ScoreResponse
 from .multi_image_analysis import MultiImageAnalyzer
 
 router = APIRouter(prefix="/api", tags=["contract"])
 analyzer = MultiImageAnalyzer()
 
 
-@router.post("/contract_analyze", response_model=MultiImageAnalysisResponse)
+@router.post("/contract_analyze", response_model=Union[MultiImageAnalysisResponse, ScoreResponse])
 async def analyze_contract_upload(
     files: List[UploadFile] = File(
         ...,
         description="Upload image files (jpg, png, gif, bmp, webp, pdf, tiff)"
     ),
-    language: str = Form(default="English", description="Language for narrative parts")
+    language: str = Form(default="English", description="Language for narrative parts"),
+    mode: str = Form(default="full", description="full, template for a template narrative without model calls, or score_only for score, badge and flags only")
 ):
     """
     Analyze multiple contract image files (file upload) and provide a comprehensive rating.
 
     - **files**: Multiple image files (jpg, png, gif, bmp, webp, pdf, tiff) — up to 10MB per file
     - **language**: Language for narrative parts (default: English)
+    - **mode**: `score_only` skips narrative and translation (one extraction call); `template` also skips them but returns the full response with a template narrative (English)
     """
     try:
-        result = await analyzer.analyze_images(files, language=language)
+        result = await analyzer.analyze_images(files, language=language, mode=mode)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        error_msg = str(e)
+        if "timeout" in error_msg.lower():
+            raise HTTPException(status_code=504, detail=f"Analysis timeout: {error_msg}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {error_msg}")
 
 
-@router.post("/contract_analyze/json", response_model=MultiImageAnalysisResponse)
+@router.post("/contract_analyze/json", response_model=Union[MultiImageAnalysisResponse, ScoreResponse])
 async def analyze_contract_json(request: ContractJsonRequest):
     """
     Analyze contract via JSON body.
 
     - **data**: Pre-extracted JSON data dict for contract analysis
     - **language**: Language for narrative parts (default: English)
+    - **mode**: `template` (full response, template narrative in English) and `score_only` skip every model call
     """
     try:
-        result = await analyzer.analyze_images(language=request.language, parsed_data=request.data)
+        result = await analyzer.analyze_images(language=request.language, parsed_data=request.data, mode=request.mode)
         return result
     except HTTPException:
         raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        error_msg = str(e)
+        if "timeout" in error_msg.lower():
+            raise HTTPException(status_code=504, detail=f"Analysis timeout: {error_msg}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {error_msg}")
+
+
+@router.post("/contract_analyze/score", response_model=ScoreResponse)
+async def score_contract_json(request: ContractJsonRequest):
+    """
+    Score pre-extracted contract JSON with the rules engine only: score, badge and flags,
+    no model calls. `language` and `mode` are ignored.
+    """
+    try:
+        return await analyzer.analyze_images(parsed_data=request.data, mode="score_only")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Scoring failed: {str(e)}")
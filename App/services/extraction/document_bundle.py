@@ -0,0 +1,253 @@
+"""
+Single-pass upload ingestion.
+
+Each UploadFile is streamed exactly once into an immutable UploadedDocument
+(bytes, sha256, sniffed MIME type, lazily computed page count / text layer).
+Analyzers and extractors take a DocumentBundle instead of re-reading
+and seeking the uploads. ingest_uploads() extracts the PDF text layers in the
+CPU process pool up front, so reading them later never blocks the event loop.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+from fastapi import UploadFile
+
+from App.core.cpu_pool import run_cpu
+from .request_body import Base64Data
+
+if TYPE_CHECKING:
+    from .image_preprocess import PreprocessReport
+    from .page_dedupe import DuplicateGroup
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+_CHUNK_SIZE = 1024 * 1024
+
+_EXTENSION_MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+    ".webp": "image/webp",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+}
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """MIME type from the file signature, or None if it is not a supported document."""
+    if head.startswith(b"%PDF-"):
+        return "application/pdf"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith((b"II*\x00", b"MM\x00*")):
+        return "image/tiff"
+    return None
+
+
+def sniff_base64_mime_type(data: str) -> Optional[str]:
+    try:
+        head = base64.b64decode(data[:24])
+    except (binascii.Error, ValueError):
+        return None
+    return sniff_mime_type(head)
+
+
+def anthropic_source_block(data: "VisionImage", mime_type: Optional[str] = None) -> dict:
+    """
+    Messages API content block for one base64 payload: a document block for
+    PDFs, an image block (with its real media type) otherwise. An
+    UploadedDocument is embedded as Base64Data and only encoded while a
+    request_body.JsonBody is being sent.
+    """
+    if isinstance(data, UploadedDocument):
+        mime_type = mime_type or data.mime_type
+        encoded: Union[str, Base64Data] = Base64Data(data.content)
+    else:
+        mime_type = mime_type or sniff_base64_mime_type(data) or "image/jpeg"
+        encoded = data
+    source = {"type": "base64", "media_type": mime_type, "data": encoded}
+    if mime_type == "application/pdf":
+        return {"type": "document", "source": source}
+    return {"type": "image", "source": source}
+
+
+@dataclass(frozen=True)
+class UploadedDocument:
+    filename: str
+    content: bytes
+    sha256: str
+    mime_type: str
+    declared_type: Optional[str] = None
+    # 1-based page of the source PDF when this document is a rasterized page
+    page: Optional[int] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.mime_type == "application/pdf"
+
+    @cached_property
+    def page_texts(self) -> Tuple[str, ...]:
+        """PDF text layer, one entry per page; a single empty page for images."""
+        if not self.is_pdf:
+            return ("",)
+        try:
+            with fitz.open(stream=self.content, filetype="pdf") as pdf_document:
+                return tuple(page.get_text() for page in pdf_document)
+        except Exception as e:
+            print(f"Warning: Could not extract text from {self.filename}: {str(e)}")
+            return ()
+
+    @cached_property
+    def page_words(self) -> Tuple[Tuple[tuple, ...], ...]:
+        """PyMuPDF word layout per page: (x0, y0, x1, y1, word, block, line, word_no)."""
+        if not self.is_pdf:
+            return ()
+        try:
+            with fitz.open(stream=self.content, filetype="pdf") as pdf_document:
+                return tuple(tuple(page.get_text("words")) for page in pdf_document)
+        except Exception as e:
+            print(f"Warning: Could not read word layout from {self.filename}: {str(e)}")
+            return ()
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_texts) if self.is_pdf else 1
+
+    def _seed_text_layer(self, texts: Tuple[str, ...], words: Tuple[Tuple[tuple, ...], ...]) -> None:
+        # cached_property values live in the instance dict, which a frozen dataclass still allows
+        self.__dict__["page_texts"] = texts
+        self.__dict__["page_words"] = words
+
+
+def pdf_text_layer(content: bytes) -> Tuple[Tuple[str, ...], Tuple[Tuple[tuple, ...], ...]]:
+    """page_texts and page_words of a PDF in one pass. Blocking; runs in the CPU pool."""
+    texts, words = [], []
+    with fitz.open(stream=content, filetype="pdf") as pdf_document:
+        for page in pdf_document:
+            texts.append(page.get_text())
+            words.append(tuple(page.get_text("words")))
+    return tuple(texts), tuple(words)
+
+
+async def load_text_layers(documents: Iterable[UploadedDocument]) -> None:
+    """Extract the text layer of every PDF not read yet, in the CPU pool."""
+    pending = [doc for doc in documents if doc.is_pdf and "page_texts" not in doc.__dict__]
+    results = await asyncio.gather(
+        *[run_cpu("pdf_text_layer", pdf_text_layer, doc.content) for doc in pending],
+        return_exceptions=True,
+    )
+    for doc, result in zip(pending, results):
+        if isinstance(result, Exception):
+            # Same outcome as the lazy path: an unreadable PDF, never retried on the event loop
+            print(f"Warning: Could not extract text from {doc.filename}: {str(result)}")
+            doc._seed_text_layer((), ())
+        else:
+            doc._seed_text_layer(*result)
+
+
+# What vision calls accept per page: a base64 string from the caller, or an uploaded document
+VisionImage = Union[str, UploadedDocument]
+
+
+@dataclass(frozen=True)
+class DocumentBundle:
+    documents: Tuple[UploadedDocument, ...]
+    # set once the images have gone through image_preprocess.preprocess_bundle
+    preprocessing: Optional["PreprocessReport"] = None
+    # retakes merged away by page_dedupe.dedupe_bundle
+    duplicates: Tuple["DuplicateGroup", ...] = ()
+
+    def __iter__(self) -> Iterator[UploadedDocument]:
+        return iter(self.documents)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @property
+    def page_count(self) -> int:
+        return sum(doc.page_count for doc in self.documents)
+
+    def page_texts(self) -> List[str]:
+        return [text for doc in self.documents for text in doc.page_texts]
+
+
+async def read_upload(
+    file: UploadFile,
+    max_bytes: Optional[int] = MAX_UPLOAD_BYTES,
+    allowed_extensions: Optional[Iterable[str]] = None,
+) -> UploadedDocument:
+    """
+    Stream one upload into an UploadedDocument.
+
+    Rejects (ValueError) unsupported extensions, files over max_bytes — from
+    the declared size when the client sent one, otherwise while reading — and,
+    when allowed_extensions is given, content that is not a known document type.
+    """
+    filename = file.filename or ""
+    extension = os.path.splitext(filename)[1].lower()
+    if allowed_extensions is not None and extension not in allowed_extensions:
+        raise ValueError(f"Invalid file type: {filename}")
+    if max_bytes is not None and file.size is not None and file.size > max_bytes:
+        raise ValueError(f"File too large: {filename}")
+
+    digest = hashlib.sha256()
+    chunks = []
+    total = 0
+    await file.seek(0)
+    while True:
+        chunk = await file.read(_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if max_bytes is not None and total > max_bytes:
+            raise ValueError(f"File too large: {filename}")
+        digest.update(chunk)
+        chunks.append(chunk)
+    content = b"".join(chunks)
+
+    mime_type = sniff_mime_type(content[:16])
+    if mime_type is None:
+        if allowed_extensions is not None:
+            raise ValueError(f"Unrecognized file content: {filename}")
+        declared = file.content_type if file.content_type and file.content_type != "application/octet-stream" else None
+        mime_type = declared or _EXTENSION_MIME_TYPES.get(extension, "image/jpeg")
+
+    return UploadedDocument(
+        filename=filename,
+        content=content,
+        sha256=digest.hexdigest(),
+        mime_type=mime_type,
+        declared_type=file.content_type,
+    )
+
+
+async def ingest_uploads(
+    files: List[UploadFile],
+    max_bytes: Optional[int] = MAX_UPLOAD_BYTES,
+    allowed_extensions: Optional[Iterable[str]] = None,
+) -> DocumentBundle:
+    allowed = {ext.lower() for ext in allowed_extensions} if allowed_extensions is not None else None
+    documents = [await read_upload(file, max_bytes, allowed) for file in files or []]
+    await load_text_layers(documents)
+    return DocumentBundle(tuple(documents))
@@ -0,0 +1,183 @@
+"""
+Paper boundary detection and perspective correction for phone photos.
+
+Works on a small grayscale copy: Otsu threshold separates the (bright) paper
+from the background, the largest bright connected region is taken as the
+page, and its four corners are the extreme points along the two diagonals.
+The original image is then warped so that quadrilateral becomes an upright
+rectangle. Anything that does not look like a page on a background (region
+too small, already filling the frame, badly skewed) is left untouched.
+
+    IMAGE_DOCUMENT_CROP   on (default) or off
+"""
+import os
+from collections import deque
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageFilter
+
+Point = Tuple[float, float]
+
+# Longest edge of the working copy used to find the page
+_DETECT_EDGE = 256
+# Page must cover this share of the frame; above the upper bound the photo is already cropped
+_MIN_AREA = 0.2
+_MAX_AREA = 0.9
+# Paper must be this much brighter (0-255) than the background
+_MIN_SEPARATION = 30
+# Opposite sides may differ in length by at most this factor
+_MAX_SIDE_RATIO = 1.6
+
+
+def crop_enabled() -> bool:
+    return os.getenv("IMAGE_DOCUMENT_CROP", "on").lower() not in ("off", "false", "0")
+
+
+def _otsu(histogram: Sequence[int]) -> int:
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_level, best_variance = 0, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def _largest_region(mask: bytes, width: int, height: int) -> List[int]:
+    """Pixel indices of the largest 4-connected region of set pixels."""
+    seen = bytearray(len(mask))
+    best: List[int] = []
+    for start in range(len(mask)):
+        if not mask[start] or seen[start]:
+            continue
+        region = []
+        queue = deque([start])
+        seen[start] = 1
+        while queue:
+            index = queue.popleft()
+            region.append(index)
+            x, y = index % width, index // width
+            for neighbour, inside in (
+                (index - 1, x > 0), (index + 1, x < width - 1),
+                (index - width, y > 0), (index + width, y < height - 1),
+            ):
+                if inside and mask[neighbour] and not seen[neighbour]:
+                    seen[neighbour] = 1
+                    queue.append(neighbour)
+        if len(region) > len(best):
+            best = region
+    return best
+
+
+def _distance(a: Point, b: Point) -> float:
+    return ((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5
+
+
+def _polygon_area(points: Sequence[Point]) -> float:
+    return abs(sum(
+        points[i][0] * points[(i + 1) % len(points)][1] - points[(i + 1) % len(points)][0] * points[i][1]
+        for i in range(len(points))
+    )) / 2.0
+
+
+def find_document_quad(image: Image.Image) -> Optional[Tuple[Point, Point, Point, Point]]:
+    """(top-left, top-right, bottom-right, bottom-left) of the page in image coordinates, or None."""
+    small = image.convert("L")
+    small.thumbnail((_DETECT_EDGE, _DETECT_EDGE))
+    small = small.filter(ImageFilter.MedianFilter(5))
+    width, height = small.size
+    histogram = small.histogram()
+    threshold = _otsu(histogram)
+    pixels = small.tobytes()
+    mask = bytes(1 if value > threshold else 0 for value in pixels)
+
+    region = _largest_region(mask, width, height)
+    if len(region) < _MIN_AREA * width * height:
+        return None
+    region_set = set(region)
+    paper = sum(pixels[i] for i in region) / len(region)
+    background_pixels = [pixels[i] for i in range(len(pixels)) if i not in region_set]
+    if not background_pixels:
+        return None
+    if paper - sum(background_pixels) / len(background_pixels) < _MIN_SEPARATION:
+        return None
+
+    coordinates = [(i % width, i // width) for i in region]
+    top_left = min(coordinates, key=lambda p: p[0] + p[1])
+    bottom_right = max(coordinates, key=lambda p: p[0] + p[1])
+    top_right = max(coordinates, key=lambda p: p[0] - p[1])
+    bottom_left = min(coordinates, key=lambda p: p[0] - p[1])
+    quad = (top_left, top_right, bottom_right, bottom_left)
+
+    area = _polygon_area(quad) / (width * height)
+    if not _MIN_AREA <= area <= _MAX_AREA:
+        return None
+    sides = [_distance(quad[i], quad[(i + 1) % 4]) for i in range(4)]
+    if min(sides) == 0:
+        return None
+    if max(sides[0], sides[2]) / min(sides[0], sides[2]) > _MAX_SIDE_RATIO:
+        return None
+    if max(sides[1], sides[3]) / min(sides[1], sides[3]) > _MAX_SIDE_RATIO:
+        return None
+
+    scale_x, scale_y = image.width / width, image.height / height
+    # Pixel centres of the working copy, mapped back to the full-size image
+    return tuple(((x + 0.5) * scale_x, (y + 0.5) * scale_y) for x, y in quad)
+
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> List[float]:
+    """Gaussian elimination with partial pivoting for the 8x8 perspective system."""
+    size = len(vector)
+    rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if abs(rows[col][col]) < 1e-12:
+            raise ValueError("degenerate quadrilateral")
+        for r in range(size):
+            if r != col:
+                factor = rows[r][col] / rows[col][col]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[col])]
+    return [rows[i][size] / rows[i][i] for i in range(size)]
+
+
+def perspective_coefficients(target: Sequence[Point], source: Sequence[Point]) -> List[float]:
+    """PIL PERSPECTIVE data mapping output (target) points back to input (source) points."""
+    matrix, vector = [], []
+    for (x, y), (u, v) in zip(target, source):
+        matrix.append([x, y, 1, 0, 0, 0, -u * x, -u * y])
+        matrix.append([0, 0, 0, x, y, 1, -v * x, -v * y])
+        vector.extend([u, v])
+    return _solve(matrix, vector)
+
+
+def crop_to_document(image: Image.Image) -> Tuple[Image.Image, bool]:
+    """The page cut out of the photo and squared up; (image, False) when no page is found."""
+    quad = find_document_quad(image)
+    if quad is None:
+        return image, False
+    top_left, top_right, bottom_right, bottom_left = quad
+    width = int(round(max(_distance(top_left, top_right), _distance(bottom_left, bottom_right))))
+    height = int(round(max(_distance(top_left, bottom_left), _distance(top_right, bottom_right))))
+    if width < 2 or height < 2:
+        return image, False
+    try:
+        coefficients = perspective_coefficients(
+            [(0, 0), (width, 0), (width, height), (0, height)],
+            quad,
+        )
+    except ValueError:
+        return image, False
+    warped = image.transform((width, height), Image.Transform.PERSPECTIVE, coefficients, Image.Resampling.BICUBIC)
+    return warped, True
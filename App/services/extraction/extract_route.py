@@ -56,5 +56,8 @@ async def upload_and_extract(
         else:
             return {"result": parsed, "detected_apr": detected_apr}
 
+    except ValueError as e:
+        # Unsupported uploads and illegible photos (UnreadablePageError)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
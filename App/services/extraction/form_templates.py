@@ -0,0 +1,269 @@
+"""
+Deterministic extraction for known pre-printed forms.
+
+A template fingerprints a document by its form number (regex over the PDF
+text layer) plus a few anchor phrases, then reads fields off the PyMuPDF word
+layout: find the anchor label, take the first value of the right kind to its
+right on the same row or in the box directly below it.
+
+Only digital PDFs (with a text layer) can match. Scans fall through to the
+model as before. The result says which QuoteExtraction fields were resolved
+so the model is only relied on for the rest.
+"""
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from .document_bundle import DocumentBundle
+
+Path = Tuple[str, str]
+
+_PUNCTUATION = re.compile(r"[^\w%$.\-/]")
+_MONEY = re.compile(r"^\(?-?\$?\(?(\d{1,3}(?:,\d{3})+|\d+)(\.\d{1,2})?\)?$")
+_PERCENT = re.compile(r"^(\d{1,2}(?:\.\d{1,3})?)%?$")
+_INTEGER = re.compile(r"^\d{1,3}$")
+_VIN = re.compile(r"\b[A-HJ-NPR-Z0-9]{17}\b")
+
+# How far (points) below an anchor a boxed value may sit, and how far a row may drift
+_BELOW_WINDOW = 42.0
+_ROW_SLACK = 3.0
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    path: Path
+    anchor: str
+    kind: str = "money"        # money | percent | int | text
+    direction: str = "right"   # right | below
+    also: Tuple[Path, ...] = ()
+
+
+@dataclass(frozen=True)
+class FormTemplate:
+    name: str
+    form_number: "re.Pattern[str]"
+    anchors: Tuple[str, ...]
+    fields: Tuple[FieldSpec, ...]
+    required: Tuple[Path, ...]
+    constants: Tuple[Tuple[Path, Any], ...] = ()
+
+
+@dataclass
+class TemplateResult:
+    template: FormTemplate
+    form_number: str
+    values: Dict[Path, Any] = field(default_factory=dict)
+
+    @property
+    def missing_required(self) -> List[Path]:
+        return [path for path in self.template.required if self.values.get(path) is None]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing_required
+
+    def apply(self, extraction: dict) -> dict:
+        """Write resolved values into a QuoteExtraction-shaped dict (template wins)."""
+        for (section, key), value in self.values.items():
+            if value is None:
+                continue
+            target = extraction.get(section)
+            if not isinstance(target, dict):
+                target = extraction[section] = {}
+            target[key] = value
+        return extraction
+
+    def prompt_hint(self) -> str:
+        resolved = ", ".join(f"{s}.{k}={v}" for (s, k), v in self.values.items() if v is not None)
+        return (
+            f"This document is form {self.form_number}. These fields were already read deterministically "
+            f"and will override yours: {resolved}. Focus on the remaining fields."
+        )
+
+
+# ─── Word layout helpers ───
+
+def _norm(token: str) -> str:
+    return _PUNCTUATION.sub("", token).lower()
+
+
+@dataclass(frozen=True)
+class _Word:
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    text: str
+    norm: str
+    line: Tuple[int, int]
+    order: int
+
+
+class _PageLayout:
+    def __init__(self, words: Sequence[tuple]):
+        self.words = [
+            _Word(w[0], w[1], w[2], w[3], w[4], _norm(w[4]), (w[5], w[6]), index)
+            for index, w in enumerate(sorted(words, key=lambda w: (w[5], w[6], w[7])))
+        ]
+        self.lines: Dict[Tuple[int, int], List[_Word]] = defaultdict(list)
+        for word in self.words:
+            self.lines[word.line].append(word)
+
+    def find(self, phrase: str) -> List[List[_Word]]:
+        tokens = [_norm(t) for t in phrase.split()]
+        hits = []
+        for line in self.lines.values():
+            norms = [w.norm for w in line]
+            for start in range(len(norms) - len(tokens) + 1):
+                if norms[start:start + len(tokens)] == tokens:
+                    hits.append(line[start:start + len(tokens)])
+        return hits
+
+    def right_of(self, anchor: List[_Word]) -> List[_Word]:
+        last = anchor[-1]
+        top, bottom = min(w.y0 for w in anchor) - _ROW_SLACK, max(w.y1 for w in anchor) + _ROW_SLACK
+        row = [
+            w for w in self.words
+            if w.x0 >= last.x1 - 0.5 and w.order != last.order
+            and top <= (w.y0 + w.y1) / 2 <= bottom
+        ]
+        return sorted(row, key=lambda w: w.x0)
+
+    def below(self, anchor: List[_Word]) -> List[_Word]:
+        left, right = anchor[0].x0 - 20.0, anchor[-1].x1 + 60.0
+        floor = max(w.y1 for w in anchor)
+        box = [
+            w for w in self.words
+            if floor - 0.5 <= w.y0 <= floor + _BELOW_WINDOW and w.x1 >= left and w.x0 <= right
+            and w not in anchor
+        ]
+        return sorted(box, key=lambda w: (round(w.y0), w.x0))
+
+
+def _parse(kind: str, words: List[_Word]) -> Any:
+    for index, word in enumerate(words):
+        token = word.text.strip()
+        if kind == "money":
+            # "$" on its own, and line references such as "(1 minus 2)"
+            if token == "$" or not token or token.count("(") != token.count(")"):
+                continue
+            match = _MONEY.match(token)
+            if match:
+                negative = token.startswith("(") or token.startswith("-")
+                value = float(match.group(1).replace(",", "") + (match.group(2) or ""))
+                return -value if negative else value
+        elif kind == "percent":
+            match = _PERCENT.match(token)
+            if match and (token.endswith("%") or (index + 1 < len(words) and words[index + 1].text == "%")):
+                return float(match.group(1))
+        elif kind == "int":
+            if _INTEGER.match(token):
+                return int(token)
+        elif kind == "text":
+            line = [w for w in words if w.line == word.line]
+            text = " ".join(w.text for w in line).strip()
+            return text or None
+    return None
+
+
+# ─── Templates ───
+
+_TILA = "tila_disclosures"
+_ITEM = "itemization_of_amount_financed"
+_TERMS = "financial_terms"
+_SCHED = "payment_schedule"
+_TRADE = "trade_in"
+
+LAW_553 = FormTemplate(
+    name="LAW 553-ARB",
+    form_number=re.compile(r"LAW\s*553-[A-Z]{2}-ARB(?:-[a-z])?(?:\s+\d{1,2}/\d{2})?"),
+    anchors=("itemization of amount financed", "annual percentage rate", "total of payments"),
+    fields=(
+        FieldSpec((_TILA, "annual_percentage_rate"), "annual percentage rate", "percent", "below", also=((_TERMS, "apr"),)),
+        FieldSpec((_TILA, "finance_charge"), "finance charge", "money", "below", also=((_TERMS, "finance_charge"),)),
+        FieldSpec((_TILA, "amount_financed"), "amount financed", "money", "below", also=((_TERMS, "loan_amount"),)),
+        FieldSpec((_TILA, "total_of_payments"), "total of payments", "money", "below"),
+        FieldSpec((_TILA, "total_sale_price"), "total sale price", "money", "below"),
+        FieldSpec((_SCHED, "number_of_payments"), "number of payments", "int", "below", also=((_TERMS, "term_months"),)),
+        FieldSpec((_SCHED, "payment_amount"), "amount of payments", "money", "below", also=((_TERMS, "monthly_payment"),)),
+        FieldSpec((_ITEM, "cash_price_including_accessories"), "cash price", "money", "right",
+                  also=((_TERMS, "cash_price"), ("vehicle_details", "sale_price"))),
+        FieldSpec((_TERMS, "sales_tax"), "sales tax", "money", "right", also=((_ITEM, "sales_tax_on_cash_price"),)),
+        FieldSpec((_ITEM, "gross_trade_in"), "gross trade-in", "money", "right", also=((_TRADE, "gross_trade_in"), (_TERMS, "trade_in_value"))),
+        FieldSpec((_ITEM, "payoff_by_seller"), "pay off made by seller", "money", "right",
+                  also=((_TRADE, "trade_payoff"), (_TRADE, "payoff_to_lender"))),
+        FieldSpec((_ITEM, "net_trade_allowance"), "net trade-in", "money", "right", also=((_TRADE, "net_trade_allowance"),)),
+        FieldSpec((_ITEM, "manufacturers_rebate"), "manufacturer's rebate", "money", "right", also=((_TERMS, "manufacturers_rebate"),)),
+        FieldSpec((_ITEM, "total_downpayment"), "total downpayment", "money", "right", also=((_TERMS, "total_downpayment"),)),
+        FieldSpec((_ITEM, "unpaid_balance_of_cash_price"), "unpaid balance of cash price", "money", "right",
+                  also=((_TERMS, "unpaid_balance_of_cash_price"),)),
+        FieldSpec((_ITEM, "total_other_charges_and_paid_to_others"), "total other charges and amounts paid to others", "money", "right",
+                  also=((_TERMS, "total_other_charges"),)),
+        FieldSpec((_ITEM, "amount_financed"), "amount financed", "money", "right", also=((_TERMS, "amount_financed_line5"),)),
+        FieldSpec(("fees_breakdown", "documentary_fee"), "documentary fee", "money", "right", also=((_TERMS, "doc_fee"),)),
+        FieldSpec(("fees_breakdown", "debt_cancellation_fee"), "debt cancellation agreement", "money", "right"),
+        FieldSpec(("legal_clauses", "returned_payment_charge"), "returned payment charge", "money", "right"),
+        FieldSpec(("buyer_info", "name"), "buyer name and address", "text", "below"),
+        FieldSpec(("dealer_info", "name"), "seller-creditor", "text", "below"),
+    ),
+    required=(
+        (_TILA, "annual_percentage_rate"),
+        (_TILA, "finance_charge"),
+        (_TILA, "amount_financed"),
+        (_TILA, "total_of_payments"),
+        (_SCHED, "number_of_payments"),
+        (_SCHED, "payment_amount"),
+        (_ITEM, "cash_price_including_accessories"),
+    ),
+    constants=(
+        (("legal_clauses", "arbitration_provision"), True),
+        (("document_metadata", "document_title"), "Retail Installment Contract"),
+        (("document_metadata", "quote_type"), "Contract"),
+    ),
+)
+
+TEMPLATES: Tuple[FormTemplate, ...] = (LAW_553,)
+
+
+def _extract_fields(template: FormTemplate, layouts: List[_PageLayout]) -> Dict[Path, Any]:
+    values: Dict[Path, Any] = {}
+    for spec in template.fields:
+        value = None
+        for layout in layouts:
+            for anchor in sorted(layout.find(spec.anchor), key=lambda hit: (hit[0].y0, hit[0].x0)):
+                candidates = layout.right_of(anchor) if spec.direction == "right" else layout.below(anchor)
+                value = _parse(spec.kind, candidates)
+                if value is not None:
+                    break
+            if value is not None:
+                break
+        for path in (spec.path,) + spec.also:
+            if values.get(path) is None:
+                values[path] = value
+    return values
+
+
+def extract_with_template(bundle: DocumentBundle) -> Optional[TemplateResult]:
+    """Fingerprint the bundle against TEMPLATES and read its fields; None if no template matches."""
+    text = "\n".join(bundle.page_texts())
+    if not text.strip():
+        return None
+    lowered = " ".join(text.lower().split())
+    for template in TEMPLATES:
+        form_match = template.form_number.search(text)
+        if not form_match or not all(anchor in lowered for anchor in template.anchors):
+            continue
+        layouts = [_PageLayout(words) for doc in bundle if doc.is_pdf for words in doc.page_words]
+        values = _extract_fields(template, layouts)
+        vin = _VIN.search(text)
+        if vin:
+            values[("vehicle_details", "vin")] = vin.group(0)
+        values[("document_metadata", "form_number")] = " ".join(form_match.group(0).split())
+        for path, constant in template.constants:
+            values.setdefault(path, constant)
+        result = TemplateResult(template, values[("document_metadata", "form_number")], values)
+        resolved: Set[Path] = {path for path, value in values.items() if value is not None}
+        print(f"[template] {template.name}: {len(resolved)} field(s) resolved, missing required: {result.missing_required or 'none'}")
+        return result
+    return None
@@ -1,12 +1,19 @@
 import os
 import io
-import fitz # PyMuPDF
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from fastapi import UploadFile
 from google import genai
 from google.genai import types
 from pydantic import BaseModel, Field
 import traceback
+from itertools import groupby
+
+from .document_bundle import DocumentBundle, UploadedDocument, ingest_uploads
+from .form_templates import TemplateResult, extract_with_template
+from .image_quality import check_bundle
+from .image_preprocess import preprocess_bundle, rasterize_pdf
+from .text_layer import plan_pages
+from App.core.deadline import budget_timeout
 
 class DocumentMetadata(BaseModel):
     form_number: Optional[str] = None
@@ -202,34 +209,56 @@ class GeminiExtractor:
         self.model = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
         self.client = genai.Client(api_key=self.api_key) if self.api_key else genai.Client()
     
-    async def extract_quote_data(self, files: List[UploadFile]) -> Dict:
-        """Extract all quote/contract data using Gemini API"""
-        
-        # Extract per-page raw text using PyMuPDF for PDFs
-        page_texts = await self._extract_raw_text_pymupdf(files)
+    async def extract_quote_data(self, files: Union[List[UploadFile], DocumentBundle]) -> Dict:
+        """
+        Extract all quote/contract data using Gemini API. Raw uploads are put
+        through the legibility gate first; a DocumentBundle comes from an
+        analyzer that has already checked it.
+        """
+        if isinstance(files, DocumentBundle):
+            documents = files
+        else:
+            documents = await ingest_uploads(files, max_bytes=None)
+            await check_bundle(documents)
+        documents = await preprocess_bundle(documents)
+
+        # Per-page raw text from the PDF text layer (images contribute an empty page)
+        page_texts = documents.page_texts()
         full_raw_text = "\n\n--- PAGE BREAK ---\n\n".join(t for t in page_texts if t.strip())
 
-        # Collect files for Gemini prompt
-        contents = []
-        for file in files:
-            contents.append(
-                await self._file_to_genai_part(file)
-            )
+        # Known pre-printed forms are read straight off the word layout
+        template = extract_with_template(documents)
+        if template is not None and template.complete:
+            print(f"[template] {template.form_number}: all required fields resolved, skipping the model")
+            parsed = self._template_extraction(template)
+            parsed["extracted_text"] = {"raw_text": full_raw_text, "page_texts": page_texts}
+            return parsed
+
+        # Text layer for digital pages, images only where vision is needed
+        contents = await self._build_contents(documents)
+        if template is not None:
+            contents.append(template.prompt_hint())
 
         system_prompt = self._get_quote_extraction_prompt()
         contents.append(system_prompt)
 
+        config = {
+            "response_mime_type": "application/json",
+            "response_json_schema": QuoteExtraction.model_json_schema(),
+            "temperature": 0.0,
+        }
+        timeout = budget_timeout(None, "extraction")
+        if timeout is not None:
+            config["http_options"] = {"timeout": int(timeout * 1000)}  # milliseconds
         response = self.client.models.generate_content(
             model=self.model,
             contents=contents,
-            config={
-                "response_mime_type": "application/json",
-                "response_json_schema": QuoteExtraction.model_json_schema(),
-                "temperature": 0.0,
-            },
+            config=config,
         )
         
         parsed = QuoteExtraction.model_validate_json(response.text).model_dump()
+        if template is not None:
+            parsed = QuoteExtraction.model_validate(template.apply(parsed)).model_dump()
 
         # Merge raw text into parsed response
         if "extracted_text" not in parsed:
@@ -240,50 +269,57 @@ class GeminiExtractor:
 
         return parsed
 
-    async def _file_to_genai_part(self, file: UploadFile):
-        file_bytes = await file.read()
-        await file.seek(0)
-        
-        # Determine mime type
-        mime_type = file.content_type
-        if not mime_type or mime_type == "application/octet-stream":
-            filename = file.filename.lower()
-            if filename.endswith(".pdf"):
-                mime_type = "application/pdf"
-            elif filename.endswith(".png"):
-                mime_type = "image/png"
-            elif filename.endswith(".jpg") or filename.endswith(".jpeg"):
-                mime_type = "image/jpeg"
-            else:
-                mime_type = "image/jpeg" # fallback
-                
-        return types.Part.from_bytes(data=file_bytes, mime_type=mime_type)
-
-    async def _extract_raw_text_pymupdf(self, files: List[UploadFile]) -> List[str]:
-        """Extract per-page raw text from PDF files using PyMuPDF"""
-        page_texts = []
-
-        for file in files:
-            contents = await file.read()
-
-            try:
-                if file.filename.lower().endswith('.pdf') or (file.content_type and 'pdf' in file.content_type):
-                    pdf_document = fitz.open(stream=contents, filetype="pdf")
-                    for page_num in range(len(pdf_document)):
-                        page = pdf_document[page_num]
-                        text = page.get_text()
-                        page_texts.append(text)
-                    pdf_document.close()
+    async def _build_contents(self, documents: DocumentBundle) -> list:
+        """
+        Prompt parts for the bundle: the embedded text of PDF pages that have a
+        usable text layer, rendered images for scanned pages, images as-is.
+        A PDF with no usable text is sent whole, as before.
+        """
+        contents = []
+        text_pages = vision_pages = 0
+        for _, group in groupby(plan_pages(documents), key=lambda plan: id(plan.document)):
+            group = list(group)
+            document = group[0].document
+            scanned = [plan.page for plan in group if plan.use_vision]
+            if not document.is_pdf or len(scanned) == len(group):
+                contents.append(self._document_to_genai_part(document))
+                vision_pages += len(group)
+                continue
+
+            rendered = {page.page: page for page in await rasterize_pdf(document, scanned)} if scanned else {}
+            if any(number not in rendered for number in scanned):
+                contents.append(self._document_to_genai_part(document))
+                vision_pages += len(group)
+                continue
+            for plan in group:
+                if plan.use_vision:
+                    contents.append(self._document_to_genai_part(rendered[plan.page]))
+                    vision_pages += 1
                 else:
-                    # It's an image, PyMuPDF text extraction might not yield text directly
-                    page_texts.append("")
-            except Exception as e:
-                print(f"Warning: Could not extract text from {file.filename}: {str(e)}")
+                    contents.append(f"--- {document.filename} page {plan.page} (embedded text layer) ---\n{plan.text}")
+                    text_pages += 1
+
+        print(f"[text-layer] {text_pages} page(s) sent as text, {vision_pages} via vision")
+        if text_pages:
+            contents.append(
+                "Some pages above are given as their embedded PDF text layer instead of an image. "
+                "Treat that text as the visible content of those pages."
+            )
+        return contents
 
-            await file.seek(0)
+    def _template_extraction(self, template: TemplateResult) -> Dict:
+        """QuoteExtraction built only from a template match; fields the form does not carry stay null."""
+        blank = {name: {} for name, info in QuoteExtraction.model_fields.items() if info.is_required()}
+        parsed = template.apply(blank)
+        parsed["confidence"] = {
+            "score": 0.95,
+            "reason": f"Read deterministically from the {template.template.name} form layout",
+        }
+        return QuoteExtraction.model_validate(parsed).model_dump()
+
+    def _document_to_genai_part(self, document: UploadedDocument):
+        return types.Part.from_bytes(data=document.content, mime_type=document.mime_type)
 
-        return page_texts
-    
     def _get_quote_extraction_prompt(self) -> str:
         """Comprehensive system prompt — extract every visible field from any auto document."""
         return """
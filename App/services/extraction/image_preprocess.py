@@ -0,0 +1,296 @@
+"""
+Image preprocessing for vision calls.
+
+Every image page in a DocumentBundle is EXIF-rotated, cut down to the paper
+(see document_crop), downscaled to a pixel budget, converted to grayscale
+when it carries no meaningful colour, and re-encoded (JPEG by default, WebP
+optional). The CPU work runs in the shared process pool (App.core.cpu_pool)
+so the event loop is never blocked. PDFs pass through untouched.
+
+Settings come from the environment:
+    IMAGE_MAX_PIXELS          pixel budget per page (default 2048 * 1536)
+    IMAGE_OUTPUT_FORMAT       JPEG or WEBP (default JPEG)
+    IMAGE_QUALITY             encoder quality (default 85)
+    IMAGE_DOCUMENT_CROP       on (default) or off: cut photos down to the page
+    PDF_VISION_MODE           rasterize (default) or document
+    PDF_RASTER_DPI            render resolution for rasterized PDF pages (default 150)
+
+For Messages API vision calls, vision_pages() either renders PDFs page by
+page (spread over the same pool) or leaves them as native document blocks.
+"""
+import asyncio
+import hashlib
+import io
+import os
+from dataclasses import dataclass, field, replace
+from typing import List, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageOps, ImageStat
+
+from App.core.cpu_pool import pool_size, run_cpu
+from .document_bundle import DocumentBundle, UploadedDocument
+from .document_crop import crop_enabled, crop_to_document
+
+_FORMAT_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# Mean HSV saturation (0-255) below which a page is treated as grayscale
+_GRAYSCALE_SATURATION = 12.0
+
+
+@dataclass(frozen=True)
+class PreprocessSettings:
+    max_pixels: int = 2048 * 1536
+    output_format: str = "JPEG"
+    quality: int = 85
+    document_crop: bool = True
+
+    @classmethod
+    def from_env(cls) -> "PreprocessSettings":
+        output_format = os.getenv("IMAGE_OUTPUT_FORMAT", "JPEG").upper()
+        if output_format not in _FORMAT_MIME_TYPES:
+            output_format = "JPEG"
+        return cls(
+            max_pixels=int(os.getenv("IMAGE_MAX_PIXELS", str(cls.max_pixels))),
+            output_format=output_format,
+            quality=int(os.getenv("IMAGE_QUALITY", str(cls.quality))),
+            document_crop=crop_enabled(),
+        )
+
+
+@dataclass(frozen=True)
+class PageResult:
+    filename: str
+    bytes_in: int
+    bytes_out: int
+    size_in: Tuple[int, int] = (0, 0)
+    size_out: Tuple[int, int] = (0, 0)
+    grayscale: bool = False
+    cropped: bool = False
+    error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class PreprocessReport:
+    pages: Tuple[PageResult, ...] = field(default_factory=tuple)
+
+    @property
+    def bytes_in(self) -> int:
+        return sum(p.bytes_in for p in self.pages)
+
+    @property
+    def bytes_out(self) -> int:
+        return sum(p.bytes_out for p in self.pages)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def summary(self) -> str:
+        percent = (self.bytes_saved / self.bytes_in * 100) if self.bytes_in else 0.0
+        cropped = sum(p.cropped for p in self.pages)
+        return (
+            f"[preprocess] {len(self.pages)} image(s), {cropped} cropped to the page: "
+            f"{self.bytes_in:,} -> {self.bytes_out:,} bytes (saved {self.bytes_saved:,}, {percent:.1f}%)"
+        )
+
+
+def _is_grayscale(image: Image.Image) -> bool:
+    if image.mode in ("1", "L", "LA", "I", "F"):
+        return True
+    sample = image.convert("RGB")
+    sample.thumbnail((64, 64))
+    saturation = sample.convert("HSV").getchannel("S")
+    return ImageStat.Stat(saturation).mean[0] < _GRAYSCALE_SATURATION
+
+
+def _fit_and_encode(image: Image.Image, settings: PreprocessSettings) -> Tuple[bytes, Image.Image, bool, bool]:
+    """Downscale to the pixel budget, drop colour if there is none, encode. Returns (bytes, image, resized, grayscale)."""
+    pixels = image.width * image.height
+    resized = pixels > settings.max_pixels
+    if resized:
+        scale = (settings.max_pixels / pixels) ** 0.5
+        image = image.resize(
+            (max(1, int(image.width * scale)), max(1, int(image.height * scale))),
+            Image.Resampling.LANCZOS,
+        )
+    grayscale = _is_grayscale(image)
+    image = image.convert("L" if grayscale else "RGB")
+    output = io.BytesIO()
+    image.save(output, format=settings.output_format, quality=settings.quality, optimize=True)
+    return output.getvalue(), image, resized, grayscale
+
+
+def preprocess_image(content: bytes, settings: PreprocessSettings) -> Tuple[Optional[bytes], str, PageResult]:
+    """
+    Returns (content, mime_type, result) for one image; content is None when
+    the original should be kept. Runs in a worker process, so it only takes
+    and returns picklable values.
+    """
+    with Image.open(io.BytesIO(content)) as opened:
+        source_format = (opened.format or "").upper()
+        image = ImageOps.exif_transpose(opened)
+        size_in = image.size
+        cropped = False
+        if settings.document_crop:
+            image, cropped = crop_to_document(image)
+        encoded, image, resized, grayscale = _fit_and_encode(image, settings)
+
+    mime_type = _FORMAT_MIME_TYPES[settings.output_format]
+    result = PageResult(
+        filename="",
+        bytes_in=len(content),
+        bytes_out=len(encoded),
+        size_in=size_in,
+        size_out=image.size,
+        grayscale=grayscale,
+        cropped=cropped,
+    )
+    # Keep the original only when re-encoding buys nothing and the format already matches
+    if not resized and not cropped and source_format == settings.output_format and len(encoded) >= len(content):
+        return None, mime_type, replace(result, bytes_out=len(content), size_out=size_in)
+    return encoded, mime_type, result
+
+
+def render_pdf_pages(
+    content: bytes,
+    page_indices: List[int],
+    dpi: int,
+    settings: PreprocessSettings,
+) -> List[Tuple[bytes, str, PageResult]]:
+    """Render the given 0-based pages of a PDF to encoded images. Runs in a worker process."""
+    rendered = []
+    with fitz.open(stream=content, filetype="pdf") as pdf_document:
+        for index in page_indices:
+            pixmap = pdf_document[index].get_pixmap(dpi=dpi)
+            image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+            encoded, image, _, grayscale = _fit_and_encode(image, settings)
+            rendered.append((encoded, _FORMAT_MIME_TYPES[settings.output_format], PageResult(
+                filename="",
+                bytes_in=0,
+                bytes_out=len(encoded),
+                size_in=(pixmap.width, pixmap.height),
+                size_out=image.size,
+                grayscale=grayscale,
+            )))
+    return rendered
+
+
+async def _preprocess_document(
+    document: UploadedDocument,
+    settings: PreprocessSettings,
+) -> Tuple[UploadedDocument, PageResult]:
+    try:
+        content, mime_type, result = await run_cpu("preprocess_image", preprocess_image, document.content, settings)
+    except Exception as e:
+        # Undecodable or exotic images are sent as uploaded
+        print(f"Warning: Could not preprocess {document.filename}: {str(e)}")
+        return document, PageResult(document.filename, document.size, document.size, error=str(e))
+    result = replace(result, filename=document.filename)
+    if content is None:
+        return document, result
+    processed = replace(
+        document,
+        content=content,
+        sha256=hashlib.sha256(content).hexdigest(),
+        mime_type=mime_type,
+    )
+    return processed, result
+
+
+async def preprocess_bundle(
+    bundle: DocumentBundle,
+    settings: Optional[PreprocessSettings] = None,
+) -> DocumentBundle:
+    """Preprocessed copy of the bundle with its report attached; idempotent."""
+    if bundle.preprocessing is not None:
+        return bundle
+    settings = settings or PreprocessSettings.from_env()
+    tasks = [
+        _preprocess_document(doc, settings) if not doc.is_pdf else None
+        for doc in bundle.documents
+    ]
+    pending = [task for task in tasks if task is not None]
+    done = iter(await asyncio.gather(*pending))
+
+    documents: List[UploadedDocument] = []
+    pages: List[PageResult] = []
+    for doc, task in zip(bundle.documents, tasks):
+        if task is None:
+            documents.append(doc)
+            continue
+        processed, result = next(done)
+        documents.append(processed)
+        pages.append(result)
+
+    report = PreprocessReport(tuple(pages))
+    if pages:
+        print(report.summary())
+    return DocumentBundle(tuple(documents), preprocessing=report)
+
+
+def _raster_dpi() -> int:
+    return int(os.getenv("PDF_RASTER_DPI", "150"))
+
+
+async def rasterize_pdf(
+    document: UploadedDocument,
+    pages: Optional[Sequence[int]] = None,
+    dpi: Optional[int] = None,
+    settings: Optional[PreprocessSettings] = None,
+) -> List[UploadedDocument]:
+    """
+    Render a PDF (or only the given 1-based pages) to one image document per
+    page. Pages are split into contiguous batches, one per pool worker, so
+    each worker opens the PDF once. Returns [document] if rendering fails.
+    """
+    numbers = list(pages) if pages is not None else list(range(1, document.page_count + 1))
+    if not numbers:
+        return [document] if pages is None else []
+    dpi = dpi or _raster_dpi()
+    settings = settings or PreprocessSettings.from_env()
+    chunk = -(-len(numbers) // min(len(numbers), pool_size()))
+    batches_in = [numbers[i:i + chunk] for i in range(0, len(numbers), chunk)]
+    try:
+        batches = await asyncio.gather(*[
+            run_cpu("render_pdf_pages", render_pdf_pages, document.content, [n - 1 for n in batch], dpi, settings)
+            for batch in batches_in
+        ])
+    except Exception as e:
+        print(f"Warning: Could not rasterize {document.filename}: {str(e)}")
+        return [document]
+
+    rendered = [page for batch in batches for page in batch]
+    documents = []
+    for number, (content, mime_type, _) in zip(numbers, rendered):
+        documents.append(UploadedDocument(
+            filename=f"{document.filename}#page={number}",
+            content=content,
+            sha256=hashlib.sha256(content).hexdigest(),
+            mime_type=mime_type,
+            declared_type=document.mime_type,
+            page=number,
+        ))
+    print(f"[rasterize] {document.filename}: {len(documents)} page(s) at {dpi} dpi, {sum(d.size for d in documents):,} bytes")
+    return documents
+
+
+async def vision_pages(
+    bundle: DocumentBundle,
+    settings: Optional[PreprocessSettings] = None,
+) -> DocumentBundle:
+    """
+    The bundle as it should be sent to a Messages API vision call: with
+    PDF_VISION_MODE=rasterize every PDF is replaced by one image per page;
+    with PDF_VISION_MODE=document PDFs are kept (sent as document blocks).
+    """
+    if os.getenv("PDF_VISION_MODE", "rasterize").lower() == "document":
+        return bundle
+    if not any(doc.is_pdf for doc in bundle.documents):
+        return bundle
+    settings = settings or PreprocessSettings.from_env()
+    expanded = await asyncio.gather(*[
+        rasterize_pdf(doc, settings=settings) if doc.is_pdf else asyncio.sleep(0, result=[doc])
+        for doc in bundle.documents
+    ])
+    return replace(bundle, documents=tuple(doc for docs in expanded for doc in docs))
@@ -40,6 +40,9 @@ async def extract_quote_vision(
     try:
         result = await gemini_extractor.extract_quote_data(files)
         return result
+    except ValueError as e:
+        # Unsupported uploads and illegible photos (UnreadablePageError)
+        raise HTTPException(status_code=400, detail=str(e))
     except RuntimeError as e:
         tb = traceback.format_exc()
         print(f"[extract_quote_vision_gemini] RuntimeError:\n{tb}")
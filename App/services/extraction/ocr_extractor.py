@@ -1,13 +1,16 @@
 import os
 import json
-import base64
 import io
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
 from dotenv import load_dotenv
 import requests
-import fitz  # PyMuPDF
 from fastapi import UploadFile
 
+from .document_bundle import DocumentBundle, VisionImage, anthropic_source_block, ingest_uploads
+from .image_preprocess import preprocess_bundle, vision_pages
+from .request_body import JsonBody
+from App.core.deadline import budget_timeout
+
 load_dotenv()
 
 class OCRExtractor:
@@ -18,12 +21,15 @@ class OCRExtractor:
         self.model = "claude-3-5-sonnet-latest"
         self.api_url = "https://api.anthropic.com/v1/messages"
     
-    async def extract_quote_data(self, files: List[UploadFile]) -> Dict:
+    async def extract_quote_data(self, files: Union[List[UploadFile], DocumentBundle]) -> Dict:
         """Extract all quote/contract data using ChatGPT Vision"""
-        base64_images = await self._convert_to_base64(files)
+        documents = files if isinstance(files, DocumentBundle) else await ingest_uploads(files, max_bytes=None)
+        documents = await preprocess_bundle(documents)
+        # Documents, not base64 strings: each page is encoded only while the request body is sent
+        base64_images = list(await vision_pages(documents))
 
-        # Extract per-page raw text using PyMuPDF for PDFs (images return empty strings — that's OK)
-        page_texts = await self._extract_raw_text_pymupdf(files)
+        # Per-page raw text from the PDF text layer (images have none — that's OK)
+        page_texts = [text for doc in documents if doc.is_pdf for text in doc.page_texts]
         full_raw_text = "\n\n--- PAGE BREAK ---\n\n".join(t for t in page_texts if t.strip())
 
         # Extract structured data using Vision API
@@ -53,27 +59,6 @@ class OCRExtractor:
 
         return parsed
     
-    async def _extract_raw_text_pymupdf(self, files: List[UploadFile]) -> List[str]:
-        """Extract per-page raw text from PDF files using PyMuPDF"""
-        page_texts = []
-
-        for file in files:
-            contents = await file.read()
-
-            try:
-                pdf_document = fitz.open(stream=contents, filetype="pdf")
-                for page_num in range(len(pdf_document)):
-                    page = pdf_document[page_num]
-                    text = page.get_text()
-                    page_texts.append(text)
-                pdf_document.close()
-            except Exception as e:
-                print(f"Warning: Could not extract text from {file.filename}: {str(e)}")
-
-            await file.seek(0)
-
-        return page_texts
-    
     def _get_quote_extraction_prompt(self) -> str:
         """Comprehensive system prompt — extract every visible field from any auto document."""
         return """
@@ -378,17 +363,7 @@ legal_clauses boolean fields: use true if clause is present on document, false i
 legal_clauses.returned_payment_charge: extract as number (e.g. 30), not text.
 """
     
-    async def _convert_to_base64(self, files: List[UploadFile]) -> List[str]:
-        """Convert uploaded files to base64"""
-        base64_images = []
-        for file in files:
-            contents = await file.read()
-            base64_content = base64.b64encode(contents).decode('utf-8')
-            base64_images.append(base64_content)
-            await file.seek(0)
-        return base64_images
-    
-    async def _call_anthropic_vision(self, base64_images: List[str], system_prompt: str) -> dict:
+    async def _call_anthropic_vision(self, base64_images: List[VisionImage], system_prompt: str) -> dict:
         """Call Anthropic Vision API"""
         headers = {
             "x-api-key": self.api_key,
@@ -399,14 +374,7 @@ legal_clauses.returned_payment_charge: extract as number (e.g. 30), not text.
         # Build user content with all images
         content = []
         for base64_image in base64_images:
-            content.append({
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": "image/jpeg",
-                    "data": base64_image
-                }
-            })
+            content.append(anthropic_source_block(base64_image))
         content.append({
             "type": "text",
             "text": "Extract every field and all text from this document following the instructions exactly. Return only valid JSON."
@@ -429,8 +397,8 @@ legal_clauses.returned_payment_charge: extract as number (e.g. 30), not text.
             response = requests.post(
                 self.api_url,
                 headers=headers,
-                json=payload,
-                timeout=180
+                data=JsonBody(payload),
+                timeout=budget_timeout(180)
             )
             response.raise_for_status()
             raw = response.json()
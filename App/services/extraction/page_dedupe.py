@@ -0,0 +1,226 @@
+"""
+Near-duplicate upload detection.
+
+Buyers often photograph the same page two or three times. Each image gets
+two 64-bit perceptual hashes, a difference hash (dHash: sign of horizontal
+gradients on a 9x8 thumbnail) and a DCT hash (pHash: sign of the low
+frequencies of a 32x32 thumbnail against their median), plus its aspect
+ratio and a sharpness score (variance of the Laplacian).
+
+Pages of one contract share a layout, so a single loose hash merges pages
+that are not retakes. Two images count as retakes only when both hashes
+are within their distance limits and the aspect ratios agree, and an image
+joins a group only if it matches every member already in it (no chaining
+A~B~C into one page). The sharpest image of each group is kept and the rest
+are dropped before extraction. Byte-identical uploads (same sha256) are
+merged whatever their type.
+
+    PAGE_DEDUPE                  on (default) or off
+    PAGE_DEDUPE_DISTANCE         max Hamming distance of the 64-bit dHash (default 10)
+    PAGE_DEDUPE_PHASH_DISTANCE   max Hamming distance of the 64-bit pHash (default 10)
+"""
+import asyncio
+import io
+import math
+import os
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageFilter, ImageOps, ImageStat
+
+from .document_bundle import DocumentBundle, UploadedDocument
+from App.core.cpu_pool import run_cpu
+
+_HASH_SIZE = 8
+# pHash keeps the lowest _HASH_SIZE x _HASH_SIZE frequencies of a _PHASH_SIZE square thumbnail
+_PHASH_SIZE = 32
+_DCT = [
+    [math.cos(math.pi * (2 * x + 1) * u / (2 * _PHASH_SIZE)) for x in range(_PHASH_SIZE)]
+    for u in range(_HASH_SIZE)
+]
+# Retakes may be cropped a little differently; a page and its neighbour rarely differ only by this
+_ASPECT_TOLERANCE = 0.12
+# Longest edge the sharpness measure runs at; keeps retakes of different resolution comparable
+_SHARPNESS_EDGE = 1024
+_LAPLACIAN = ImageFilter.Kernel((3, 3), (0, 1, 0, 1, -4, 1, 0, 1, 0), scale=1, offset=128)
+
+
+@dataclass(frozen=True)
+class DuplicateGroup:
+    kept: str
+    merged: Tuple[str, ...]
+    distance: int = 0  # largest hash distance within the group
+
+    def describe(self) -> List[Dict]:
+        return [
+            {"filename": filename, "page": None, "reason": f"duplicate of {self.kept}"}
+            for filename in self.merged
+        ]
+
+
+@dataclass(frozen=True, slots=True)
+class PageFingerprint:
+    dhash: int
+    phash: int
+    aspect: float  # width / height after EXIF rotation
+    sharpness: float
+
+
+@dataclass(frozen=True)
+class DedupeLimits:
+    dhash: int = 10
+    phash: int = 10
+    aspect: float = _ASPECT_TOLERANCE
+
+    @classmethod
+    def from_env(cls) -> "DedupeLimits":
+        return cls(
+            dhash=int(os.getenv("PAGE_DEDUPE_DISTANCE", str(cls.dhash))),
+            phash=int(os.getenv("PAGE_DEDUPE_PHASH_DISTANCE", str(cls.phash))),
+        )
+
+
+def _enabled() -> bool:
+    return os.getenv("PAGE_DEDUPE", "on").lower() not in ("off", "false", "0")
+
+
+def dhash(image: Image.Image, hash_size: int = _HASH_SIZE) -> int:
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def phash(image: Image.Image, hash_size: int = _HASH_SIZE) -> int:
+    small = image.convert("L").resize((_PHASH_SIZE, _PHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    # Separable 2-D DCT-II, only the low frequencies the hash keeps
+    rows = [
+        [sum(c * pixels[y * _PHASH_SIZE + x] for x, c in enumerate(_DCT[u])) for u in range(hash_size)]
+        for y in range(_PHASH_SIZE)
+    ]
+    coefficients = [
+        sum(_DCT[v][y] * rows[y][u] for y in range(_PHASH_SIZE))
+        for v in range(hash_size) for u in range(hash_size)
+    ]
+    median = sorted(coefficients)[len(coefficients) // 2]
+    bits = 0
+    for value in coefficients:
+        bits = (bits << 1) | (value > median)
+    return bits
+
+
+def sharpness(image: Image.Image) -> float:
+    gray = image.convert("L")
+    gray.thumbnail((_SHARPNESS_EDGE, _SHARPNESS_EDGE))
+    return ImageStat.Stat(gray.filter(_LAPLACIAN)).var[0]
+
+
+def fingerprint_image(content: bytes) -> PageFingerprint:
+    """Hashes, aspect ratio and sharpness of one image. Runs in a worker process."""
+    with Image.open(io.BytesIO(content)) as opened:
+        image = ImageOps.exif_transpose(opened)
+        return PageFingerprint(
+            dhash=dhash(image),
+            phash=phash(image),
+            aspect=image.width / image.height,
+            sharpness=sharpness(image),
+        )
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def retake_distance(a: PageFingerprint, b: PageFingerprint, limits: DedupeLimits) -> Optional[int]:
+    """dHash distance between two images if they look like retakes of one page, else None."""
+    if abs(a.aspect - b.aspect) > limits.aspect * max(a.aspect, b.aspect):
+        return None
+    distance = hamming(a.dhash, b.dhash)
+    if distance > limits.dhash or hamming(a.phash, b.phash) > limits.phash:
+        return None
+    return distance
+
+
+def group_retakes(
+    hashes: List[str],
+    prints: List[Optional[PageFingerprint]],
+    limits: DedupeLimits,
+) -> List[Tuple[List[int], int]]:
+    """(member indexes, largest distance) per group, in upload order.
+
+    Complete linkage: an image joins the first group whose every member is a
+    retake of it (identical sha256 counts as distance 0).
+    """
+    groups: List[Tuple[List[int], int]] = []
+    for index, sha in enumerate(hashes):
+        for number, (members, worst) in enumerate(groups):
+            distances = []
+            for member in members:
+                if hashes[member] == sha:
+                    distances.append(0)
+                elif prints[member] is not None and prints[index] is not None:
+                    distance = retake_distance(prints[member], prints[index], limits)
+                    if distance is None:
+                        break
+                    distances.append(distance)
+                else:
+                    break
+            else:
+                members.append(index)
+                groups[number] = (members, max([worst, *distances]))
+                break
+        else:
+            groups.append(([index], 0))
+    return groups
+
+
+async def _fingerprint(document: UploadedDocument) -> Optional[PageFingerprint]:
+    try:
+        return await run_cpu("fingerprint_image", fingerprint_image, document.content)
+    except Exception as e:
+        print(f"Warning: Could not fingerprint {document.filename}: {str(e)}")
+        return None
+
+
+async def dedupe_bundle(bundle: DocumentBundle) -> DocumentBundle:
+    """The bundle with retakes merged into their sharpest copy; groups are recorded on bundle.duplicates."""
+    if not _enabled() or len(bundle) < 2:
+        return bundle
+    documents = list(bundle.documents)
+    prints = await asyncio.gather(*[
+        _fingerprint(doc) if not doc.is_pdf else asyncio.sleep(0, result=None)
+        for doc in documents
+    ])
+    groups = group_retakes([doc.sha256 for doc in documents], prints, DedupeLimits.from_env())
+
+    duplicates: List[DuplicateGroup] = []
+    keep = set()
+    for group, distance in groups:
+        best = max(group, key=lambda i: prints[i].sharpness if prints[i] is not None else 0.0)
+        keep.add(best)
+        if len(group) > 1:
+            duplicates.append(DuplicateGroup(
+                kept=documents[best].filename,
+                merged=tuple(documents[i].filename for i in group if i != best),
+                distance=distance,
+            ))
+    if not duplicates:
+        return bundle
+
+    for group in duplicates:
+        print(f"[dedupe] kept {group.kept}, merged {', '.join(group.merged)} (distance {group.distance})")
+    return replace(
+        bundle,
+        documents=tuple(doc for i, doc in enumerate(documents) if i in keep),
+        duplicates=bundle.duplicates + tuple(duplicates),
+    )
+
+
+def merged_uploads(bundle: DocumentBundle) -> List[Dict]:
+    """Dropped retakes in the same shape as PageSelection.skipped_pages()."""
+    return [page for group in bundle.duplicates for page in group.describe()]
@@ -0,0 +1,235 @@
+"""
+Relevant-page selection before vision extraction.
+
+Deal packets carry arbitration riders, privacy notices and odometer
+statements next to the pages that matter (TILA box, itemization, payment
+schedule, lease disclosure). Each page is scored cheaply before the vision
+call:
+
+  - PDF pages with a text layer: weighted keyword hits
+  - photos and scanned pages: a downscaled thumbnail pass that only
+    recognises blank pages; everything else is kept, since there is no text
+    to judge it by
+
+Low-scoring pages are dropped only when at least one page in the bundle is
+clearly relevant, so an unrecognised packet is still sent whole.
+
+    PAGE_SELECTION            on (default) or off
+    PAGE_SELECTION_MAX_PAGES  keep at most this many pages, best first (default 0 = no cap)
+"""
+import asyncio
+import hashlib
+import io
+import os
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from .document_bundle import DocumentBundle, UploadedDocument
+from App.core.cpu_pool import run_cpu
+from .text_layer import has_usable_text
+
+_KEYWORDS: Tuple[Tuple[str, int], ...] = (
+    # retail installment contracts and quotes
+    ("itemization of amount financed", 5),
+    ("annual percentage rate", 4),
+    ("finance charge", 3),
+    ("amount financed", 3),
+    ("total of payments", 3),
+    ("payment schedule", 3),
+    ("number of payments", 2),
+    ("amount of payments", 2),
+    ("cash price", 2),
+    ("unpaid balance", 2),
+    ("monthly payment", 2),
+    ("selling price", 1),
+    ("trade-in", 1),
+    ("documentary fee", 1),
+    ("doc fee", 1),
+    ("sales tax", 1),
+    ("msrp", 1),
+    # leases
+    ("amount due at lease signing", 4),
+    ("gross capitalized cost", 4),
+    ("adjusted capitalized cost", 3),
+    ("capitalized cost reduction", 3),
+    ("residual value", 3),
+    ("rent charge", 3),
+    ("money factor", 3),
+    ("base monthly payment", 3),
+    # boilerplate riders
+    ("privacy notice", -4),
+    ("privacy policy", -4),
+    ("odometer disclosure statement", -4),
+    ("notice to cosigner", -3),
+    ("power of attorney", -3),
+    ("arbitration provision", -2),
+    ("we collect", -2),
+)
+
+# Thumbnail pass: a page is blank when under this share of pixels is clearly
+# darker (by _INK_CONTRAST grey levels) than the paper
+_THUMBNAIL_SIZE = (256, 256)
+_BLANK_INK_RATIO = 0.002
+_INK_CONTRAST = 40
+
+
+@dataclass(frozen=True)
+class PageScore:
+    document: UploadedDocument
+    page: Optional[int]  # 1-based page for PDFs, None for images
+    score: float
+    reason: str
+    classified: bool = True  # False when the page could not be judged (photo, scan)
+    blank: bool = False
+
+    def describe(self) -> Dict:
+        return {"filename": self.document.filename, "page": self.page, "reason": self.reason}
+
+
+@dataclass(frozen=True)
+class PageSelection:
+    bundle: DocumentBundle
+    kept: Tuple[PageScore, ...] = ()
+    skipped: Tuple[PageScore, ...] = field(default_factory=tuple)
+
+    def skipped_pages(self) -> List[Dict]:
+        return [page.describe() for page in self.skipped]
+
+
+def _enabled() -> bool:
+    return os.getenv("PAGE_SELECTION", "on").lower() not in ("off", "false", "0")
+
+
+def _max_pages() -> int:
+    return int(os.getenv("PAGE_SELECTION_MAX_PAGES", "0"))
+
+
+def score_text(text: str) -> Tuple[float, List[str]]:
+    lowered = " ".join(text.lower().split())
+    matched = [(keyword, weight) for keyword, weight in _KEYWORDS if keyword in lowered]
+    return float(sum(weight for _, weight in matched)), [keyword for keyword, _ in matched]
+
+
+def is_blank_image(content: bytes) -> bool:
+    """Thumbnail check for an empty page (lens cap, back of a sheet). Runs in a worker process."""
+    with Image.open(io.BytesIO(content)) as image:
+        image.draft("L", _THUMBNAIL_SIZE)
+        thumbnail = image.convert("L")
+        thumbnail.thumbnail(_THUMBNAIL_SIZE)
+    histogram = thumbnail.histogram()
+    pixels = max(1, sum(histogram))
+    running, paper = 0, 0
+    for level, count in enumerate(histogram):
+        running += count
+        if running * 2 >= pixels:
+            paper = level
+            break
+    ink = sum(histogram[:max(0, paper - _INK_CONTRAST)]) / pixels
+    return ink < _BLANK_INK_RATIO
+
+
+async def _score_image(document: UploadedDocument) -> PageScore:
+    try:
+        blank = await run_cpu("is_blank_image", is_blank_image, document.content)
+    except Exception as e:
+        print(f"Warning: Could not inspect {document.filename}: {str(e)}")
+        blank = False
+    if blank:
+        return PageScore(document, document.page, 0.0, "blank page", blank=True)
+    return PageScore(document, document.page, 1.0, "photo", classified=False)
+
+
+def _score_pdf(document: UploadedDocument) -> List[PageScore]:
+    if not document.page_texts:
+        return [PageScore(document, None, 1.0, "unreadable PDF", classified=False)]
+    scores = []
+    for number, text in enumerate(document.page_texts, start=1):
+        if not has_usable_text(text):
+            scores.append(PageScore(document, number, 1.0, "scanned page", classified=False))
+            continue
+        score, matched = score_text(text)
+        reason = ", ".join(matched) if matched else "no deal terms"
+        scores.append(PageScore(document, number, score, reason))
+    return scores
+
+
+def subset_pdf_content(content: bytes, pages: List[int]) -> bytes:
+    """PDF bytes with only the given 1-based pages, in order. Blocking; runs in the CPU pool."""
+    with fitz.open(stream=content, filetype="pdf") as source, fitz.open() as subset:
+        for number in pages:
+            subset.insert_pdf(source, from_page=number - 1, to_page=number - 1)
+        return subset.tobytes(garbage=3, deflate=True)
+
+
+async def _subset_pdf(document: UploadedDocument, pages: List[int]) -> UploadedDocument:
+    """A PDF containing only the given 1-based pages, in order."""
+    if len(pages) == document.page_count:
+        return document
+    content = await run_cpu("subset_pdf", subset_pdf_content, document.content, pages)
+    subset = replace(
+        document,
+        filename=f"{document.filename}#pages={','.join(str(n) for n in pages)}",
+        content=content,
+        sha256=hashlib.sha256(content).hexdigest(),
+    )
+    if "page_words" in document.__dict__:
+        # The kept pages' text layer is already known; no need to parse the new PDF again
+        subset._seed_text_layer(
+            tuple(document.page_texts[n - 1] for n in pages),
+            tuple(document.page_words[n - 1] for n in pages),
+        )
+    return subset
+
+
+async def select_pages(bundle: DocumentBundle) -> PageSelection:
+    """Score every page and return the bundle trimmed to the pages worth sending."""
+    if not _enabled():
+        return PageSelection(bundle)
+    image_scores = iter(await asyncio.gather(*[
+        _score_image(doc) for doc in bundle.documents if not doc.is_pdf
+    ]))
+    scored: List[PageScore] = []
+    for doc in bundle.documents:
+        scored.extend(_score_pdf(doc) if doc.is_pdf else [next(image_scores)])
+
+    anchored = any(page.classified and page.score > 0 for page in scored)
+    kept = [page for page in scored if page.score > 0 or (not anchored and not page.blank)]
+    if not kept:
+        # Nothing recognisable at all: send everything rather than nothing
+        kept = list(scored)
+    limit = _max_pages()
+    if limit and len(kept) > limit:
+        best = sorted(kept, key=lambda page: page.score, reverse=True)[:limit]
+        best_ids = {id(page) for page in best}
+        kept = [page for page in kept if id(page) in best_ids]
+    kept_ids = {id(page) for page in kept}
+    skipped = [page for page in scored if id(page) not in kept_ids]
+    if not skipped:
+        return PageSelection(bundle, kept=tuple(kept))
+
+    documents: List[UploadedDocument] = []
+    for doc in bundle.documents:
+        pages = [page for page in kept if page.document is doc]
+        if not pages:
+            continue
+        if doc.is_pdf and pages[0].page is not None:
+            try:
+                documents.append(await _subset_pdf(doc, [page.page for page in pages]))
+                continue
+            except Exception as e:
+                # A damaged PDF can score fine but fail to copy; send it whole rather than fail the request
+                print(f"[pages] could not subset {doc.filename}, sending every page: {str(e)}")
+                kept_ids.update(id(page) for page in scored if page.document is doc)
+        documents.append(doc)
+
+    kept = [page for page in scored if id(page) in kept_ids]
+    skipped = [page for page in scored if id(page) not in kept_ids]
+    if not skipped:
+        return PageSelection(bundle, kept=tuple(kept))
+
+    print(f"[pages] kept {len(kept)} of {len(scored)} page(s); skipped: "
+          + "; ".join(f"{p.document.filename} p{p.page or 1} ({p.reason})" for p in skipped))
+    return PageSelection(replace(bundle, documents=tuple(documents)), tuple(kept), tuple(skipped))
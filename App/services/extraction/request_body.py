@@ -0,0 +1,91 @@
+"""
+Low-copy JSON request bodies for vision calls.
+
+A Messages API payload with ten page images used to exist four times over:
+raw bytes, base64 strings, the payload dict embedding them, and the
+serialized body. Here image sources hold a Base64Data wrapper around the
+raw bytes instead, and JsonBody serializes the payload incrementally,
+base64-encoding each image chunk by chunk as the body is sent. Peak memory
+per request stays close to the size of the uploads themselves.
+
+JsonBody is sized (Content-Length is known up front, no chunked transfer
+encoding) and re-iterable, so a retried requests.post sends it again.
+"""
+import base64
+import json
+from typing import Any, Iterator
+
+# Multiple of 3 so chunk boundaries never fall inside a base64 quantum
+_CHUNK_SIZE = 3 * 256 * 1024
+
+
+class Base64Data:
+    """Raw bytes that serialize as a base64 JSON string."""
+
+    __slots__ = ("content",)
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def __len__(self) -> int:
+        return 4 * ((len(self.content) + 2) // 3)
+
+    def chunks(self) -> Iterator[bytes]:
+        view = memoryview(self.content)
+        for start in range(0, len(view), _CHUNK_SIZE):
+            yield base64.b64encode(view[start:start + _CHUNK_SIZE])
+
+
+def _dumps(value: Any) -> bytes:
+    # Same settings as requests' json= serialization
+    return json.dumps(value, allow_nan=False).encode("utf-8")
+
+
+def _pieces(value: Any) -> Iterator[Any]:
+    """Serialized fragments of value: bytes, or a Base64Data to be expanded in place."""
+    if isinstance(value, Base64Data):
+        yield value
+    elif isinstance(value, dict):
+        yield b"{"
+        for index, (key, item) in enumerate(value.items()):
+            if index:
+                yield b", "
+            yield _dumps(str(key))
+            yield b": "
+            yield from _pieces(item)
+        yield b"}"
+    elif isinstance(value, (list, tuple)):
+        yield b"["
+        for index, item in enumerate(value):
+            if index:
+                yield b", "
+            yield from _pieces(item)
+        yield b"]"
+    else:
+        yield _dumps(value)
+
+
+class JsonBody:
+    """Iterable, sized request body for requests.post(data=...)."""
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self._length = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        for piece in _pieces(self.payload):
+            if isinstance(piece, Base64Data):
+                yield b'"'
+                yield from piece.chunks()
+                yield b'"'
+            else:
+                yield piece
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = sum(
+                len(piece) + 2 if isinstance(piece, Base64Data) else len(piece)
+                for piece in _pieces(self.payload)
+            )
+        return self._length
+
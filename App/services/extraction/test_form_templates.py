@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import os
+
+import fitz  # PyMuPDF
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from App.services.extraction.document_bundle import DocumentBundle, UploadedDocument
+from App.services.extraction.form_templates import extract_with_template
+from App.services.extraction.gemini_extractor import GeminiExtractor
+
+# (x, y, text): a LAW 553 first page reduced to the labels and boxes the template reads
+HEADER = [
+    (36, 40, "RETAIL INSTALLMENT SALE CONTRACT - SIMPLE FINANCE CHARGE"),
+    (36, 80, "Buyer Name and Address"),
+    (36, 94, "Jane Q Buyer 12 Main St"),
+    (320, 80, "Seller-Creditor"),
+    (320, 94, "Sunrise Motors"),
+    (36, 130, "VIN 1HGCM82633A004352"),
+]
+TILA_LABELS = [
+    (36, 170, "ANNUAL PERCENTAGE RATE"),
+    (160, 170, "FINANCE CHARGE"),
+    (270, 170, "Amount Financed"),
+    (380, 170, "Total of Payments"),
+    (490, 170, "Total Sale Price"),
+]
+TILA_VALUES = [
+    (40, 192, "6.90 %"),
+    (164, 192, "$ 4,210.55"),
+    (274, 192, "$ 28,500.00"),
+    (384, 192, "$ 32,710.55"),
+    (494, 192, "$ 35,710.55"),
+]
+SCHEDULE = [
+    (36, 240, "Number of Payments"),
+    (180, 240, "Amount of Payments"),
+    (40, 262, "72"),
+    (184, 262, "$ 454.31"),
+]
+ITEMIZATION = [
+    (36, 300, "ITEMIZATION OF AMOUNT FINANCED"),
+    (36, 320, "1 Cash Price (including any accessories, services, and taxes) $ 32,000.00"),
+    (48, 334, "Sales Tax $ 2,400.00"),
+    (36, 348, "2 Gross Trade-In $ 5,000.00"),
+    (48, 362, "Pay Off Made By Seller $ 3,000.00"),
+    (48, 376, "Net Trade-In $ 2,000.00"),
+    (48, 390, "Manufacturer's Rebate $ 1,500.00"),
+    (48, 404, "Total Downpayment $ 3,500.00"),
+    (36, 418, "3 Unpaid Balance of Cash Price (1 minus 2) $ 28,500.00"),
+    (48, 432, "Documentary Fee $ 85.00"),
+    (48, 446, "Debt Cancellation Agreement $ 695.00"),
+    (36, 460, "5 Amount Financed (3 + 4) $ 28,500.00"),
+    (36, 760, "LAW 553-CA-ARB 5/23"),
+]
+FULL_FORM = HEADER + TILA_LABELS + TILA_VALUES + SCHEDULE + ITEMIZATION
+
+
+def _bundle(lines) -> DocumentBundle:
+    with fitz.open() as pdf:
+        page = pdf.new_page(width=612, height=792)
+        for x, y, text in lines:
+            page.insert_text((x, y), text, fontsize=8)
+        content = pdf.tobytes()
+    doc = UploadedDocument("contract.pdf", content, hashlib.sha256(content).hexdigest(), "application/pdf")
+    return DocumentBundle(documents=(doc,))
+
+
+def test_law_553_fields_from_word_layout():
+    result = extract_with_template(_bundle(FULL_FORM))
+    assert result is not None and result.complete
+    values = result.values
+    assert values[("document_metadata", "form_number")] == "LAW 553-CA-ARB 5/23"
+    assert values[("tila_disclosures", "annual_percentage_rate")] == 6.9
+    assert values[("financial_terms", "apr")] == 6.9
+    assert values[("tila_disclosures", "finance_charge")] == 4210.55
+    assert values[("tila_disclosures", "amount_financed")] == 28500.0
+    assert values[("tila_disclosures", "total_of_payments")] == 32710.55
+    assert values[("tila_disclosures", "total_sale_price")] == 35710.55
+    assert values[("payment_schedule", "number_of_payments")] == 72
+    assert values[("financial_terms", "term_months")] == 72
+    assert values[("payment_schedule", "payment_amount")] == 454.31
+    assert values[("itemization_of_amount_financed", "cash_price_including_accessories")] == 32000.0
+    assert values[("financial_terms", "sales_tax")] == 2400.0
+    assert values[("trade_in", "gross_trade_in")] == 5000.0
+    assert values[("trade_in", "trade_payoff")] == 3000.0
+    assert values[("itemization_of_amount_financed", "net_trade_allowance")] == 2000.0
+    assert values[("itemization_of_amount_financed", "manufacturers_rebate")] == 1500.0
+    assert values[("itemization_of_amount_financed", "total_downpayment")] == 3500.0
+    assert values[("itemization_of_amount_financed", "unpaid_balance_of_cash_price")] == 28500.0
+    assert values[("itemization_of_amount_financed", "amount_financed")] == 28500.0
+    assert values[("fees_breakdown", "documentary_fee")] == 85.0
+    assert values[("fees_breakdown", "debt_cancellation_fee")] == 695.0
+    assert values[("buyer_info", "name")] == "Jane Q Buyer 12 Main St"
+    assert values[("dealer_info", "name")] == "Sunrise Motors"
+    assert values[("vehicle_details", "vin")] == "1HGCM82633A004352"
+    assert values[("legal_clauses", "arbitration_provision")] is True
+
+
+def test_unknown_form_does_not_match():
+    lines = [line for line in FULL_FORM if not line[2].startswith("LAW 553")]
+    assert extract_with_template(_bundle(lines)) is None
+
+
+class _ModelCalled(Exception):
+    pass
+
+
+class _FakeModels:
+    def __init__(self):
+        self.contents = None
+
+    def generate_content(self, model, contents, config):
+        self.contents = contents
+        raise _ModelCalled()
+
+
+class _FakeClient:
+    def __init__(self):
+        self.models = _FakeModels()
+
+
+def _extract(bundle: DocumentBundle):
+    """Run the extractor with a client that records the model request instead of sending it."""
+    extractor = GeminiExtractor()
+    extractor.client = _FakeClient()
+    try:
+        return asyncio.run(extractor.extract_quote_data(bundle)), None
+    except _ModelCalled:
+        return None, extractor.client.models.contents
+
+
+def test_complete_template_skips_the_model():
+    parsed, model_contents = _extract(_bundle(FULL_FORM))
+    assert model_contents is None
+    assert parsed["tila_disclosures"]["annual_percentage_rate"] == 6.9
+    assert parsed["payment_schedule"]["payment_amount"] == 454.31
+
+
+def test_missing_anchor_falls_back_to_the_model():
+    # No "Amount of Payments" box: a required field is unresolved
+    lines = [line for line in FULL_FORM if line[2] not in ("Amount of Payments", "$ 454.31")]
+    result = extract_with_template(_bundle(lines))
+    assert result is not None and not result.complete
+    assert result.missing_required == [("payment_schedule", "payment_amount")]
+
+    parsed, model_contents = _extract(_bundle(lines))
+    assert parsed is None
+    hints = [part for part in model_contents if isinstance(part, str) and part.startswith("This document is form")]
+    assert len(hints) == 1 and "tila_disclosures.finance_charge=4210.55" in hints[0]
+
+
+def test_unmatched_document_goes_to_the_model_without_hint():
+    lines = [line for line in FULL_FORM if not line[2].startswith("LAW 553")]
+    parsed, model_contents = _extract(_bundle(lines))
+    assert parsed is None
+    assert not any(isinstance(part, str) and part.startswith("This document is form") for part in model_contents)
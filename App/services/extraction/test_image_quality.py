@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import io
+import os
+import random
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from App.services.extraction.document_bundle import DocumentBundle, UploadedDocument
+from App.services.extraction.gemini_extractor import GeminiExtractor
+from App.services.extraction.image_quality import QualityThresholds, UnreadablePageError, check_bundle, measure_image
+
+
+def _page() -> Image.Image:
+    """A photographed form page: a header box and lines of dark text on light paper."""
+    rng = random.Random(1)
+    image = Image.new("L", (850, 1100), 245)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((40, 40, 810, 120), outline=20, width=4)
+    draw.text((60, 70), "RETAIL INSTALLMENT SALE CONTRACT", fill=20)
+    y = 150
+    while y < 1040:
+        draw.rectangle((60, y, 60 + rng.randint(250, 730), y + 10), fill=rng.randint(40, 110))
+        y += rng.choice((18, 18, 22, 40))
+    return image
+
+
+def _jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+CLEAN = _page()
+BLURRED = CLEAN.filter(ImageFilter.GaussianBlur(4))
+DARK = ImageEnhance.Brightness(CLEAN).enhance(0.12)
+LOW_RES = CLEAN.resize((425, 550))
+
+
+def _measure(image: Image.Image, thresholds: QualityThresholds = QualityThresholds()):
+    return measure_image(_jpeg(image), "page.jpg", 1, thresholds)
+
+
+def test_clean_page_is_usable():
+    quality = _measure(CLEAN)
+    assert quality.usable
+    assert quality.size == (850, 1100)
+    assert quality.sharpness >= QualityThresholds.min_sharpness
+    assert quality.contrast >= QualityThresholds.min_contrast
+
+
+def test_blurred_page():
+    assert _measure(BLURRED).problems == ("too blurry",)
+
+
+def test_dark_page():
+    quality = _measure(DARK)
+    assert "too dark" in quality.problems
+    assert quality.mean < 45
+
+
+def test_low_resolution_page():
+    assert _measure(LOW_RES).problems == ("resolution too low (425x550)",)
+    assert _measure(LOW_RES, QualityThresholds(min_pixels=200_000)).usable
+
+
+def test_thresholds_from_env(monkeypatch):
+    monkeypatch.setenv("QUALITY_MIN_SHARPNESS", "20")
+    thresholds = QualityThresholds.from_env()
+    assert thresholds.min_sharpness == 20.0
+    assert thresholds.min_pixels == QualityThresholds.min_pixels
+    assert _measure(BLURRED, thresholds).usable
+
+
+def _document(filename: str, content: bytes, mime_type: str = "image/jpeg") -> UploadedDocument:
+    return UploadedDocument(filename, content, hashlib.sha256(content).hexdigest(), mime_type)
+
+
+def test_check_bundle_names_the_failed_pages():
+    bundle = DocumentBundle(documents=(
+        _document("page1.jpg", _jpeg(CLEAN)),
+        _document("page2.pdf", b"%PDF-1.4", "application/pdf"),
+        _document("page3.jpg", _jpeg(BLURRED)),
+    ))
+    with pytest.raises(UnreadablePageError) as raised:
+        asyncio.run(check_bundle(bundle))
+    assert [(page.page, page.filename) for page in raised.value.pages] == [(3, "page3.jpg")]
+    assert "Please retake page 3" in str(raised.value)
+
+
+def test_check_bundle_passes_clean_pages_and_can_be_turned_off(monkeypatch):
+    bundle = DocumentBundle(documents=(_document("page1.jpg", _jpeg(CLEAN)),))
+    assert [page.page for page in asyncio.run(check_bundle(bundle))] == [1]
+
+    monkeypatch.setenv("QUALITY_GATE", "off")
+    blurred = DocumentBundle(documents=(_document("page1.jpg", _jpeg(BLURRED)),))
+    assert asyncio.run(check_bundle(blurred)) == []
+
+
+class _UnexpectedModelCall(Exception):
+    pass
+
+
+class _FailingModels:
+    def generate_content(self, model, contents, config):
+        raise _UnexpectedModelCall()
+
+
+class _FailingClient:
+    def __init__(self):
+        self.models = _FailingModels()
+
+
+def test_gemini_extraction_rejects_unreadable_uploads_before_the_model():
+    extractor = GeminiExtractor()
+    extractor.client = _FailingClient()
+    upload = UploadFile(file=io.BytesIO(_jpeg(DARK)), filename="quote.jpg")
+    with pytest.raises(UnreadablePageError):
+        asyncio.run(extractor.extract_quote_data([upload]))
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+from App.services.extraction.document_bundle import DocumentBundle, UploadedDocument
+from App.services.extraction.page_dedupe import (
+    DedupeLimits,
+    PageFingerprint,
+    dedupe_bundle,
+    fingerprint_image,
+    group_retakes,
+    hamming,
+)
+
+
+def _contract_page(seed: int) -> Image.Image:
+    """One page of a form: the same header box on every page, different text and boxes below it."""
+    rng = random.Random(seed)
+    image = Image.new("L", (850, 1100), 245)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((40, 40, 810, 120), outline=20, width=4)
+    draw.text((60, 70), "RETAIL INSTALLMENT SALE CONTRACT", fill=20)
+    y = 150
+    while y < 1040:
+        if rng.random() < 0.2:
+            draw.rectangle((60, y, 790, y + rng.randint(40, 120)), outline=30, width=3)
+            y += 140
+            continue
+        draw.rectangle((60, y, 60 + rng.randint(250, 730), y + 10), fill=rng.randint(40, 110))
+        y += rng.choice((18, 18, 22, 40))
+    return image
+
+
+def _retake(image: Image.Image, seed: int) -> Image.Image:
+    """The same page photographed again: slightly turned, cropped, smaller, darker and out of focus."""
+    rng = random.Random(seed)
+    width, height = image.size
+    image = image.rotate(rng.uniform(-1.5, 1.5), fillcolor=235)
+    crop = rng.randint(5, 25)
+    image = image.crop((crop, crop, width - crop, height - crop)).resize((int(width * 0.75), int(height * 0.75)))
+    image = ImageEnhance.Brightness(image).enhance(rng.uniform(0.85, 1.1))
+    return image.filter(ImageFilter.GaussianBlur(1.5))
+
+
+def _jpeg(image: Image.Image, quality: int = 85) -> bytes:
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _document(filename: str, content: bytes) -> UploadedDocument:
+    return UploadedDocument(filename, content, hashlib.sha256(content).hexdigest(), "image/jpeg")
+
+
+def test_distinct_pages_of_one_form_survive():
+    pages = [_jpeg(_contract_page(seed)) for seed in range(5)]
+    bundle = DocumentBundle(documents=tuple(_document(f"page{i + 1}.jpg", page) for i, page in enumerate(pages)))
+    deduped = asyncio.run(dedupe_bundle(bundle))
+    assert deduped.documents == bundle.documents
+    assert deduped.duplicates == ()
+
+
+def test_retakes_merge_into_the_sharpest_copy():
+    pages = [_contract_page(seed) for seed in range(3)]
+    documents = [_document(f"page{i + 1}.jpg", _jpeg(page)) for i, page in enumerate(pages)]
+    documents.insert(1, _document("page1_again.jpg", _jpeg(_retake(pages[0], 1), quality=70)))
+    documents.append(_document("page3_again.jpg", _jpeg(_retake(pages[2], 3), quality=70)))
+    deduped = asyncio.run(dedupe_bundle(DocumentBundle(documents=tuple(documents))))
+
+    assert [doc.filename for doc in deduped.documents] == ["page1.jpg", "page2.jpg", "page3.jpg"]
+    assert [(group.kept, group.merged) for group in deduped.duplicates] == [
+        ("page1.jpg", ("page1_again.jpg",)),
+        ("page3.jpg", ("page3_again.jpg",)),
+    ]
+    assert all(group.distance <= DedupeLimits().dhash for group in deduped.duplicates)
+
+
+def test_close_dhash_alone_does_not_merge():
+    # Pages 2 and 4 of this form are within the dHash limit; the pHash tells them apart
+    first, second = (fingerprint_image(_jpeg(_contract_page(seed))) for seed in (1, 3))
+    assert hamming(first.dhash, second.dhash) <= DedupeLimits().dhash
+    assert hamming(first.phash, second.phash) > DedupeLimits().phash
+    assert len(group_retakes(["a", "b"], [first, second], DedupeLimits())) == 2
+
+
+def _print(dhash: int, phash: int = 0, aspect: float = 0.77) -> PageFingerprint:
+    return PageFingerprint(dhash=dhash, phash=phash, aspect=aspect, sharpness=100.0)
+
+
+def test_groups_do_not_chain():
+    # a~b and b~c are within 8 bits, a and c are 16 apart: c must not join a's group through b
+    a, b, c = _print(0), _print((1 << 8) - 1), _print((1 << 16) - 1)
+    groups = group_retakes(["a", "b", "c"], [a, b, c], DedupeLimits(dhash=8, phash=8))
+    assert [members for members, _ in groups] == [[0, 1], [2]]
+
+
+def test_aspect_ratio_must_agree():
+    portrait, landscape = _print(0, aspect=0.77), _print(0, aspect=1.29)
+    assert len(group_retakes(["a", "b"], [portrait, landscape], DedupeLimits())) == 2
+
+
+def test_identical_bytes_merge_without_fingerprints():
+    groups = group_retakes(["same", "same", "other"], [None, None, None], DedupeLimits())
+    assert groups == [([0, 1], 0), ([2], 0)]
@@ -0,0 +1,39 @@
+import asyncio
+import hashlib
+
+import fitz  # PyMuPDF
+
+from App.services.extraction import page_selection
+from App.services.extraction.document_bundle import DocumentBundle, UploadedDocument
+
+# Long enough to count as a usable text layer (TEXT_LAYER_MIN_CHARS)
+DEAL_PAGE = "Annual Percentage Rate 6.9%  Finance Charge $4,210  Amount Financed $28,500  Total of Payments $32,710. " * 3
+RIDER_PAGE = "Privacy Notice. We collect nonpublic personal information about you. Privacy policy for our customers. " * 3
+
+
+def _packet() -> DocumentBundle:
+    with fitz.open() as pdf:
+        for text in (DEAL_PAGE, RIDER_PAGE):
+            pdf.new_page().insert_textbox(fitz.Rect(36, 36, 560, 800), text, fontsize=11)
+        content = pdf.tobytes()
+    doc = UploadedDocument("packet.pdf", content, hashlib.sha256(content).hexdigest(), "application/pdf")
+    return DocumentBundle(documents=(doc,))
+
+
+def test_rider_page_is_dropped():
+    selection = asyncio.run(page_selection.select_pages(_packet()))
+    assert [page.page for page in selection.kept] == [1]
+    assert [page.page for page in selection.skipped] == [2]
+    assert selection.bundle.documents[0].page_count == 1
+
+
+def test_subset_failure_sends_the_whole_document(monkeypatch):
+    async def broken_run_cpu(stage, fn, *args):
+        raise RuntimeError("cannot open broken document")
+
+    monkeypatch.setattr(page_selection, "run_cpu", broken_run_cpu)
+    bundle = _packet()
+    selection = asyncio.run(page_selection.select_pages(bundle))
+    assert selection.bundle.documents == bundle.documents
+    assert [page.page for page in selection.kept] == [1, 2]
+    assert selection.skipped == ()
@@ -0,0 +1,57 @@
+"""
+Text-layer-first page planning.
+
+Dealer-generated PDFs carry an embedded text layer; sending that text to the
+model is far smaller and faster than sending page images. Each page of a
+bundle is planned as either "text" (usable text layer) or "vision" (images,
+scanned pages, pages with little or garbled text).
+
+    TEXT_LAYER_MIN_CHARS   non-whitespace characters a page needs (default 200)
+"""
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .document_bundle import DocumentBundle, UploadedDocument
+
+# Share of letters/digits below which a text layer is treated as garbage
+_MIN_READABLE_RATIO = 0.5
+
+
+def _min_chars() -> int:
+    return int(os.getenv("TEXT_LAYER_MIN_CHARS", "200"))
+
+
+def has_usable_text(text: str, min_chars: Optional[int] = None) -> bool:
+    compact = "".join((text or "").split())
+    if len(compact) < (min_chars if min_chars is not None else _min_chars()):
+        return False
+    readable = sum(ch.isalnum() for ch in compact)
+    return readable / len(compact) >= _MIN_READABLE_RATIO
+
+
+@dataclass(frozen=True)
+class PagePlan:
+    document: UploadedDocument
+    page: Optional[int]  # 1-based page for PDFs, None for images
+    text: Optional[str]  # text layer to send instead of the page image
+
+    @property
+    def use_vision(self) -> bool:
+        return self.text is None
+
+
+def plan_pages(bundle: DocumentBundle, min_chars: Optional[int] = None) -> List[PagePlan]:
+    plans: List[PagePlan] = []
+    for document in bundle:
+        if not document.is_pdf:
+            plans.append(PagePlan(document, None, None))
+            continue
+        if not document.page_texts:
+            # unreadable PDF: let the model look at the whole file
+            plans.append(PagePlan(document, None, None))
+            continue
+        for number, text in enumerate(document.page_texts, start=1):
+            usable = has_usable_text(text, min_chars)
+            plans.append(PagePlan(document, number, text if usable else None))
+    return plans
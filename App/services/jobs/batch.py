@@ -0,0 +1,162 @@
+"""
+Bulk re-analysis of many deals in one request.
+
+Input is either a zip archive with one folder per deal (files at the archive
+root count as one deal each), or JSONL with one pre-extracted payload per
+line, shaped like the /api/rating/json body ({"data": {...}, "language": ...},
+optionally with an "id") or a bare data dict. Deals run through the analyzer
+singletons the single-deal endpoints use, so extraction and result caches
+are shared, at most BATCH_CONCURRENCY at a time. Each deal runs in a worker
+thread (jobs.run_in_thread), so the analyzers' blocking model calls overlap
+instead of queueing on the event loop. One NDJSON line is written per deal
+as soon as it finishes, in completion order; each line carries the deal id
+and its position in the input. A final {"summary": ...} line closes the
+stream.
+
+    BATCH_CONCURRENCY    deals analyzed at once (default 4)
+    BATCH_MAX_DEALS      deals accepted per request (default 500)
+    BATCH_MAX_BYTES      archive / JSONL size limit (default 500MB)
+"""
+import asyncio
+import io
+import json
+import os
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from App.services.extraction.document_bundle import MAX_UPLOAD_BYTES
+from .jobs import Runner, error_status, run_in_thread
+
+
+def batch_concurrency() -> int:
+    return max(1, int(os.getenv("BATCH_CONCURRENCY", "4")))
+
+
+def batch_max_deals() -> int:
+    return int(os.getenv("BATCH_MAX_DEALS", "500"))
+
+
+def batch_max_bytes() -> int:
+    return int(os.getenv("BATCH_MAX_BYTES", str(500 * 1024 * 1024)))
+
+
+@dataclass
+class Deal:
+    deal_id: str
+    index: int
+    language: str
+    members: List[str] = field(default_factory=list)  # zip entries, for archive deals
+    data: Optional[Dict[str, Any]] = None              # pre-extracted payload, for JSONL deals
+    error: Optional[str] = None                        # input problem, reported on the deal's line
+
+
+def _skip_member(name: str) -> bool:
+    parts = name.split("/")
+    return name.endswith("/") or parts[0] == "__MACOSX" or parts[-1].startswith(".")
+
+
+def read_archive_deals(archive: zipfile.ZipFile, language: str) -> List[Deal]:
+    """One deal per top-level folder, in archive order; root-level files are deals of their own."""
+    deals: Dict[str, Deal] = {}
+    for info in archive.infolist():
+        name = info.filename
+        if _skip_member(name):
+            continue
+        key = name.split("/", 1)[0]
+        deal = deals.get(key)
+        if deal is None:
+            deal = deals[key] = Deal(deal_id=key, index=len(deals), language=language)
+        deal.members.append(name)
+    return list(deals.values())
+
+
+def read_jsonl_deals(lines: List[bytes], language: str) -> List[Deal]:
+    deals = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        deal = Deal(deal_id=f"line {number}", index=len(deals), language=language)
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            deal.error = f"Invalid JSON on line {number}: {str(e)}"
+            deals.append(deal)
+            continue
+        if isinstance(record, dict) and isinstance(record.get("data"), dict):
+            deal.data = record["data"]
+            deal.deal_id = str(record.get("id") or deal.deal_id)
+            deal.language = record.get("language") or language
+        elif isinstance(record, dict):
+            deal.data = record
+        else:
+            deal.error = f"Line {number} is not a JSON object"
+        deals.append(deal)
+    return deals
+
+
+def _open_members(archive: zipfile.ZipFile, deal: Deal) -> List[UploadFile]:
+    """The deal's files as uploads. Blocking; runs in a thread."""
+    uploads = []
+    for name in deal.members:
+        info = archive.getinfo(name)
+        # file_size comes from the archive and can lie, so the read is bounded too
+        if info.file_size > MAX_UPLOAD_BYTES:
+            raise ValueError(f"File too large: {name}")
+        with archive.open(info) as member:
+            content = member.read(MAX_UPLOAD_BYTES + 1)
+        if len(content) > MAX_UPLOAD_BYTES:
+            raise ValueError(f"File too large: {name}")
+        uploads.append(UploadFile(file=io.BytesIO(content), filename=os.path.basename(name), size=len(content)))
+    return uploads
+
+
+def _result_payload(result: Any) -> Any:
+    return result.model_dump(mode="json") if hasattr(result, "model_dump") else result
+
+
+async def run_batch(
+    runner: Runner,
+    deals: List[Deal],
+    archive: Optional[zipfile.ZipFile] = None,
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """NDJSON lines, one per deal as it completes, then a summary line."""
+    limit = asyncio.Semaphore(concurrency or batch_concurrency())
+    started = time.time()
+
+    async def run(deal: Deal) -> Dict[str, Any]:
+        async with limit:
+            deal_started = time.time()
+            line: Dict[str, Any] = {"id": deal.deal_id, "index": deal.index}
+            try:
+                if deal.error:
+                    raise ValueError(deal.error)
+                if deal.data is not None:
+                    result = await run_in_thread(runner, language=deal.language, parsed_data=deal.data)
+                else:
+                    uploads = await asyncio.to_thread(_open_members, archive, deal)
+                    result = await run_in_thread(runner, uploads, language=deal.language)
+                line.update(status="succeeded", result=_result_payload(result))
+            except Exception as e:
+                line.update(status="failed", error=str(e), error_status=error_status(e))
+            line["seconds"] = round(time.time() - deal_started, 2)
+            return line
+
+    tasks = [asyncio.create_task(run(deal)) for deal in deals]
+    counts = {"succeeded": 0, "failed": 0}
+    try:
+        for finished in asyncio.as_completed(tasks):
+            line = await finished
+            counts[line["status"]] += 1
+            yield json.dumps(line) + "\n"
+    finally:
+        # Client went away: stop deals that have not finished yet
+        for task in tasks:
+            task.cancel()
+    elapsed = time.time() - started
+    print(f"[batch] {len(deals)} deal(s): {counts['succeeded']} succeeded, {counts['failed']} failed in {elapsed:.1f}s")
+    yield json.dumps({"summary": {"deals": len(deals), **counts, "seconds": round(elapsed, 2)}}) + "\n"
@@ -0,0 +1,355 @@
+"""
+Background analysis jobs.
+
+Uploads are written to JOBS_DIR/<job_id>/ and queued; a fixed number of
+worker tasks run the analyses, so the server decides how many long
+(40-120s) analyses run at once instead of holding one HTTP connection open
+per analysis. Job state lives in memory and is mirrored to job.json so
+finished results can still be fetched after a restart. The analyzers make
+blocking HTTP calls to the models, so each job runs on its own event loop
+in a worker thread (run_in_thread) and the server loop stays free for
+status polls and other requests. While a job runs, the analyzer's
+report_progress() calls (App.core.progress) move its stage and progress
+along; the app's lifespan stops the workers on shutdown.
+
+    JOBS_DIR                 where uploads and results are kept (default App/core/.jobs)
+    JOB_WORKERS              concurrent analyses (default 2)
+    JOB_QUEUE_SIZE           queued jobs beyond which submissions are refused (default 50)
+    JOB_RETENTION_SECONDS    how long finished jobs are kept, on disk too (default 3600)
+"""
+import asyncio
+import contextvars
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from App.core.progress import reset_progress, track_progress
+from App.services.extraction.document_bundle import MAX_UPLOAD_BYTES
+
+# An analyzer entry point: runner(files, language=...)
+Runner = Callable[..., Awaitable[Any]]
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+
+_CHUNK_SIZE = 1024 * 1024
+# Seconds between scans of JOBS_DIR for directories no live job owns
+_SWEEP_INTERVAL = 300
+
+
+class JobQueueFull(RuntimeError):
+    """The queue is at JOB_QUEUE_SIZE; the client should retry later."""
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    language: str
+    files: List[Dict[str, Any]] = field(default_factory=list)
+    status: str = QUEUED
+    stage: str = "queued"
+    progress: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("files")
+        return data
+
+
+async def run_in_thread(runner: Runner, *args: Any, **kwargs: Any) -> Any:
+    """
+    await runner(*args, **kwargs) on a fresh event loop in a worker thread.
+    The caller's context variables (progress reporter, deadline) go along.
+    Cancelling the caller cancels the analysis at its next await; a model
+    call already in flight still runs to its timeout.
+    """
+    lock = threading.Lock()
+    state: Dict[str, Any] = {"cancelled": False, "loop": None, "task": None}
+
+    async def main() -> Any:
+        with lock:
+            if state["cancelled"]:
+                raise asyncio.CancelledError()
+            state["loop"], state["task"] = asyncio.get_running_loop(), asyncio.current_task()
+        return await runner(*args, **kwargs)
+
+    def run() -> Any:
+        return asyncio.run(main())
+
+    try:
+        return await asyncio.to_thread(run)
+    except asyncio.CancelledError:
+        with lock:
+            state["cancelled"] = True
+            loop, task = state["loop"], state["task"]
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # already finished and closed
+        raise
+
+
+def error_status(error: Exception) -> int:
+    """Same mapping as the synchronous routes: 400 for bad input, 504 for timeouts, else 500."""
+    if isinstance(error, ValueError):
+        return 400
+    message = str(error).lower()
+    if "timeout" in message or "connection" in message:
+        return 504
+    return 500
+
+
+class JobManager:
+    def __init__(self, runners: Dict[str, Runner]):
+        self.runners = runners
+        self.root = os.getenv("JOBS_DIR") or os.path.join(os.getcwd(), "App", "core", ".jobs")
+        self.workers = int(os.getenv("JOB_WORKERS", "2"))
+        self.queue_size = int(os.getenv("JOB_QUEUE_SIZE", "50"))
+        self.retention = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+        self.jobs: Dict[str, Job] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Submissions that hold a queue slot while their uploads are written
+        self._reserved = 0
+        self._swept_at = 0.0
+
+    # ─── Lifecycle ───
+
+    def _ensure_started(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            # Fresh context: workers must not inherit the deadline of the request that started them
+            self._tasks = [
+                asyncio.create_task(self._worker(n), context=contextvars.Context())
+                for n in range(self.workers)
+            ]
+            print(f"[jobs] started {self.workers} worker(s), queue size {self.queue_size}")
+        return self._queue
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    # ─── Persistence ───
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, job_id)
+
+    def _save(self, job: Job) -> None:
+        path = os.path.join(self._job_dir(job.job_id), "job.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(job), f)
+        os.replace(tmp_path, path)
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        # job ids are uuid4 hex; anything else never touches the filesystem
+        if len(job_id) != 32 or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        path = os.path.join(self._job_dir(job_id), "job.json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                job = Job(**json.load(f))
+        except Exception as e:
+            print(f"[jobs] Could not load {job_id}: {str(e)}")
+            return None
+        if not job.done:
+            # The process that owned it is gone
+            job.status, job.stage, job.error, job.error_status = FAILED, "failed", "Job interrupted by a server restart", 500
+        return job
+
+    async def _persist_upload(self, job_dir: str, index: int, file: UploadFile) -> Dict[str, Any]:
+        name = os.path.basename(file.filename or f"upload_{index}")
+        path = os.path.join(job_dir, f"{index:02d}_{name}")
+        size = 0
+        await file.seek(0)
+        with open(path, "wb") as out:
+            while True:
+                chunk = await file.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise ValueError(f"File too large: {file.filename}")
+                out.write(chunk)
+        return {"path": path, "filename": file.filename, "content_type": file.content_type, "size": size}
+
+    def _purge(self) -> None:
+        now = time.time()
+        cutoff = now - self.retention
+        for job_id, job in list(self.jobs.items()):
+            if job.done and (job.finished_at or 0) < cutoff:
+                self.jobs.pop(job_id, None)
+                self._changed.pop(job_id, None)
+                shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        if now - self._swept_at >= _SWEEP_INTERVAL:
+            self._swept_at = now
+            self._sweep_disk(cutoff)
+
+    def _sweep_disk(self, cutoff: float) -> None:
+        """Remove job directories left by earlier processes once they are past retention."""
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name in self.jobs or not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                modified = entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+            if modified < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    # ─── Public API ───
+
+    async def submit(self, kind: str, files: List[UploadFile], language: str) -> Job:
+        if kind not in self.runners:
+            raise KeyError(kind)
+        if not files:
+            raise ValueError("No files provided")
+        queue = self._ensure_started()
+        # Take the slot before the first await; a check alone lets concurrent submissions all pass
+        if self.queue_size > 0 and queue.qsize() + self._reserved >= self.queue_size:
+            raise JobQueueFull("Too many analyses queued, please retry shortly")
+        self._reserved += 1
+        try:
+            self._purge()
+            job = Job(job_id=uuid.uuid4().hex, kind=kind, language=language)
+            job_dir = self._job_dir(job.job_id)
+            os.makedirs(job_dir, exist_ok=True)
+            try:
+                job.files = [await self._persist_upload(job_dir, index, file) for index, file in enumerate(files)]
+                self.jobs[job.job_id] = job
+                self._changed[job.job_id] = asyncio.Event()
+                self._save(job)
+                queue.put_nowait(job.job_id)
+            except BaseException:
+                # Cancelled or failed mid-upload: leave nothing behind that no worker will pick up
+                self.jobs.pop(job.job_id, None)
+                self._changed.pop(job.job_id, None)
+                shutil.rmtree(job_dir, ignore_errors=True)
+                raise
+        finally:
+            self._reserved -= 1
+        print(f"[jobs] {job.job_id} queued ({kind}, {len(job.files)} file(s), {queue.qsize()} waiting)")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+        return job
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        event = self._changed.get(job_id)
+        if event is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        job = self.jobs.get(job_id)
+        if job is None or job.status != QUEUED or self._queue is None:
+            return None
+        waiting = list(self._queue._queue)  # asyncio.Queue keeps its items in a deque
+        return waiting.index(job_id) + 1 if job_id in waiting else None
+
+    # ─── Workers ───
+
+    def _update(self, job: Job, **changes: Any) -> None:
+        for key, value in changes.items():
+            setattr(job, key, value)
+        self._save(job)
+        event = self._changed.get(job.job_id)
+        if event is not None:
+            event.set()
+            self._changed[job.job_id] = asyncio.Event()
+
+    def _open_uploads(self, job: Job) -> List[UploadFile]:
+        uploads = []
+        for info in job.files:
+            headers = Headers({"content-type": info["content_type"]}) if info.get("content_type") else None
+            uploads.append(UploadFile(
+                file=open(info["path"], "rb"),
+                filename=info["filename"],
+                size=info["size"],
+                headers=headers,
+            ))
+        return uploads
+
+    def _report(self, job: Job, stage: str, percent: int) -> None:
+        self._update(job, stage=stage, progress=max(job.progress, percent))
+
+    async def _run(self, job: Job) -> None:
+        self._update(job, status=RUNNING, stage="starting", progress=5, started_at=time.time())
+        uploads = self._open_uploads(job)
+        # Reports arrive on the job's thread; job state and its events belong to this loop
+        loop = asyncio.get_running_loop()
+        token = track_progress(lambda stage, percent: loop.call_soon_threadsafe(self._report, job, stage, percent))
+        try:
+            result = await run_in_thread(self.runners[job.kind], uploads, language=job.language)
+            payload = result.model_dump(mode="json") if hasattr(result, "model_dump") else result
+            self._update(job, status=SUCCEEDED, stage="done", progress=100, finished_at=time.time(), result=payload)
+        except Exception as e:
+            self._update(
+                job,
+                status=FAILED,
+                stage="failed",
+                progress=100,
+                finished_at=time.time(),
+                error=str(e),
+                error_status=error_status(e),
+            )
+        finally:
+            reset_progress(token)
+            for upload in uploads:
+                upload.file.close()
+        elapsed = (job.finished_at or time.time()) - (job.started_at or job.created_at)
+        print(f"[jobs] {job.job_id} {job.status} in {elapsed:.1f}s")
+
+    async def _worker(self, number: int) -> None:
+        queue = self._queue
+        while True:
+            job_id = await queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job is not None:
+                    await self._run(job)
+            except Exception as e:
+                print(f"[jobs] worker {number} error on {job_id}: {str(e)}")
+            finally:
+                queue.task_done()
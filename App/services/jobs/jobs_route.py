@@ -0,0 +1,184 @@
+import os
+import tempfile
+import zipfile
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Request
+from fastapi.responses import StreamingResponse
+from typing import List
+from .jobs_schema import JobAccepted, JobStatus
+from .jobs import JobManager, JobQueueFull
+from .batch import batch_max_bytes, batch_max_deals, read_archive_deals, read_jsonl_deals, run_batch
+from App.services.rating.rating_route import analyzer as rating_analyzer
+from App.services.contract.multi_image_analysis_route import analyzer as contract_analyzer
+from App.services.lease.lease_analysis_route import analyzer as lease_analyzer
+
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+# Seconds between keep-alive comments on an idle event stream
+_HEARTBEAT = 15.0
+
+# Same singletons as the synchronous endpoints, so their caches are shared
+ANALYZERS = {
+    "rating": rating_analyzer.analyze_images,
+    "contract": contract_analyzer.analyze_images,
+    "lease": lease_analyzer.analyze_lease_images,
+}
+manager = JobManager(ANALYZERS)
+
+
+def _status(job) -> JobStatus:
+    return JobStatus(**job.snapshot(), queue_position=manager.queue_position(job.job_id))
+
+
+@router.post("/jobs/{kind}", response_model=JobAccepted, status_code=202)
+async def submit_job(
+    kind: str,
+    files: List[UploadFile] = File(
+        ...,
+        description="Upload image files (jpg, png, gif, bmp, webp, pdf, tiff)"
+    ),
+    language: str = Form(default="English", description="Language for narrative parts")
+):
+    """
+    Queue a rating, contract or lease analysis and return immediately.
+
+    - **kind**: rating, contract or lease
+    - **files**: Multiple image files (jpg, png, gif, bmp, webp, pdf, tiff) — up to 10MB per file
+    - **language**: Language for narrative parts (default: English)
+
+    Poll `status_url` or subscribe to `events_url` for progress; the finished
+    status carries the same result the synchronous endpoint returns.
+    """
+    try:
+        job = await manager.submit(kind, files, language)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown analysis type: {kind}")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not queue analysis: {str(e)}")
+    return JobAccepted(
+        job_id=job.job_id,
+        kind=job.kind,
+        status=job.status,
+        status_url=f"/api/jobs/{job.job_id}",
+        events_url=f"/api/jobs/{job.job_id}/events",
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Current status of a job; includes the result once it has succeeded."""
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _status(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-sent events: one `status` event per change, ending with the finished status."""
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        last = None
+        while True:
+            current = manager.get(job_id)
+            if current is None:
+                return
+            status = _status(current)
+            body = status.model_dump_json()
+            if body != last:
+                last = body
+                yield f"event: status\ndata: {body}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if current.done or await request.is_disconnected():
+                return
+            await manager.wait_for_change(job_id, _HEARTBEAT)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _spool(upload: UploadFile) -> str:
+    """Copy the upload to a temp file the stream can read after the request body is gone."""
+    limit = batch_max_bytes()
+    total = 0
+    handle, path = tempfile.mkstemp(prefix="batch_")
+    try:
+        with os.fdopen(handle, "wb") as out:
+            while True:
+                chunk = await upload.read(1024 * 1024)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > limit:
+                    raise ValueError(f"Batch file too large (limit {limit // (1024 * 1024)}MB)")
+                out.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+@router.post("/batch/{kind}")
+async def analyze_batch(
+    kind: str,
+    file: UploadFile = File(
+        ...,
+        description="Zip archive with one folder per deal, or JSONL with one pre-extracted payload per line"
+    ),
+    language: str = Form(default="English", description="Language for narrative parts")
+):
+    """
+    Analyze many deals in one request and stream one NDJSON line per deal.
+
+    - **kind**: rating, contract or lease
+    - **file**: .zip (one folder of images/PDFs per deal) or .jsonl (one `{"data": ..., "language": ...}` per line)
+    - **language**: Default language for narrative parts (default: English)
+
+    Lines arrive as deals finish, not in input order; match them up by `id` or `index`.
+    """
+    runner = ANALYZERS.get(kind)
+    if runner is None:
+        raise HTTPException(status_code=404, detail=f"Unknown analysis type: {kind}")
+    try:
+        path = await _spool(file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    archive = None
+    try:
+        if zipfile.is_zipfile(path):
+            archive = zipfile.ZipFile(path)
+            deals = read_archive_deals(archive, language)
+        else:
+            with open(path, "rb") as f:
+                deals = read_jsonl_deals(f.readlines(), language)
+        if not deals:
+            raise ValueError("No deals found in batch file")
+        if len(deals) > batch_max_deals():
+            raise ValueError(f"Too many deals in one batch ({len(deals)}, limit {batch_max_deals()})")
+    except Exception as e:
+        if archive is not None:
+            archive.close()
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=f"Invalid batch file: {str(e)}")
+
+    async def stream():
+        try:
+            async for line in run_batch(runner, deals, archive):
+                yield line
+        finally:
+            if archive is not None:
+                archive.close()
+            os.remove(path)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+
+
+class JobAccepted(BaseModel):
+    job_id: str
+    kind: str
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    status_url: str = Field(..., description="Poll this URL for progress and the result")
+    events_url: str = Field(..., description="Server-sent events stream of the same status")
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    stage: str
+    progress: int = Field(..., description="0-100")
+    queue_position: Optional[int] = Field(default=None, description="1 = next to run; only while queued")
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    error_status: Optional[int] = Field(default=None, description="HTTP status the synchronous endpoint would have returned")
+    result: Optional[Dict[str, Any]] = Field(default=None, description="Same body as the synchronous endpoint, once succeeded")
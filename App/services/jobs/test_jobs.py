@@ -0,0 +1,134 @@
+import asyncio
+import io
+import json
+import os
+import threading
+import time
+
+from fastapi import UploadFile
+
+from App.core.progress import EXTRACTING, SCORING, report_progress
+from App.services.jobs import jobs
+from App.services.jobs.batch import Deal, run_batch
+from App.services.jobs.jobs import JobManager, JobQueueFull, SUCCEEDED
+
+
+def _upload(size: int = 2048) -> UploadFile:
+    return UploadFile(file=io.BytesIO(b"x" * size), filename="page1.jpg")
+
+
+def _manager(tmp_path, monkeypatch, workers: int, queue_size: int, runner=None) -> JobManager:
+    monkeypatch.setenv("JOBS_DIR", str(tmp_path))
+    monkeypatch.setenv("JOB_WORKERS", str(workers))
+    monkeypatch.setenv("JOB_QUEUE_SIZE", str(queue_size))
+
+    async def default_runner(files, language):
+        return {"files": len(files)}
+
+    return JobManager({"rating": runner or default_runner})
+
+
+def test_concurrent_submissions_cannot_overfill_the_queue(tmp_path, monkeypatch):
+    # No workers: queued jobs stay queued, so only the slot accounting decides
+    manager = _manager(tmp_path, monkeypatch, workers=0, queue_size=2)
+    real_persist = manager._persist_upload
+
+    async def slow_persist(job_dir, index, file):
+        await asyncio.sleep(0.01)
+        return await real_persist(job_dir, index, file)
+
+    manager._persist_upload = slow_persist
+
+    async def scenario():
+        return await asyncio.gather(
+            *[manager.submit("rating", [_upload()], "English") for _ in range(4)],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+    accepted = [r for r in results if not isinstance(r, Exception)]
+    refused = [r for r in results if isinstance(r, Exception)]
+    assert len(accepted) == 2
+    assert len(refused) == 2 and all(isinstance(e, JobQueueFull) for e in refused)
+    assert sorted(manager.jobs) == sorted(job.job_id for job in accepted)
+    assert sorted(os.listdir(tmp_path)) == sorted(job.job_id for job in accepted)
+
+
+def test_failed_upload_leaves_nothing_behind(tmp_path, monkeypatch):
+    manager = _manager(tmp_path, monkeypatch, workers=0, queue_size=2)
+    monkeypatch.setattr(jobs, "MAX_UPLOAD_BYTES", 4096)
+
+    async def scenario():
+        try:
+            await manager.submit("rating", [_upload(), _upload(8192)], "English")
+        except ValueError:
+            pass
+        # The refused submission gave its slot back
+        return await manager.submit("rating", [_upload()], "English")
+
+    job = asyncio.run(scenario())
+    assert list(manager.jobs) == [job.job_id]
+    assert os.listdir(tmp_path) == [job.job_id]
+    assert manager._reserved == 0
+
+
+def test_jobs_run_off_the_event_loop(tmp_path, monkeypatch):
+    released = threading.Event()
+
+    async def runner(files, language):
+        report_progress(EXTRACTING)
+        # A blocking model call; the server loop must stay free to report the stage and release it
+        if not released.wait(5):
+            raise RuntimeError("event loop was blocked")
+        report_progress(SCORING)
+        return {"ok": True}
+
+    manager = _manager(tmp_path, monkeypatch, workers=1, queue_size=5, runner=runner)
+
+    async def scenario():
+        job = await manager.submit("rating", [_upload()], "English")
+        seen = []
+        while not job.done:
+            await manager.wait_for_change(job.job_id, 1.0)
+            seen.append((job.stage, job.progress))
+            if job.stage == "extracting":
+                released.set()
+        await manager.shutdown()
+        return job, seen
+
+    job, seen = asyncio.run(scenario())
+    assert ("extracting", 25) in seen
+    assert [progress for _, progress in seen] == sorted(progress for _, progress in seen)
+    assert (job.status, job.stage, job.progress, job.result) == (SUCCEEDED, "done", 100, {"ok": True})
+
+
+def test_batch_deals_overlap():
+    both_running = threading.Barrier(2, timeout=5)
+
+    async def runner(language, parsed_data):
+        # Blocks its thread until the other deal is running too
+        both_running.wait()
+        return {"deal": parsed_data["n"]}
+
+    deals = [Deal(deal_id=f"d{n}", index=n, language="English", data={"n": n}) for n in range(2)]
+
+    async def scenario():
+        return [json.loads(line) async for line in run_batch(runner, deals, concurrency=2)]
+
+    lines = asyncio.run(scenario())
+    assert sorted(line["result"]["deal"] for line in lines[:-1]) == [0, 1]
+    assert lines[-1]["summary"]["succeeded"] == 2
+
+
+def test_stale_job_directories_are_swept(tmp_path, monkeypatch):
+    manager = _manager(tmp_path, monkeypatch, workers=0, queue_size=5)
+    stale = tmp_path / ("a" * 32)
+    fresh = tmp_path / ("b" * 32)
+    for directory in (stale, fresh):
+        directory.mkdir()
+        (directory / "job.json").write_text("{}")
+    old = time.time() - manager.retention - 60
+    os.utime(stale, (old, old))
+
+    job = asyncio.run(manager.submit("rating", [_upload()], "English"))
+    assert sorted(os.listdir(tmp_path)) == sorted([fresh.name, job.job_id])
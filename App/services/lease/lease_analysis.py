@@ -1,10 +1,17 @@
 from App.services.rate_helper.ocr_normalizer import OCRNormalizer
-from App.services.rate_helper.ocr_normalization_schema import NormalizedLineItem
+from App.services.rate_helper.records import LineItemRecord
+from App.services.extraction.document_bundle import DocumentBundle, VisionImage, anthropic_source_block, ingest_uploads
+from App.services.extraction.image_preprocess import preprocess_bundle, vision_pages
+from App.services.extraction.image_quality import UnreadablePageError, check_bundle
+from App.services.extraction.page_dedupe import dedupe_bundle, merged_uploads
+from App.services.extraction.page_selection import select_pages
+from App.services.extraction.request_body import JsonBody
+from App.core.progress import EXTRACTING, INGESTING, NARRATIVE, SCORING, report_progress
+from App.core.deadline import DeadlineExceeded, NARRATIVE_SECONDS, TRANSLATION_SECONDS, budget_timeout, has_budget, remaining
 from App.services.rate_helper.discount_detector import DiscountDetector
 from App.services.rate_helper.discount_schema import DiscountLineItem, DiscountTotals
 from typing import List, Optional, Dict
 import os
-import base64
 import json
 
 import requests
@@ -12,19 +19,16 @@ from dotenv import load_dotenv
 from fastapi import UploadFile
 from App.services.contract.multi_image_analysis_schema import (
     MultiImageAnalysisResponse, Flag, NormalizedPricing, 
-    APRData, TermData, TradeData, Narrative
+    APRData, TermData, TradeData, Narrative, ScoreResponse
 )
 from App.services.rate_helper.audit_classifier import AuditClassifier, AuditClassification
 from App.services.rate_helper.gap_logic import GAPLogic, GAPRecommendation
 from App.services.rate_helper.audit_flags import AuditFlagBuilder, AuditFlag
 from App.services.rate_helper.audit_summary import AuditSummary
 from App.services.rate_helper.json_to_parsed import convert_extracted_json_to_parsed
-from App.services.rate_helper.scoring_engine import (
-    load_rules,
-    build_active_flags,
-    compute_flags_from_parsed,
-    score_flags,
-)
+from App.services.rate_helper.narrative_templates import build_narrative, fill_narrative
+from App.services.rate_helper.scoring_engine import score_parsed, ANALYSIS_MODES
+from App.services.rate_helper.score_response import output_flags, score_only_response
 from App.services.rate_helper.pricing_caps_loader import load_pricing_caps, get_pricing_cap
 
 load_dotenv()
@@ -780,12 +784,12 @@ Analyze the lease document image and return **valid JSON only** following this c
         ]
         return any(keyword in name for keyword in captive_keywords)
 
-    def _make_cache_key(self, base64_images: List[str]) -> str:
+    def _make_cache_key(self, base64_images: List[VisionImage]) -> str:
         """Create a stable cache key for the given image contents."""
         import hashlib
         hasher = hashlib.sha256()
         for img in base64_images:
-            hasher.update(img.encode("utf-8"))
+            hasher.update(img.encode("utf-8") if isinstance(img, str) else img.sha256.encode("utf-8"))
         return hasher.hexdigest()
 
     def _load_cached_extraction(self, cache_key: str) -> Optional[dict]:
@@ -856,6 +860,9 @@ Analyze the lease document image and return **valid JSON only** following this c
         """Translate flag text fields to the requested language (no scoring changes)."""
         if not language or language.lower() == "english":
             return flags
+        if not has_budget(TRANSLATION_SECONDS):
+            print(f"[deadline] {remaining():.0f}s left, flags stay untranslated")
+            return flags
 
         flags_payload = [
             {"type": f.type, "message": f.message, "item": f.item}
@@ -893,31 +900,16 @@ Analyze the lease document image and return **valid JSON only** following this c
 
         return translated_flags
     
-    async def _validate_files(self, files: List[UploadFile]) -> List[UploadFile]:
-        """Validate uploaded files"""
-        validated = []
-        for file in files:
-            file_ext = os.path.splitext(file.filename)[1].lower()
-            if file_ext not in self.ALLOWED_EXTENSIONS:
-                raise ValueError(f"Invalid file type: {file.filename}")
-            contents = await file.read()
-            if len(contents) > self.MAX_FILE_SIZE:
-                raise ValueError(f"File too large: {file.filename}")
-            await file.seek(0)
-            validated.append(file)
-        return validated
-    
-    async def _convert_files_to_base64(self, files: List[UploadFile]) -> List[str]:
-        """Convert files to base64"""
-        base64_images = []
-        for file in files:
-            contents = await file.read()
-            base64_content = base64.b64encode(contents).decode('utf-8')
-            base64_images.append(base64_content)
-            await file.seek(0)
-        return base64_images
+    async def _ingest_files(self, files: List[UploadFile]) -> DocumentBundle:
+        """
+        Read each upload once (type/size checks, hash, MIME sniffing), reject
+        illegible photos as uploaded, then preprocess the images and merge retakes
+        """
+        documents = await ingest_uploads(files, self.MAX_FILE_SIZE, self.ALLOWED_EXTENSIONS)
+        await check_bundle(documents)
+        return await dedupe_bundle(await preprocess_bundle(documents))
     
-    def _normalize_line_items(self, line_items: List[Dict]) -> List[NormalizedLineItem]:
+    def _normalize_line_items(self, line_items: List[Dict]) -> List[LineItemRecord]:
         """
         Normalize OCR line items before scoring.
         
@@ -926,7 +918,7 @@ Analyze the lease document image and return **valid JSON only** following this c
                        Expected format: [{"description": "...", "amount": "..."}, ...]
         
         Returns:
-            List of normalized line items with proper classification
+            List of normalized line item records with proper classification
         """
         normalized = []
         for item in line_items:
@@ -934,7 +926,7 @@ Analyze the lease document image and return **valid JSON only** following this c
             amount_raw = str(item.get("amount", "0"))
             
             if raw_text:  # Only process if we have text
-                normalized_item = self.ocr_normalizer.normalize_line_item(
+                normalized_item = self.ocr_normalizer.normalize_line_item_record(
                     raw_text=raw_text,
                     amount_raw=amount_raw
                 )
@@ -977,8 +969,8 @@ Analyze the lease document image and return **valid JSON only** following this c
                 response = requests.post(
                     self.api_url,
                     headers=headers,
-                    json=payload,
-                    timeout=self.API_TIMEOUT
+                    data=JsonBody(payload),
+                    timeout=budget_timeout(self.API_TIMEOUT)
                 )
                 response.raise_for_status()
                 print(f"API call successful on attempt {attempt + 1}")
@@ -993,7 +985,7 @@ Analyze the lease document image and return **valid JSON only** following this c
             except requests.exceptions.RequestException as e:
                 raise RuntimeError(f"Anthropic API error: {str(e)}")
 
-    def _get_extraction_messages(self, base64_images: List[str], language: str, image_detail: str) -> List[dict]:
+    def _get_extraction_messages(self, base64_images: List[VisionImage], language: str, image_detail: str) -> List[dict]:
         content = [
             {
                 "type": "text",
@@ -1175,14 +1167,7 @@ Return VALID JSON matching the schema EXACTLY.
         
         if base64_images:
             for base64_image in base64_images:
-                content.append({
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": base64_image
-                    }
-                })
+                content.append(anthropic_source_block(base64_image))
             
         return [
             {"role": "user", "content": content}
@@ -1317,10 +1302,12 @@ MANDATORY: red_flags, green_flags, blue_flags MUST each have at least one item."
         for attempt in range(self.MAX_RETRIES):
             try:
                 print(f"Lease JSON full-analysis API call attempt {attempt + 1}/{self.MAX_RETRIES}...")
-                resp = requests.post(self.api_url, headers=headers, json=payload, timeout=self.API_TIMEOUT)
+                resp = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(self.API_TIMEOUT))
                 resp.raise_for_status()
                 print("Lease JSON full-analysis API call successful.")
                 return resp.json()
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 last_error = e
                 if attempt < self.MAX_RETRIES - 1:
@@ -1329,6 +1316,10 @@ MANDATORY: red_flags, green_flags, blue_flags MUST each have at least one item."
 
     def _call_narrative_api(self, parsed: dict, score: float, red_flags: list, green_flags: list, blue_flags: list, language: str) -> dict:
         """Call OpenAI to generate narrative from flags + score (no images needed)."""
+        if not has_budget(NARRATIVE_SECONDS):
+            # Callers fill every section from their deterministic defaults
+            print(f"[deadline] {remaining():.0f}s left, skipping narrative generation")
+            return {}
         flags_payload = {
             "red_flags": [{"type": f.type, "message": f.message, "item": f.item, "deduction": f.deduction} for f in red_flags],
             "green_flags": [{"type": f.type, "message": f.message, "item": f.item, "bonus": f.bonus} for f in green_flags],
@@ -1375,46 +1366,13 @@ Return ONLY a JSON object:
             "max_tokens": 4096
         }
         try:
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=self.API_TIMEOUT)
+            response = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(self.API_TIMEOUT))
             response.raise_for_status()
             return self._parse_api_response(response.json())
         except Exception as e:
             print(f"Lease narrative API call failed: {e}")
             return {}
 
-    async def _optimize_images(self, files: List[UploadFile]) -> List[UploadFile]:
-        """Optimize images before encoding (optional enhancement)"""
-        from PIL import Image
-        import io
-        
-        optimized = []
-        for file in files:
-            # Read image
-            contents = await file.read()
-            image = Image.open(io.BytesIO(contents))
-            
-            # Resize if too large (max 2048px on longest side)
-            max_dimension = 2048
-            if max(image.size) > max_dimension:
-                ratio = max_dimension / max(image.size)
-                new_size = tuple(int(dim * ratio) for dim in image.size)
-                image = image.resize(new_size, Image.Resampling.LANCZOS)
-            
-            # Convert to JPEG with compression
-            output = io.BytesIO()
-            image.convert('RGB').save(output, format='JPEG', quality=85, optimize=True)
-            output.seek(0)
-            
-            # Create new UploadFile from optimized bytes
-            from fastapi import UploadFile
-            optimized_file = UploadFile(
-                filename=file.filename,
-                file=output
-            )
-            optimized.append(optimized_file)
-        
-        return optimized
-    
     def _extract_trade_data(self, parsed: dict) -> TradeData:
         """
         Extract trade data using improved OCR extraction and cap cost analysis.
@@ -2078,14 +2036,29 @@ Return ONLY a JSON object:
 
         return flags
 
-    async def analyze_lease_images(self, files: List[UploadFile] = None, language: str = "English", base64_images: List[str] = None, parsed_data: dict = None) -> MultiImageAnalysisResponse:
-        """Main analysis entry point. Accepts files, base64_images, or pre-extracted parsed_data dict."""
+    async def analyze_lease_images(self, files: List[UploadFile] = None, language: str = "English", base64_images: List[str] = None, parsed_data: dict = None, mode: str = "full") -> MultiImageAnalysisResponse:
+        """Main analysis entry point. Accepts files, base64_images, or pre-extracted parsed_data dict.
+
+        mode="score_only" returns a ScoreResponse: score, badge and flags from the rules
+        engine, with no narrative or translation calls. mode="template" returns the full
+        response with the template narrative (English, untranslated flags, no model call
+        after extraction).
+        """
+        if mode not in ANALYSIS_MODES:
+            raise ValueError(f"Invalid mode: {mode} (expected one of {', '.join(ANALYSIS_MODES)})")
+        score_only = mode == "score_only"
+        template = mode == "template"
+        skipped_pages: List[dict] = []
         try:
             if parsed_data is not None:
                 # ── JSON path: same pattern as contract ──────────────────────────────
                 parsed = convert_extracted_json_to_parsed(parsed_data)
 
-                should_use_ai = not parsed.get("has_precomputed_flags", False)
+                should_use_ai = not score_only and not template and not parsed.get("has_precomputed_flags", False)
+                if should_use_ai and not has_budget(NARRATIVE_SECONDS):
+                    # The AI pass only adds narrative and flag wording; scoring is deterministic either way
+                    print(f"[deadline] {remaining():.0f}s left, skipping the AI analysis pass")
+                    should_use_ai = False
                 if should_use_ai:
                     print("Lease JSON path: calling AI for full prompt-based analysis...")
                     api_response = self._call_json_analysis_api(parsed_data, language)
@@ -2101,50 +2074,22 @@ Return ONLY a JSON object:
                     ai_result["has_precomputed_flags"] = True
                     parsed = ai_result
 
-                # --- SmartBuyer scoring engine (rules-driven) ---
-                rules = load_rules()
-                upstream_flags = build_active_flags(parsed.get("flags", []), rules.flag_registry, "upstream")
-                computed_flags = compute_flags_from_parsed(parsed, rules, mode="LEASE")
-                all_flags = upstream_flags + computed_flags
-
-                scoring_result = score_flags(
-                    all_flags,
-                    rules,
-                    parsed.get("audit_status", "COMPLETE")
-                )
+                if score_only:
+                    return score_only_response(parsed, "LEASE", ScoreResponse, self._assign_badge, skipped_pages, gap_review=False)
 
-                def _to_output_flag(active_flag: "ActiveFlag") -> Flag:
-                    deduction = None
-                    bonus = None
-                    if active_flag.points < 0:
-                        deduction = int(round(abs(active_flag.adjusted_points)))
-                    elif active_flag.points > 0:
-                        bonus = int(round(abs(active_flag.points)))
-                    return Flag(
-                        type=active_flag.flag_id,
-                        message=active_flag.message,
-                        item=active_flag.group,
-                        deduction=deduction,
-                        bonus=bonus
-                    )
-
-                red_flags: List[Flag] = []
-                green_flags: List[Flag] = []
-                blue_flags: List[Flag] = []
-                for active_flag in scoring_result.flags:
-                    if active_flag.suppressed or active_flag.group == "SYSTEM":
-                        continue
-                    flag_obj = _to_output_flag(active_flag)
-                    if active_flag.group == "POSITIVE":
-                        green_flags.append(flag_obj)
-                    elif active_flag.group == "DEALER_CONDUCT":
-                        red_flags.append(flag_obj)
-                    else:
-                        blue_flags.append(flag_obj)
-
-                red_flags = self._translate_flags(red_flags, language)
-                green_flags = self._translate_flags(green_flags, language)
-                blue_flags = self._translate_flags(blue_flags, language)
+                report_progress(SCORING)
+                # --- SmartBuyer scoring engine (rules-driven) ---
+                scoring_result = score_parsed(parsed, mode="LEASE")
+                groups = output_flags(parsed, scoring_result, gap_review=False)
+                red_flags = [Flag(**flag) for flag in groups["red_flags"]]
+                green_flags = [Flag(**flag) for flag in groups["green_flags"]]
+                blue_flags = [Flag(**flag) for flag in groups["blue_flags"]]
+
+                report_progress(NARRATIVE)
+                if not template:
+                    red_flags = self._translate_flags(red_flags, language)
+                    green_flags = self._translate_flags(green_flags, language)
+                    blue_flags = self._translate_flags(blue_flags, language)
 
                 if not red_flags:
                     red_flags.append(Flag(type="General", message="No major compliance issues identified — review all lease terms before signing.", item="General"))
@@ -2154,7 +2099,11 @@ Return ONLY a JSON object:
                     blue_flags.append(Flag(type="General Advisory", message="Review all final lease terms, product details, and payment figures carefully before signing.", item="General Advisory"))
 
                 score_value = float(scoring_result.score_int)
-                ai_narrative = self._call_narrative_api(parsed, score_value, red_flags, green_flags, blue_flags, language)
+                trade_data = self._extract_trade_data(parsed)
+                if template:
+                    ai_narrative = {}
+                else:
+                    ai_narrative = self._call_narrative_api(parsed, score_value, red_flags, green_flags, blue_flags, language)
                 narrative_obj = ai_narrative.get("narrative", {}) if isinstance(ai_narrative, dict) else {}
                 if not isinstance(narrative_obj, dict):
                     narrative_obj = {}
@@ -2163,30 +2112,19 @@ Return ONLY a JSON object:
                 if "trust_score_summary" in narrative_obj and "smartbuyer_score_summary" not in narrative_obj:
                     narrative_obj["smartbuyer_score_summary"] = narrative_obj.pop("trust_score_summary")
 
-                narrative_defaults = {
-                    "vehicle_overview": f"Lease analysis for {parsed.get('dealer_name', 'this dealer')}.",
-                    "smartbuyer_score_summary": f"SmartBuyer Score: {score_value}/100.",
-                    "market_comparison": "Market comparison pending.",
-                    "gap_logic": "GAP analysis pending.",
-                    "vsc_logic": "VSC analysis pending.",
-                    "apr_bonus_rule": "APR/rate analysis pending.",
-                    "lease_audit": "Lease terms analysis pending.",
-                    "trade": "No trade-in on this deal.",
-                    "negotiation_insight": "Review all flags before signing.",
-                    "final_recommendation": "Proceed with caution based on the flags above."
-                }
-                for key, default_val in narrative_defaults.items():
-                    if not narrative_obj.get(key):
-                        narrative_obj[key] = default_val
+                # Template text for every section the model left empty (all of them in template mode)
+                template_obj, template_msg = build_narrative(
+                    parsed, score_value, red_flags, green_flags, blue_flags, trade_data.status if trade_data else None, kind="lease"
+                )
+                fill_narrative(narrative_obj, template_obj)
 
                 if "trade" in narrative_obj and not isinstance(narrative_obj["trade"], str):
                     narrative_obj["trade"] = str(narrative_obj["trade"])
 
                 if not buyer_msg:
-                    buyer_msg = f"Your SmartBuyer lease score is {score_value}/100 — review the flags above."
+                    buyer_msg = template_msg
 
                 narrative = Narrative(**narrative_obj)
-                trade_data = self._extract_trade_data(parsed)
 
                 return MultiImageAnalysisResponse(
                     score=score_value,
@@ -2357,15 +2295,16 @@ Return ONLY a JSON object:
                 # ── end JSON path ─────────────────────────────────────────────────
 
             elif base64_images is None:
-                validated_files = await self._validate_files(files)
-                if not validated_files:
+                report_progress(INGESTING)
+                documents = await self._ingest_files(files)
+                if not len(documents):
                     raise ValueError("No valid image files provided")
                 
-                # Optional: Optimize images before base64 encoding
-                # optimized_files = await self._optimize_images(validated_files)
-                # base64_images = await self._convert_files_to_base64(optimized_files)
-                
-                base64_images = await self._convert_files_to_base64(validated_files)
+                selection = await select_pages(documents)
+                skipped_pages = merged_uploads(documents) + selection.skipped_pages()
+                report_progress(EXTRACTING)
+                # Documents, not base64 strings: each page is encoded only while the request body is sent
+                base64_images = list(await vision_pages(selection.bundle))
                 # Deterministic extraction cache (same files -> same parsed extraction)
                 cache_key = self._make_cache_key(base64_images)
                 cached_parsed = self._load_cached_extraction(cache_key)
@@ -2399,50 +2338,22 @@ Return ONLY a JSON object:
                     parsed = self._parse_api_response(extraction_response)
                     self._save_cached_extraction(cache_key, parsed)
 
-            # --- SmartBuyer scoring engine (rules-driven) ---
-            rules = load_rules()
-            upstream_flags = build_active_flags(parsed.get("flags", []), rules.flag_registry, "upstream")
-            computed_flags = compute_flags_from_parsed(parsed, rules, mode="LEASE")
-            all_flags = upstream_flags + computed_flags
-
-            scoring_result = score_flags(
-                all_flags,
-                rules,
-                parsed.get("audit_status", "COMPLETE")
-            )
-
-            def _to_output_flag(active_flag: "ActiveFlag") -> Flag:
-                deduction = None
-                bonus = None
-                if active_flag.points < 0:
-                    deduction = int(round(abs(active_flag.adjusted_points)))
-                elif active_flag.points > 0:
-                    bonus = int(round(abs(active_flag.points)))
-                return Flag(
-                    type=active_flag.flag_id,
-                    message=active_flag.message,
-                    item=active_flag.group,
-                    deduction=deduction,
-                    bonus=bonus
-                )
+            if score_only:
+                return score_only_response(parsed, "LEASE", ScoreResponse, self._assign_badge, skipped_pages, gap_review=False)
 
-            red_flags: List[Flag] = []
-            green_flags: List[Flag] = []
-            blue_flags: List[Flag] = []
-            for active_flag in scoring_result.flags:
-                if active_flag.suppressed or active_flag.group == "SYSTEM":
-                    continue
-                flag_obj = _to_output_flag(active_flag)
-                if active_flag.group == "POSITIVE":
-                    green_flags.append(flag_obj)
-                elif active_flag.group == "DEALER_CONDUCT":
-                    red_flags.append(flag_obj)
-                else:
-                    blue_flags.append(flag_obj)
-
-            red_flags = self._translate_flags(red_flags, language)
-            green_flags = self._translate_flags(green_flags, language)
-            blue_flags = self._translate_flags(blue_flags, language)
+            report_progress(SCORING)
+            # --- SmartBuyer scoring engine (rules-driven) ---
+            scoring_result = score_parsed(parsed, mode="LEASE")
+            groups = output_flags(parsed, scoring_result, gap_review=False)
+            red_flags = [Flag(**flag) for flag in groups["red_flags"]]
+            green_flags = [Flag(**flag) for flag in groups["green_flags"]]
+            blue_flags = [Flag(**flag) for flag in groups["blue_flags"]]
+
+            report_progress(NARRATIVE)
+            if not template:
+                red_flags = self._translate_flags(red_flags, language)
+                green_flags = self._translate_flags(green_flags, language)
+                blue_flags = self._translate_flags(blue_flags, language)
 
             if not red_flags:
                 red_flags.append(Flag(type="General", message="No major compliance issues identified — review all lease terms before signing.", item="General"))
@@ -2452,7 +2363,11 @@ Return ONLY a JSON object:
                 blue_flags.append(Flag(type="General Advisory", message="Review all final lease terms, product details, and payment figures carefully before signing.", item="General Advisory"))
 
             score_value = float(scoring_result.score_int)
-            ai_narrative = self._call_narrative_api(parsed, score_value, red_flags, green_flags, blue_flags, language)
+            trade_data = self._extract_trade_data(parsed)
+            if template:
+                ai_narrative = {}
+            else:
+                ai_narrative = self._call_narrative_api(parsed, score_value, red_flags, green_flags, blue_flags, language)
             narrative_obj = ai_narrative.get("narrative", {}) if isinstance(ai_narrative, dict) else {}
             if not isinstance(narrative_obj, dict):
                 narrative_obj = {}
@@ -2461,30 +2376,19 @@ Return ONLY a JSON object:
             if "trust_score_summary" in narrative_obj and "smartbuyer_score_summary" not in narrative_obj:
                 narrative_obj["smartbuyer_score_summary"] = narrative_obj.pop("trust_score_summary")
 
-            narrative_defaults = {
-                "vehicle_overview": f"Lease analysis for {parsed.get('dealer_name', 'this dealer')}.",
-                "smartbuyer_score_summary": f"SmartBuyer Score: {score_value}/100.",
-                "market_comparison": "Market comparison pending.",
-                "gap_logic": "GAP analysis pending.",
-                "vsc_logic": "VSC analysis pending.",
-                "apr_bonus_rule": "APR/rate analysis pending.",
-                "lease_audit": "Lease terms analysis pending.",
-                "trade": "No trade-in on this deal.",
-                "negotiation_insight": "Review all flags before signing.",
-                "final_recommendation": "Proceed with caution based on the flags above."
-            }
-            for key, default_val in narrative_defaults.items():
-                if not narrative_obj.get(key):
-                    narrative_obj[key] = default_val
+            # Template text for every section the model left empty (all of them in template mode)
+            template_obj, template_msg = build_narrative(
+                parsed, score_value, red_flags, green_flags, blue_flags, trade_data.status if trade_data else None, kind="lease"
+            )
+            fill_narrative(narrative_obj, template_obj)
 
             if "trade" in narrative_obj and not isinstance(narrative_obj["trade"], str):
                 narrative_obj["trade"] = str(narrative_obj["trade"])
 
             if not buyer_msg:
-                buyer_msg = f"Your SmartBuyer lease score is {score_value}/100 — review the flags above."
+                buyer_msg = template_msg
 
             narrative = Narrative(**narrative_obj)
-            trade_data = self._extract_trade_data(parsed)
 
             return MultiImageAnalysisResponse(
                 score=score_value,
@@ -2522,7 +2426,8 @@ Return ONLY a JSON object:
                     ) if trade_data else "No trade identified"
                 ),
                 bundle_abuse=parsed.get("bundle_abuse", {"active": False, "deduction": 0}),
-                narrative=narrative
+                narrative=narrative,
+                skipped_pages=skipped_pages
             )
             
             # Step 0: Normalize flag keys and remove "Unknown" values
@@ -2902,6 +2807,7 @@ Return ONLY a JSON object:
             final_score = round(max(0.0, min(100.0, calculated_score)), 2)
             print(f"Final Score (deterministic): {final_score}")
 
+            report_progress(NARRATIVE)
             # Translate flags to requested language (no scoring changes)
             red_flags = self._translate_flags(red_flags, language)
             green_flags = self._translate_flags(green_flags, language)
@@ -2933,8 +2839,13 @@ Return ONLY a JSON object:
                 return self._get_narrative_messages(base64_images, parsed, final_score, flags_for_narrative, language, detail)
                 
             print(f"Starting Step 2: Narrative Generation with final score {final_score}...")
-            narrative_response = self._run_inference(narrative_factory, max_tokens=2000)
-            parsed_narrative = self._parse_api_response(narrative_response)
+            if has_budget(NARRATIVE_SECONDS):
+                narrative_response = self._run_inference(narrative_factory, max_tokens=2000)
+                parsed_narrative = self._parse_api_response(narrative_response)
+            else:
+                # Empty sections are filled in below; trade falls back to the calculated status
+                print(f"[deadline] {remaining():.0f}s left, skipping narrative generation")
+                parsed_narrative = {}
             
             # Parse narrative - accept either smartbuyer_score_summary or legacy trust_score_summary
             narrative_obj = parsed_narrative.get("narrative", {})
@@ -3020,5 +2931,7 @@ Return ONLY a JSON object:
                 bundle_abuse=parsed.get("bundle_abuse", {"active": False, "deduction": 0}),
                 narrative=narrative
             )
+        except UnreadablePageError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Lease analysis failed: {str(e)}")
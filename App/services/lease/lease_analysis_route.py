@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, File, UploadFile, Form
-from typing import List
+from typing import List, Union
 from .lease_analysis_schema import LeaseAnalysisResponse, LeaseJsonRequest
+from App.services.contract.multi_image_analysis_schema import ScoreResponse
 from .lease_analysis import LeaseAnalyzer
 
 router = APIRouter(prefix="/api", tags=["lease"])
@@ -18,22 +19,24 @@ async def health_check():
     }
 
 
-@router.post("/lease_analyze", response_model=LeaseAnalysisResponse)
+@router.post("/lease_analyze", response_model=Union[LeaseAnalysisResponse, ScoreResponse])
 async def analyze_lease_upload(
     files: List[UploadFile] = File(
         ...,
         description="Upload image files (jpg, png, gif, bmp, webp, pdf, tiff)"
     ),
-    language: str = Form(default="English", description="Language for narrative parts")
+    language: str = Form(default="English", description="Language for narrative parts"),
+    mode: str = Form(default="full", description="full, template for a template narrative without model calls, or score_only for score, badge and flags only")
 ):
     """
     Analyze multiple lease document image files (file upload) and provide comprehensive rating.
 
     - **files**: Multiple image files (jpg, png, gif, bmp, webp, pdf, tiff) — up to 10MB per file
     - **language**: Language for narrative parts (default: English)
+    - **mode**: `score_only` skips narrative and translation (one extraction call); `template` also skips them but returns the full response with a template narrative (English)
     """
     try:
-        result = await analyzer.analyze_lease_images(files, language=language)
+        result = await analyzer.analyze_lease_images(files, language=language, mode=mode)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -47,16 +50,17 @@ async def analyze_lease_upload(
         raise HTTPException(status_code=500, detail=f"Analysis failed: {error_msg}")
 
 
-@router.post("/lease_analyze/json", response_model=LeaseAnalysisResponse)
+@router.post("/lease_analyze/json", response_model=Union[LeaseAnalysisResponse, ScoreResponse])
 async def analyze_lease_json(request: LeaseJsonRequest):
     """
     Analyze lease document via JSON body.
 
     - **data**: Pre-extracted JSON data dict for lease analysis
     - **language**: Language for narrative parts (default: English)
+    - **mode**: `template` (full response, template narrative in English) and `score_only` skip every model call
     """
     try:
-        result = await analyzer.analyze_lease_images(language=request.language, parsed_data=request.data)
+        result = await analyzer.analyze_lease_images(language=request.language, parsed_data=request.data, mode=request.mode)
         return result
     except HTTPException:
         raise
@@ -70,3 +74,17 @@ async def analyze_lease_json(request: LeaseJsonRequest):
                 detail=f"Analysis timeout: The lease analysis is taking longer than expected. Please try again or use fewer images. Error: {error_msg}"
             )
         raise HTTPException(status_code=500, detail=f"Analysis failed: {error_msg}")
+
+
+@router.post("/lease_analyze/score", response_model=ScoreResponse)
+async def score_lease_json(request: LeaseJsonRequest):
+    """
+    Score pre-extracted lease JSON with the rules engine only: score, badge and flags,
+    no model calls. `language` and `mode` are ignored.
+    """
+    try:
+        return await analyzer.analyze_lease_images(parsed_data=request.data, mode="score_only")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Scoring failed: {str(e)}")
@@ -51,6 +51,7 @@ class Narrative(BaseModel):
 class LeaseJsonRequest(BaseModel):
     data: dict = Field(..., description="Pre-extracted JSON data for lease analysis")
     language: str = Field(default="English", description="Language for narrative parts")
+    mode: str = Field(default="full", description="full, template for a template narrative without model calls, or score_only for score, badge and flags only")
 
 class LeaseAnalysisResponse(BaseModel):
     score: float = Field(..., description="Overall score 0-100")
@@ -1,6 +1,6 @@
+from dataclasses import dataclass
 from typing import Optional, List, Dict, Literal
-from pydantic import BaseModel, Field
-from .ocr_normalization_schema import NormalizedLineItem
+from .records import LineItemLike
 from .pricing_caps_loader import load_pricing_caps, get_pricing_cap
 
 # Product classification types
@@ -18,15 +18,16 @@ ProductClassification = Literal[
     "UNKNOWN"
 ]
 
-class AuditClassification(BaseModel):
-    """Classification result for audit purposes"""
+@dataclass(slots=True)
+class AuditClassification:
+    """Classification result for audit purposes (internal record, never serialized directly)"""
     classification: ProductClassification
     label: str
     amount: float
-    is_transparency_issue: bool = Field(False, description="Soft flag for transparency")
-    is_overpriced: bool = Field(False, description="Hard flag for pricing")
-    penalty_points: int = Field(0, description="Penalty points for this item")
-    flag_message: str = Field("", description="User-facing message")
+    is_transparency_issue: bool = False  # Soft flag for transparency
+    is_overpriced: bool = False  # Hard flag for pricing
+    penalty_points: int = 0  # Penalty points for this item
+    flag_message: str = ""  # User-facing message
     matched_keyword: Optional[str] = None
 
 class AuditClassifier:
@@ -76,7 +77,7 @@ class AuditClassifier:
     
     def classify_for_audit(
         self,
-        normalized_item: NormalizedLineItem,
+        normalized_item: LineItemLike,
         vehicle_price: Optional[float] = None
     ) -> AuditClassification:
         """
@@ -121,7 +122,7 @@ class AuditClassifier:
     
     def _classify_finance_certificate(
         self,
-        normalized_item: NormalizedLineItem
+        normalized_item: LineItemLike
     ) -> AuditClassification:
         """
         Classify Finance Certificate as Conditional Finance Incentive.
@@ -160,7 +161,7 @@ class AuditClassifier:
     
     def _classify_bundled_package(
         self,
-        normalized_item: NormalizedLineItem,
+        normalized_item: LineItemLike,
         vehicle_price: Optional[float]
     ) -> AuditClassification:
         """
@@ -219,7 +220,7 @@ class AuditClassifier:
     
     def _classify_backend_product(
         self,
-        normalized_item: NormalizedLineItem
+        normalized_item: LineItemLike
     ) -> AuditClassification:
         """
         Classify backend products (GAP, VSC, Maintenance).
@@ -1,9 +1,10 @@
+from dataclasses import dataclass
 from typing import List, Dict, Optional
-from pydantic import BaseModel
 from .audit_classifier import AuditClassification
 
-class AuditFlag(BaseModel):
-    """Structured audit flag for output"""
+@dataclass(slots=True)
+class AuditFlag:
+    """Structured audit flag; converted to the response Flag model when the analysis result is built"""
     type: str  # "red", "green", "blue"
     category: str  # e.g., "Conditional Finance Incentive", "Overpriced Add-On Package"
     message: str
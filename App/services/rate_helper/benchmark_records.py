@@ -0,0 +1,159 @@
+"""
+Micro-benchmark for the line-item hot path: pydantic models vs tuple records.
+
+Runs the same synthetic deals through the legacy path (keyword table rebuilt
+per deal, one validated NormalizedLineItem per item) and the record path
+(shared keyword table, LineItemRecord per item), then the audit
+classification and audit flags built from the records (slotted
+dataclasses), and reports wall time, peak traced memory, and retained
+bytes per item.
+
+Usage:
+    python -m App.services.rate_helper.benchmark_records [--deals 200] [--items 40]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+from .audit_classifier import AuditClassifier
+from .audit_flags import AuditFlagBuilder
+from .ocr_keyword_dictionary import OCRKeywordDictionary
+from .ocr_normalizer import OCRNormalizer
+from .scoring_engine import compute_flags_from_parsed, load_rules
+
+_SAMPLE_ITEMS = [
+    ("GAP Insurance", "895.00"),
+    ("Vehicle Service Contract", "$2,450"),
+    ("Prepaid Maintenance Plan", "799"),
+    ("Tire & Wheel Protection", "1,095.00"),
+    ("Nitrogen Fill", "199"),
+    ("Doc Fee", "85"),
+    ("Title and Registration", "412.50"),
+    ("Manufacturer Rebate", "-1500"),
+    ("Market Adjustment", "2500"),
+    ("Window Etching", "299"),
+    ("Finance Certificate", "-1000"),
+    ("ProPack Plus Protection Package", "2995"),
+]
+
+
+def _make_deals(deal_count: int, items_per_deal: int) -> List[dict]:
+    deals = []
+    for d in range(deal_count):
+        items = []
+        for i in range(items_per_deal):
+            text, amount = _SAMPLE_ITEMS[(d + i) % len(_SAMPLE_ITEMS)]
+            items.append({"description": f"{text} {i}", "amount": amount})
+        deals.append({
+            "selling_price": 38000 + d,
+            "normalized_pricing": {"msrp": 41000 + d, "doc_fee": 150},
+            "state": "CA",
+            "term": {"months": 72},
+            "line_items": items,
+        })
+    return deals
+
+
+def _legacy_line_items(deal: dict) -> list:
+    # Mirrors the previous implementation: a fresh normalizer (and keyword
+    # table) per deal and a validated pydantic model per line item.
+    normalizer = OCRNormalizer()
+    normalizer.patterns_by_priority = OCRKeywordDictionary.get_patterns_by_priority()
+    return [
+        normalizer.normalize_line_item(item["description"], item["amount"])
+        for item in deal["line_items"]
+    ]
+
+
+_SHARED = OCRNormalizer()
+
+
+def _record_line_items(deal: dict) -> list:
+    normalize = _SHARED.normalize_line_item_record
+    return [normalize(item["description"], item["amount"]) for item in deal["line_items"]]
+
+
+_CLASSIFIER = AuditClassifier()
+
+
+def _audit_flags(deal: dict) -> list:
+    # Classification and audit flags on top of the record path, as the analyzers run them
+    classifications = [
+        _CLASSIFIER.classify_for_audit(record, deal["selling_price"]) for record in _record_line_items(deal)
+    ]
+    flags = []
+    for c in classifications:
+        if c.classification == "CONDITIONAL_FINANCE_INCENTIVE":
+            flags.append(AuditFlagBuilder.build_finance_certificate_flag(c))
+        elif c.classification == "BUNDLED_ADDON_PACKAGE":
+            flags.append(AuditFlagBuilder.build_bundled_package_flag(c))
+    return classifications + flags
+
+
+def _deep_size(obj) -> int:
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__"):
+            stack.append(vars(current))
+        elif hasattr(current, "__slots__"):
+            stack.extend(getattr(current, name) for name in current.__slots__)
+    return total
+
+
+def _measure(label: str, fn: Callable[[dict], list], deals: List[dict]) -> dict:
+    fn(deals[0])  # warm caches outside the measurement
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = [fn(deal) for deal in deals]
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    items = sum(len(r) for r in results) or 1
+    return {
+        "label": label,
+        "seconds": elapsed,
+        "peak_kib": peak / 1024,
+        "bytes_per_item": _deep_size(results[0]) / max(1, len(results[0])),
+        "items": items,
+    }
+
+
+def run(deal_count: int = 200, items_per_deal: int = 40) -> List[dict]:
+    deals = _make_deals(deal_count, items_per_deal)
+    rules = load_rules()
+    return [
+        _measure("line items / pydantic", _legacy_line_items, deals),
+        _measure("line items / records", _record_line_items, deals),
+        _measure("audit classes + flags", _audit_flags, deals),
+        _measure("compute_flags_from_parsed", lambda deal: compute_flags_from_parsed(deal, rules, "CONTRACT"), deals),
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--deals", type=int, default=200)
+    parser.add_argument("--items", type=int, default=40)
+    args = parser.parse_args(argv)
+    for row in run(args.deals, args.items):
+        print(
+            f"{row['label']:<28} {row['seconds'] * 1000:9.1f} ms  "
+            f"peak {row['peak_kib']:9.1f} KiB  {row['bytes_per_item']:7.0f} B/item  ({row['items']} items)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
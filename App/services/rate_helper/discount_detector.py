@@ -2,7 +2,7 @@ import re
 from typing import List, Optional, Tuple
 from .discount_schema import DiscountLineItem, DiscountTotals, DiscountType, SignSource, AnalysisMode
 from .discount_keywords import DiscountKeywords
-from .ocr_normalization_schema import NormalizedLineItem
+from .records import LineItemLike
 
 class DiscountDetector:
     """
@@ -104,7 +104,7 @@ class DiscountDetector:
     
     def detect_discount(
         self,
-        normalized_item: NormalizedLineItem,
+        normalized_item: LineItemLike,
         mode: AnalysisMode = "QUOTE"
     ) -> Optional[DiscountLineItem]:
         """
@@ -155,7 +155,7 @@ class DiscountDetector:
     
     def process_line_items(
         self,
-        normalized_items: List[NormalizedLineItem],
+        normalized_items: List[LineItemLike],
         mode: AnalysisMode = "QUOTE"
     ) -> Tuple[List[DiscountLineItem], DiscountTotals]:
         """
@@ -0,0 +1,496 @@
+"""
+Declarative flag rules (rules/flag_rules.json) compiled into closures.
+
+Each section has an optional guard (``when``), optional derived values
+(``let``) and an ordered list of rules. A rule emits its flag when its
+predicate holds; rules sharing an ``exclusive`` key behave like an
+if/elif chain (first match wins, the rest are skipped).
+
+Expressions are JSON:
+    "$name"                  deal fact or a ``let`` value of the section
+    "@file.path.to.value"    rule constant, resolved once at compile time
+    {"op": [args...]}        all, any, not, present, eq, ne, gt, ge, lt, le,
+                             min, max, add, sub, mul, div, abs, if, lookup
+Comparisons and arithmetic involving a missing (None) operand are false / None.
+
+The compiled program keeps per-rule evaluation counters and timings; see
+FlagRuleProgram.stats().
+"""
+import operator
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .payment_math import PaymentCheck, reconcile_lease, reconcile_loan
+from .scoring_engine import (
+    ActiveFlag,
+    RuleLoadError,
+    RuleSet,
+    _line_item_totals,
+    _make_flag,
+    _require_float,
+    _require_path,
+    _safe_float,
+    _vehicle_condition,
+)
+
+Expr = Callable[["DealFacts"], Any]
+
+
+def _parsed_number(*paths: str) -> Callable[["DealFacts"], Optional[float]]:
+    def extract(facts: "DealFacts") -> Optional[float]:
+        for path in paths:
+            current: Any = facts.parsed
+            for key in path.split("."):
+                current = current.get(key) if isinstance(current, dict) else None
+            if current:
+                return _safe_float(current)
+        return None
+    return extract
+
+
+def _total(name: str) -> Callable[["DealFacts"], Any]:
+    return lambda facts: facts["_line_item_totals"][name]
+
+
+def _payment(check: str, field: str) -> Callable[["DealFacts"], Optional[float]]:
+    def extract(facts: "DealFacts") -> Optional[float]:
+        result: Optional[PaymentCheck] = facts[check]
+        return None if result is None else getattr(result, field)
+    return extract
+
+
+_MSRP_INPUTS = ("normalized_pricing.msrp", "selling_price")
+_LOAN_PAYMENT_INPUTS = ("monthly_payment", "normalized_pricing.amount_financed", "amount_financed", "apr", "term.months")
+_LEASE_PAYMENT_INPUTS = (
+    "monthly_payment", "net_cap_cost", "residual_value", "residual_percent", "normalized_pricing.msrp",
+    "money_factor", "apr", "total_rent_charge", "tax_rate", "term.months",
+)
+_CONDITION_INPUTS = ("vehicle_condition", "condition", "new_used", "vehicle_status")
+
+# fact name -> (extractor, parsed input paths it reads)
+FACTS: Dict[str, Tuple[Callable[["DealFacts"], Any], Tuple[str, ...]]] = {
+    "selling_price": (lambda f: _safe_float(f.parsed.get("selling_price")), ("selling_price",)),
+    "msrp_confirmed": (
+        lambda f: _safe_float((f.parsed.get("normalized_pricing") or {}).get("msrp")) is not None,
+        ("normalized_pricing.msrp",),
+    ),
+    "msrp": (
+        lambda f: _safe_float((f.parsed.get("normalized_pricing") or {}).get("msrp")) if f["msrp_confirmed"] else f["selling_price"],
+        _MSRP_INPUTS,
+    ),
+    "doc_fee": (lambda f: _safe_float((f.parsed.get("normalized_pricing") or {}).get("doc_fee")), ("normalized_pricing.doc_fee",)),
+    "state": (lambda f: str(f.parsed.get("state") or "").upper().strip(), ("state",)),
+    "_line_item_totals": (lambda f: _line_item_totals(f.parsed), ("line_items",)),
+    "gap_total": (_total("gap"), ("line_items",)),
+    "dca_present": (_total("dca_present"), ("line_items",)),
+    "vsc_total": (_total("vsc"), ("line_items",)),
+    "maintenance_total": (_total("maintenance"), ("line_items",)),
+    "tire_wheel_total": (_total("tire_wheel"), ("line_items",)),
+    "addon_total": (_total("addon"), ("line_items",)),
+    "backend_total": (_total("backend"), ("line_items",)),
+    "vehicle_condition": (lambda f: _vehicle_condition(f.parsed), _CONDITION_INPUTS),
+    "mileage": (_parsed_number("mileage", "odometer", "vehicle_mileage"), ("mileage", "odometer", "vehicle_mileage")),
+    "term_months": (lambda f: _safe_float((f.parsed.get("term") or {}).get("months")), ("term.months",)),
+    "negative_equity": (lambda f: _safe_float((f.parsed.get("trade") or {}).get("negative_equity")), ("trade.negative_equity",)),
+    "annual_miles": (lambda f: _safe_float(f.parsed.get("annual_miles")), ("annual_miles",)),
+    "mode": (lambda f: f.mode, ()),
+    "monthly_payment": (lambda f: _safe_float(f.parsed.get("monthly_payment")), ("monthly_payment",)),
+    "_loan_payment": (lambda f: reconcile_loan(f.parsed), _LOAN_PAYMENT_INPUTS),
+    "loan_payment_expected": (_payment("_loan_payment", "expected"), _LOAN_PAYMENT_INPUTS),
+    "loan_payment_delta": (_payment("_loan_payment", "delta"), _LOAN_PAYMENT_INPUTS),
+    "_lease_payment": (lambda f: reconcile_lease(f.parsed), _LEASE_PAYMENT_INPUTS),
+    "lease_payment_expected": (_payment("_lease_payment", "expected"), _LEASE_PAYMENT_INPUTS),
+    "lease_payment_delta": (_payment("_lease_payment", "delta"), _LEASE_PAYMENT_INPUTS),
+}
+
+
+class DealFacts(dict):
+    """Lazily computed deal facts; each extractor runs at most once per deal."""
+    __slots__ = ("parsed", "mode")
+
+    def __init__(self, parsed: dict, mode: str):
+        super().__init__()
+        self.parsed = parsed
+        self.mode = (mode or "").upper()
+
+    def __missing__(self, name: str) -> Any:
+        extractor = FACTS[name][0]
+        value = extractor(self)
+        self[name] = value
+        return value
+
+
+# ─── Expression compiler ───
+
+class _Const:
+    """A compiled expression with a fixed value; lets the compiler fold and specialise."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __call__(self, facts: "DealFacts") -> Any:
+        return self.value
+
+
+_COMPARISONS = {
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "lt": operator.lt,
+    "le": operator.le,
+    "eq": operator.eq,
+    "ne": operator.ne,
+}
+# eq/ne compare None like any other value; ordering comparisons with None are false
+_ORDERING = {"gt", "ge", "lt", "le"}
+
+
+def _compile_comparison(op: str, left: Expr, right: Expr) -> Expr:
+    compare = _COMPARISONS[op]
+    if op not in _ORDERING:
+        return lambda facts: compare(left(facts), right(facts))
+    if isinstance(right, _Const):
+        bound = right.value
+        if bound is None:
+            return _Const(False)
+
+        def compare_to_constant(facts: "DealFacts") -> bool:
+            value = left(facts)
+            return value is not None and compare(value, bound)
+        return compare_to_constant
+
+    def compare_values(facts: "DealFacts") -> bool:
+        a = left(facts)
+        if a is None:
+            return False
+        b = right(facts)
+        return b is not None and compare(a, b)
+    return compare_values
+
+
+def _div(a: float, b: float) -> Optional[float]:
+    return a / b if b else None
+
+
+_ARITHMETIC = {
+    "add": lambda a, b: a + b,
+    "sub": lambda a, b: a - b,
+    "mul": lambda a, b: a * b,
+    "div": _div,
+    "min": min,
+    "max": max,
+}
+
+
+class _Compiler:
+    def __init__(self, rules: RuleSet, where: str, local_names: Iterable[str]):
+        self.rules = rules
+        self.where = where
+        self.local_names = set(local_names)
+        self.facts: Set[str] = set()
+        self.rule_paths: Set[Tuple[str, str]] = set()
+
+    def fail(self, message: str) -> RuleLoadError:
+        return RuleLoadError(f"RULE_LOAD_FAILURE: flag_rules {self.where}: {message}")
+
+    def constant(self, ref: str) -> Any:
+        parts = ref[1:].split(".")
+        source = parts[0]
+        if source == "pricing_caps":
+            data = self.rules.pricing_caps
+        elif source == "doc_fee_caps":
+            data = self.rules.doc_fee_caps
+        else:
+            raise self.fail(f"unknown rule source {ref}")
+        if len(parts) < 2:
+            raise self.fail(f"rule reference {ref} needs a path")
+        self.rule_paths.add((source, parts[1]))
+        return _require_path(data, parts[1:], source)
+
+    def compile(self, expr: Any) -> Expr:
+        if isinstance(expr, str) and expr.startswith("$"):
+            name = expr[1:]
+            if name not in FACTS and name not in self.local_names:
+                raise self.fail(f"unknown fact {expr}")
+            if name in FACTS:
+                self.facts.add(name)
+            return lambda facts: facts[name]
+        if isinstance(expr, str) and expr.startswith("@"):
+            value = self.constant(expr)
+            if isinstance(value, (dict, list)):
+                raise self.fail(f"{expr} is not a scalar; use lookup")
+            return _Const(_require_float(value, f"{expr[1:]}"))
+        if isinstance(expr, (int, float, bool)) or expr is None or isinstance(expr, str):
+            return _Const(expr)
+        if not isinstance(expr, dict) or len(expr) != 1:
+            raise self.fail(f"malformed expression {expr!r}")
+
+        op, args = next(iter(expr.items()))
+        if op in ("present", "not", "abs"):
+            inner = self.compile(args)
+            if op == "present":
+                return lambda facts: inner(facts) is not None
+            if op == "abs":
+                def absolute(facts: DealFacts) -> Optional[float]:
+                    value = inner(facts)
+                    return None if value is None else abs(value)
+                return absolute
+            return lambda facts: not inner(facts)
+        if not isinstance(args, list):
+            raise self.fail(f"{op} expects a list")
+
+        if op == "lookup":
+            if len(args) != 3 or not (isinstance(args[0], str) and args[0].startswith("@")):
+                raise self.fail("lookup expects [@table, key, field]")
+            table = self.constant(args[0])
+            if not isinstance(table, dict):
+                raise self.fail(f"{args[0]} must be an object")
+            field = args[2]
+            resolved = {
+                str(k): _require_float(_require_path(v, (field,), f"{args[0][1:]}.{k}"), f"{args[0][1:]}.{k}.{field}")
+                for k, v in table.items()
+            }
+            key = self.compile(args[1])
+            return lambda facts: resolved.get(key(facts))
+
+        parts = [self.compile(arg) for arg in args]
+        if op in ("all", "any"):
+            if len(parts) == 2:
+                first, second = parts
+                if op == "all":
+                    return lambda facts: bool(first(facts) and second(facts))
+                return lambda facts: bool(first(facts) or second(facts))
+            reduce_ = all if op == "all" else any
+            return lambda facts: reduce_(p(facts) for p in parts)
+        if op == "if":
+            if len(parts) != 3:
+                raise self.fail("if expects [condition, then, else]")
+            cond, then, other = parts
+            return lambda facts: then(facts) if cond(facts) else other(facts)
+        if op in _COMPARISONS:
+            if len(parts) != 2:
+                raise self.fail(f"{op} expects two operands")
+            return _compile_comparison(op, parts[0], parts[1])
+        if op in _ARITHMETIC:
+            if len(parts) < 2:
+                raise self.fail(f"{op} expects at least two operands")
+            combine = _ARITHMETIC[op]
+            if all(isinstance(p, _Const) for p in parts):
+                return _Const(self._fold(combine, [p.value for p in parts]))
+            if len(parts) == 2:
+                left, right = parts
+
+                def binary(facts: DealFacts) -> Optional[float]:
+                    a = left(facts)
+                    if a is None:
+                        return None
+                    b = right(facts)
+                    return None if b is None else combine(a, b)
+                return binary
+
+            fold = self._fold
+            return lambda facts: fold(combine, [p(facts) for p in parts])
+        raise self.fail(f"unknown operator {op}")
+
+    @staticmethod
+    def _fold(combine: Callable[[Any, Any], Any], values: List[Any]) -> Any:
+        if any(v is None for v in values):
+            return None
+        result = values[0]
+        for value in values[1:]:
+            result = combine(result, value)
+            if result is None:
+                return None
+        return result
+
+
+# ─── Compiled program ───
+
+class CompiledRule:
+    __slots__ = ("rule_id", "flag_id", "source", "exclusive", "predicate", "evaluations", "matches", "total_ns")
+
+    def __init__(self, rule_id: str, flag_id: str, source: str, exclusive: Optional[str], predicate: Optional[Expr]):
+        self.rule_id = rule_id
+        self.flag_id = flag_id
+        self.source = source
+        self.exclusive = exclusive
+        self.predicate = predicate
+        self.evaluations = 0
+        self.matches = 0
+        self.total_ns = 0
+
+
+@dataclass
+class CompiledSection:
+    name: str
+    modes: Tuple[str, ...]
+    guard: Optional[Expr]
+    lets: Tuple[Tuple[str, Expr], ...]
+    rules: Tuple[CompiledRule, ...]
+    flag_ids: Tuple[str, ...]
+    inputs: Tuple[str, ...]
+    rule_paths: Tuple[Tuple[str, str], ...]
+    definition: dict
+    # when set, a computed result from this section replaces upstream (LLM) flags for its flag ids
+    supersedes_upstream: bool = False
+
+
+class FlagRuleProgram:
+    def __init__(self, sections: List[CompiledSection], rules: RuleSet):
+        self.sections = sections
+        self.by_name = {s.name: s for s in sections}
+        self.rules = rules
+
+    def evaluate(
+        self,
+        parsed: dict,
+        mode: str,
+        sections: Optional[Iterable[str]] = None,
+    ) -> Dict[str, List[ActiveFlag]]:
+        facts = DealFacts(parsed, mode)
+        wanted = set(sections) if sections is not None else None
+        results: Dict[str, List[ActiveFlag]] = {}
+        rules = self.rules
+        clock = time.perf_counter_ns
+        for section in self.sections:
+            if wanted is not None and section.name not in wanted:
+                continue
+            flags: List[ActiveFlag] = []
+            results[section.name] = flags
+            if section.modes and facts.mode not in section.modes:
+                continue
+            if section.guard is not None and not section.guard(facts):
+                continue
+            for name, expr in section.lets:
+                facts[name] = expr(facts)
+            taken: Set[str] = set()
+            started = clock()
+            for rule in section.rules:
+                if rule.exclusive is not None and rule.exclusive in taken:
+                    continue
+                matched = rule.predicate is None or bool(rule.predicate(facts))
+                if matched:
+                    flag = _make_flag(rule.flag_id, rules, source=rule.source)
+                    if flag:
+                        flags.append(flag)
+                    if rule.exclusive is not None:
+                        taken.add(rule.exclusive)
+                    rule.matches += 1
+                rule.evaluations += 1
+                finished = clock()
+                rule.total_ns += finished - started
+                started = finished
+            for name, _ in section.lets:
+                del facts[name]
+        return results
+
+    def superseded_flag_ids(self, computed: Iterable[ActiveFlag]) -> Set[str]:
+        """Flag ids decided deterministically for this deal; upstream copies of these are dropped."""
+        computed_ids = {flag.flag_id for flag in computed}
+        superseded: Set[str] = set()
+        for section in self.sections:
+            if not section.supersedes_upstream:
+                continue
+            # System rules (e.g. LEASE_PAYMENT_MATH_SKIPPED) say the check could not run; they decide nothing
+            decided = {rule.flag_id for rule in section.rules if rule.source != "system"}
+            if computed_ids.intersection(decided):
+                superseded.update(section.flag_ids)
+        return superseded
+
+    def stats(self) -> List[dict]:
+        rows = []
+        for section in self.sections:
+            for rule in section.rules:
+                rows.append({
+                    "section": section.name,
+                    "rule_id": rule.rule_id,
+                    "flag_id": rule.flag_id,
+                    "evaluations": rule.evaluations,
+                    "matches": rule.matches,
+                    "total_ms": round(rule.total_ns / 1e6, 3),
+                    "mean_us": round(rule.total_ns / rule.evaluations / 1e3, 3) if rule.evaluations else 0.0,
+                })
+        return rows
+
+    def reset_stats(self) -> None:
+        for section in self.sections:
+            for rule in section.rules:
+                rule.evaluations = rule.matches = rule.total_ns = 0
+
+
+def _compile_section(raw: dict, rules: RuleSet) -> CompiledSection:
+    name = str(raw.get("name") or "").strip()
+    if not name:
+        raise RuleLoadError("RULE_LOAD_FAILURE: flag_rules section without a name")
+    raw_lets = raw.get("let") or {}
+    if not isinstance(raw_lets, dict):
+        raise RuleLoadError(f"RULE_LOAD_FAILURE: flag_rules {name}.let must be an object")
+    compiler = _Compiler(rules, name, raw_lets.keys())
+
+    guard = compiler.compile(raw["when"]) if "when" in raw else None
+    lets = tuple((let_name, compiler.compile(expr)) for let_name, expr in raw_lets.items())
+
+    compiled_rules = []
+    for index, raw_rule in enumerate(raw.get("rules") or []):
+        flag_id = str(raw_rule.get("flag", "")).strip().upper()
+        if not flag_id:
+            raise compiler.fail(f"rule #{index} has no flag")
+        compiler.where = f"{name}.{raw_rule.get('id') or index}"
+        predicate = compiler.compile(raw_rule["when"]) if "when" in raw_rule else None
+        compiled_rules.append(CompiledRule(
+            rule_id=str(raw_rule.get("id") or f"{name}_{index}"),
+            flag_id=flag_id,
+            source=str(raw_rule.get("source") or "computed"),
+            exclusive=raw_rule.get("exclusive"),
+            predicate=predicate,
+        ))
+
+    inputs: List[str] = []
+    for fact in sorted(compiler.facts):
+        for path in FACTS[fact][1]:
+            if path not in inputs:
+                inputs.append(path)
+
+    return CompiledSection(
+        name=name,
+        modes=tuple(str(m).upper() for m in raw.get("modes") or ()),
+        guard=guard,
+        lets=lets,
+        rules=tuple(compiled_rules),
+        flag_ids=tuple(dict.fromkeys(r.flag_id for r in compiled_rules)),
+        inputs=tuple(inputs),
+        rule_paths=tuple(sorted(compiler.rule_paths)),
+        definition=raw,
+        supersedes_upstream=bool(raw.get("supersedes_upstream")),
+    )
+
+
+def compile_flag_rules(raw: dict, rules: RuleSet) -> FlagRuleProgram:
+    sections = raw.get("sections")
+    if not isinstance(sections, list):
+        raise RuleLoadError("RULE_LOAD_FAILURE: flag_rules.sections must be a list")
+    return FlagRuleProgram([_compile_section(s, rules) for s in sections], rules)
+
+
+# Programs are cached per rules_hash so counters accumulate across requests.
+_PROGRAMS: Dict[str, FlagRuleProgram] = {}
+_PROGRAMS_LOCK = Lock()
+
+
+def get_program(rules: RuleSet) -> FlagRuleProgram:
+    program = _PROGRAMS.get(rules.rules_hash)
+    if program is not None:
+        return program
+    with _PROGRAMS_LOCK:
+        program = _PROGRAMS.get(rules.rules_hash)
+        if program is None:
+            program = compile_flag_rules(rules.flag_rules, rules)
+            _PROGRAMS[rules.rules_hash] = program
+    return program
+
+
+def flag_rule_stats() -> Dict[str, List[dict]]:
+    """Per-rule counters and timings for every compiled program, keyed by rules_hash."""
+    return {rules_hash: program.stats() for rules_hash, program in _PROGRAMS.items()}
@@ -1,4 +1,4 @@
-from typing import Optional, Dict
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class GAPRecommendation(BaseModel):
@@ -80,4 +80,18 @@ class GAPLogic:
             is_advisory=False,
             reason="Conditions not met for recommendation",
             message=""
-        )
\ No newline at end of file
+        )
+    @staticmethod
+    def review_flag(line_items: List[Any]) -> Optional[Dict[str, str]]:
+        """
+        The "Protection Review" blue flag when no GAP (or debt cancellation)
+        product appears among the line items, else None.
+
+        Shared by the full and score-only analyses so both report the same flag.
+        """
+        for item in line_items or []:
+            if isinstance(item, dict):
+                desc = str(item.get("description") or item.get("item") or "").lower()
+                if "gap" in desc.split() or "guaranteed asset" in desc or "debt cancellation" in desc:
+                    return None
+        return {"type": "Protection Review", "message": "GAP not shown on quote — ask before finalizing", "item": "GAP"}
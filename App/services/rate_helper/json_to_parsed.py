@@ -349,6 +349,7 @@ def convert_extracted_json_to_parsed(data: dict) -> dict:
     parsed["residual_value"] = residual_value
     parsed["residual_percent"] = residual_percent
     parsed["annual_miles"] = annual_miles
+    parsed["tax_rate"] = _safe_float(_pick_first(flat, "tax_rate", "sales_tax_rate", "use_tax_rate"))
 
     # Lender info (for captive lender detection)
     _lender_section = data.get("lender_info") or {}
@@ -0,0 +1,297 @@
+"""
+Template narrative.
+
+Builds every Narrative section and the buyer message from the parsed deal
+figures and the final flags, with no model call (well under 10ms). The
+rating, contract and lease analyzers return it as the whole narrative in
+mode="template"; in mode="full" it fills any section the model left empty,
+or all of them when the narrative call is skipped or fails.
+
+Template text is English; in template mode flags are not translated either.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .gap_logic import GAPLogic
+
+NARRATIVE_KINDS = ("quote", "contract", "lease")
+
+_KIND_LABELS = {"quote": "Deal", "contract": "Contract", "lease": "Lease"}
+
+_GAP_WORDS = ["gap"]
+_VSC_WORDS = ["vsc", "service contract", "warranty", "extended"]
+_DOC_FEE_WORDS = ["doc fee", "documentation", "documentary"]
+# Whole words only: "rate" alone also hits "separately", overage rates and GAP "rate" wording
+_RATE_TERMS = r"apr|annual percentage rate|interest rate|finance rate|subvented rate|money factor"
+_RATE_BONUS = re.compile(rf"\b(?:{_RATE_TERMS})\b")
+_RATE_CONCERN = re.compile(rf"\b(?:{_RATE_TERMS}|rate markup|dealer reserve)\b")
+
+
+def _coerce_float(value) -> Optional[float]:
+    try:
+        if value is None or value == "":
+            return None
+        return float(str(value).replace(",", "").replace("$", "").replace("%", ""))
+    except (ValueError, TypeError):
+        return None
+
+
+def _money(value) -> Optional[str]:
+    num = _coerce_float(value)
+    if num is None:
+        return None
+    return f"${num:,.2f}"
+
+
+def _section(parsed: dict, key: str) -> dict:
+    value = parsed.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def _line_items(parsed: dict) -> List[dict]:
+    items = parsed.get("line_items")
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+def _description(item: dict) -> str:
+    return str(item.get("description") or item.get("item") or item.get("name") or "")
+
+
+def _find_items(items: List[dict], words: List[str]) -> List[dict]:
+    return [item for item in items if any(w in _description(item).lower() for w in words)]
+
+
+def _item_text(item: dict) -> str:
+    amount = _money(item.get("amount"))
+    return f"{_description(item)} ({amount})" if amount else _description(item)
+
+
+def _flag_points(flag: Any, attr: str) -> int:
+    value = getattr(flag, attr, None)
+    return abs(int(value)) if value is not None else 0
+
+
+def _flags_about(flags: List[Any], pattern: "re.Pattern[str]") -> List[Any]:
+    found = []
+    for flag in flags:
+        # Flag ids are SNAKE_CASE (APR_ABOVE_BENCHMARK); split them into words
+        text = f"{getattr(flag, 'type', '')} {getattr(flag, 'item', '')} {getattr(flag, 'message', '')}"
+        if pattern.search(text.replace("_", " ").lower()):
+            found.append(flag)
+    return found
+
+
+def _is_lease(parsed: dict, kind: str) -> bool:
+    return kind == "lease" or "lease" in str(parsed.get("quote_type") or "").lower()
+
+
+def _vehicle_overview(parsed: dict, kind: str, price) -> str:
+    text = f"{_KIND_LABELS[kind]} analysis for {parsed.get('dealer_name') or 'this dealer'}."
+    if parsed.get("vin_number"):
+        text += f" VIN: {parsed['vin_number']}."
+    if price is not None:
+        label = "Capitalized cost" if kind == "lease" else "Selling price"
+        text += f" {label}: {_money(price) or price}."
+    if parsed.get("date"):
+        text += f" Dated {parsed['date']}."
+    return text
+
+
+def _score_summary(score: float, red_flags: List[Any], green_flags: List[Any], blue_flags: List[Any]) -> str:
+    deducted = sum(_flag_points(f, "deduction") for f in red_flags)
+    added = sum(_flag_points(f, "bonus") for f in green_flags)
+    red_count = sum(1 for f in red_flags if getattr(f, "deduction", None) is not None)
+    green_count = sum(1 for f in green_flags if getattr(f, "bonus", None) is not None)
+    advisories = sum(1 for f in blue_flags if getattr(f, "message", None))
+    return (
+        f"SmartBuyer Score: {score:.1f}/100. "
+        f"{red_count} red flag(s) cost {deducted} point(s), {green_count} green flag(s) added {added}, "
+        f"and {advisories} advisory note(s) carry no points."
+    )
+
+
+def _score_breakdown(score: float, red_flags: List[Any], green_flags: List[Any]) -> str:
+    lines = ["Start at 100."]
+    for f in red_flags:
+        if getattr(f, "deduction", None) is not None:
+            lines.append(f"-{_flag_points(f, 'deduction')} {f.item}: {f.message}")
+    for f in green_flags:
+        if getattr(f, "bonus", None) is not None:
+            lines.append(f"+{_flag_points(f, 'bonus')} {f.item}: {f.message}")
+    lines.append(f"Final Score: {score:.1f}")
+    return "\n".join(lines)
+
+
+def _market_comparison(pricing: dict, price) -> str:
+    msrp = _coerce_float(pricing.get("msrp"))
+    price_f = _coerce_float(price)
+    if msrp and price_f:
+        diff_pct = ((price_f - msrp) / msrp) * 100
+        text = f"Price {_money(price_f)} vs MSRP {_money(msrp)} ({diff_pct:+.1f}% vs MSRP)."
+    elif price_f:
+        text = "MSRP not found; market comparison is limited to the listed price."
+    else:
+        text = "Pricing fields not found; market comparison is limited."
+    for key, label in (("discount", "Discount"), ("rebate", "Rebate")):
+        amount = _money(pricing.get(key))
+        if amount and _coerce_float(pricing.get(key)):
+            text += f" {label}: {amount}."
+    return text
+
+
+def _gap_logic(parsed: dict, pricing: dict, items: List[dict], term_months, price, lease: bool) -> str:
+    gap_items = _find_items(items, _GAP_WORDS)
+    if gap_items:
+        return f"GAP coverage appears in the line items: {_item_text(gap_items[0])}. Confirm the price and that it is optional."
+    if lease:
+        return "GAP not listed separately. Most leases include it; confirm the lease contract does before signing."
+    condition = str(parsed.get("condition") or parsed.get("vehicle_condition") or "").lower()
+    recommendation = GAPLogic.evaluate_gap_need(
+        is_used=condition.startswith("used"),
+        term_months=term_months,
+        down_payment=_coerce_float(pricing.get("down_payment")),
+        amount_financed=_coerce_float(pricing.get("amount_financed")),
+        vehicle_price=_coerce_float(price),
+        has_backend_products=bool(_find_items(items, _VSC_WORDS)),
+        gap_present=False,
+    )
+    if recommendation.recommended:
+        return f"GAP not found in the line items. {recommendation.message} ({recommendation.reason})"
+    return "GAP coverage not found in the line items; the deal structure does not call for it."
+
+
+def _vsc_logic(items: List[dict], pricing: dict) -> str:
+    vsc_items = _find_items(items, _VSC_WORDS)
+    if vsc_items:
+        text = "Service contract or warranty in the line items: " + "; ".join(_item_text(i) for i in vsc_items[:3]) + "."
+        text += " These products are optional and negotiable."
+    else:
+        text = "No service contract or extended warranty found in the line items."
+    doc_fee = _money(pricing.get("doc_fee"))
+    if not doc_fee:
+        doc_items = _find_items(items, _DOC_FEE_WORDS)
+        doc_fee = _money(doc_items[0].get("amount")) if doc_items else None
+    if doc_fee:
+        text += f" Doc fee noted at {doc_fee}."
+    return text
+
+
+def _apr_bonus_rule(parsed: dict, apr_data: dict, term_months, red_flags: List[Any], green_flags: List[Any], lease: bool) -> str:
+    parts = []
+    apr_rate = _coerce_float(apr_data.get("rate") or apr_data.get("listed"))
+    money_factor = _coerce_float(apr_data.get("money_factor") or parsed.get("money_factor"))
+    if apr_rate is not None:
+        parts.append(f"APR listed at {apr_rate:g}%.")
+    if lease and money_factor:
+        parts.append(f"Money factor {money_factor:g} (about {money_factor * 2400:.2f}% APR).")
+    if not parts:
+        parts.append("Rate not found in the document; confirm it with the lender before signing.")
+    if term_months:
+        parts.append(f"Term: {term_months} months.")
+    for flag in _flags_about(green_flags, _RATE_BONUS)[:1]:
+        parts.append(f"Rate bonus: {flag.message}")
+    for flag in _flags_about(red_flags, _RATE_CONCERN)[:1]:
+        parts.append(f"Rate concern: {flag.message}")
+    return " ".join(parts)
+
+
+def _lease_audit(parsed: dict, apr_data: dict, term_months, lease: bool) -> str:
+    if not lease:
+        return "N/A - Purchase Agreement"
+    found, missing = [], []
+    figures = (
+        ("cap cost", _money(parsed.get("cap_cost"))),
+        ("residual", _money(parsed.get("residual_value"))),
+        ("money factor", apr_data.get("money_factor") or parsed.get("money_factor")),
+        ("monthly payment", _money(parsed.get("monthly_payment"))),
+    )
+    for label, value in figures:
+        if value in (None, ""):
+            missing.append(label)
+        else:
+            found.append(f"{label} {value}")
+    residual_pct = _coerce_float(parsed.get("residual_percent"))
+    if residual_pct:
+        found.append(f"residual {residual_pct:g}% of MSRP")
+    if term_months:
+        found.append(f"{term_months}-month term")
+    text = "Lease terms: " + (", ".join(found) if found else "none found") + "."
+    if missing:
+        text += " Not found, verify on the lease: " + ", ".join(missing) + "."
+    return text
+
+
+def _negotiation_insight(red_flags: List[Any], items: List[dict]) -> str:
+    costly = sorted(
+        (f for f in red_flags if getattr(f, "deduction", None)),
+        key=lambda f: _flag_points(f, "deduction"),
+        reverse=True,
+    )
+    if costly:
+        return "Start with the costliest issues: " + "; ".join(f"{f.item}: {f.message}" for f in costly[:3])
+    if items:
+        return "Review these line items: " + "; ".join(_item_text(i) for i in items[:5]) + "."
+    return "Review itemized add-ons and fees."
+
+
+def _final_recommendation(score: float, red_flags: List[Any]) -> str:
+    red_count = sum(1 for f in red_flags if getattr(f, "deduction", None))
+    if score >= 90:
+        text = "Strong score. Verify itemized fees and add-ons before signing."
+    elif score >= 80:
+        text = "Good overall. Negotiate flagged items and verify fees."
+    elif score >= 70:
+        text = "Mixed deal. Focus on lowering add-ons and fees."
+    else:
+        text = "High risk. Proceed cautiously and verify all charges."
+    if red_count:
+        text += f" Resolve the {red_count} red flag(s) before signing."
+    return text
+
+
+def build_narrative(
+    parsed: dict,
+    score: float,
+    red_flags: List[Any],
+    green_flags: List[Any],
+    blue_flags: List[Any],
+    trade_status: Optional[str] = None,
+    kind: str = "quote",
+) -> Tuple[Dict[str, str], str]:
+    """Every Narrative section plus the buyer message, from parsed figures and final flags."""
+    if kind not in NARRATIVE_KINDS:
+        raise ValueError(f"Invalid narrative kind: {kind}")
+    pricing = _section(parsed, "normalized_pricing")
+    apr_data = _section(parsed, "apr")
+    term_months = _section(parsed, "term").get("months")
+    items = _line_items(parsed)
+    lease = _is_lease(parsed, kind)
+    if kind == "lease":
+        price = parsed.get("cap_cost") or parsed.get("selling_price") or pricing.get("selling_price")
+    else:
+        price = parsed.get("selling_price") or pricing.get("selling_price")
+
+    narrative = {
+        "vehicle_overview": _vehicle_overview(parsed, kind, price),
+        "smartbuyer_score_summary": _score_summary(score, red_flags, green_flags, blue_flags),
+        "score_breakdown": _score_breakdown(score, red_flags, green_flags),
+        "market_comparison": _market_comparison(pricing, price),
+        "gap_logic": _gap_logic(parsed, pricing, items, term_months, price, lease),
+        "vsc_logic": _vsc_logic(items, pricing),
+        "apr_bonus_rule": _apr_bonus_rule(parsed, apr_data, term_months, red_flags, green_flags, lease),
+        "lease_audit": _lease_audit(parsed, apr_data, term_months, lease),
+        "trade": trade_status or "No trade identified",
+        "negotiation_insight": _negotiation_insight(red_flags, items),
+        "final_recommendation": _final_recommendation(score, red_flags),
+    }
+    subject = "lease score" if kind == "lease" else "score"
+    buyer_message = f"Your SmartBuyer {subject} is {score:.1f}/100 — review the flags above."
+    return narrative, buyer_message
+
+
+def fill_narrative(narrative: dict, template: Dict[str, str]) -> dict:
+    """Template text for every section the model left empty."""
+    for key, value in template.items():
+        if not narrative.get(key):
+            narrative[key] = value
+    return narrative
@@ -1,7 +1,31 @@
 import re
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 from .ocr_normalization_schema import NormalizedLineItem
 from .ocr_keyword_dictionary import OCRKeywordDictionary
+from .records import KeywordRule, LineItemRecord
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_NON_NUMERIC_RE = re.compile(r'[^\d.-]')
+
+
+@lru_cache(maxsize=1)
+def _keyword_rules() -> Tuple[KeywordRule, ...]:
+    """Keyword patterns flattened into a single priority-ordered tuple (built once)."""
+    grouped = OCRKeywordDictionary.get_patterns_by_priority()
+    return tuple(
+        KeywordRule(
+            pattern=p.pattern,
+            match_text=p.pattern.lower(),
+            normalized_category=p.normalized_category,
+            normalized_label=p.normalized_label,
+            default_sign=p.default_sign,
+        )
+        for priority in sorted(grouped.keys())
+        for p in grouped[priority]
+    )
+
 
 class OCRNormalizer:
     """
@@ -15,22 +39,22 @@ class OCRNormalizer:
     """
     
     def __init__(self):
-        self.patterns_by_priority = OCRKeywordDictionary.get_patterns_by_priority()
+        self.keyword_rules = _keyword_rules()
     
     def _clean_text(self, text: str) -> str:
         """Normalize text for matching"""
         # Lowercase
         text = text.lower()
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = _WHITESPACE_RE.sub(' ', text).strip()
         # Remove common punctuation (keep spaces)
-        text = re.sub(r'[^\w\s]', '', text)
+        text = _PUNCTUATION_RE.sub('', text)
         return text
     
     def _extract_amount(self, amount_raw: str) -> float:
         """Extract numeric amount from raw string"""
         # Remove currency symbols, commas, spaces
-        cleaned = re.sub(r'[^\d.-]', '', str(amount_raw))
+        cleaned = _NON_NUMERIC_RE.sub('', str(amount_raw))
         try:
             return float(cleaned)
         except ValueError:
@@ -76,40 +100,34 @@ class OCRNormalizer:
         Returns:
             NormalizedLineItem with classification and normalized amount
         """
+        return self.normalize_line_item_record(raw_text, amount_raw).to_model()
+
+    def normalize_line_item_record(
+        self,
+        raw_text: str,
+        amount_raw: str
+    ) -> LineItemRecord:
+        """Same classification as normalize_line_item, returned as an unvalidated tuple record."""
         cleaned_text = self._clean_text(raw_text)
         amount = self._extract_amount(amount_raw)
         
-        # Match in priority order (1-10)
-        for priority in sorted(self.patterns_by_priority.keys()):
-            patterns = self.patterns_by_priority[priority]
-            
-            for pattern in patterns:
-                # Simple substring match (case-insensitive, cleaned)
-                if pattern.pattern.lower() in cleaned_text:
-                    # Match found - apply normalization
-                    normalized_amount = self._apply_sign_rule(
-                        amount,
-                        pattern.default_sign,
-                        pattern.normalized_category
-                    )
-                    
-                    return NormalizedLineItem(
-                        raw_text=raw_text,
-                        amount_raw=amount_raw,
-                        amount_normalized=normalized_amount,
-                        normalized_category=pattern.normalized_category,
-                        normalized_label=pattern.normalized_label,
-                        matched_keyword=pattern.pattern,
-                        confidence_score=1.0  # Direct keyword match = high confidence
-                    )
+        # Match in priority order (1-10); first match wins
+        for rule in self.keyword_rules:
+            if rule.match_text in cleaned_text:
+                normalized_amount = self._apply_sign_rule(
+                    amount,
+                    rule.default_sign,
+                    rule.normalized_category
+                )
+                return LineItemRecord(
+                    raw_text,
+                    amount_raw,
+                    normalized_amount,
+                    rule.normalized_category,
+                    rule.normalized_label,
+                    rule.pattern,
+                    1.0  # Direct keyword match = high confidence
+                )
         
-        # No match found - mark as AMBIGUOUS
-        return NormalizedLineItem(
-            raw_text=raw_text,
-            amount_raw=amount_raw,
-            amount_normalized=amount,  # Preserve original sign
-            normalized_category="AMBIGUOUS",
-            normalized_label="Unknown Item",
-            matched_keyword=None,
-            confidence_score=0.0  # No match = low confidence
-        )
\ No newline at end of file
+        # No match found - mark as AMBIGUOUS, preserve original sign
+        return LineItemRecord(raw_text, amount_raw, amount, "AMBIGUOUS", "Unknown Item", None, 0.0)
@@ -0,0 +1,170 @@
+"""
+Closed-form loan and lease payment math used to reconcile stated payments.
+
+Loan:   payment = P * r / (1 - (1 + r) ** -n),  r = APR / 1200  (P / n at 0% APR)
+Lease:  depreciation = (net cap cost - residual) / n
+        rent charge  = (net cap cost + residual) * money factor
+        payment      = (depreciation + rent charge) * (1 + monthly tax rate)
+Money factor <-> APR:  MF = APR / 2400
+
+Reconciliation returns None when a required input is missing, so callers can
+tell "math skipped" apart from "math disagrees".
+"""
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .scoring_engine import _safe_float
+
+MONEY_FACTOR_APR_RATIO = 2400.0
+
+
+def apr_to_money_factor(apr: float) -> float:
+    return apr / MONEY_FACTOR_APR_RATIO
+
+
+def money_factor_to_apr(money_factor: float) -> float:
+    return money_factor * MONEY_FACTOR_APR_RATIO
+
+
+def amortized_payment(principal: float, apr: float, months: float) -> Optional[float]:
+    """Level monthly payment for a simple-interest installment loan; APR in percent."""
+    if principal <= 0 or months <= 0 or apr < 0:
+        return None
+    rate = apr / 1200.0
+    if rate == 0:
+        return principal / months
+    return principal * rate / (1.0 - (1.0 + rate) ** -months)
+
+
+@dataclass(frozen=True)
+class LeasePayment:
+    depreciation: float
+    rent_charge: float
+    base_payment: float
+    tax: float
+
+    @property
+    def total_payment(self) -> float:
+        return self.base_payment + self.tax
+
+
+def lease_payment(
+    net_cap_cost: float,
+    residual: float,
+    money_factor: float,
+    months: float,
+    tax_rate: float = 0.0,
+) -> Optional[LeasePayment]:
+    """Monthly lease payment split into depreciation, rent charge and tax."""
+    if net_cap_cost <= 0 or residual < 0 or months <= 0 or money_factor < 0:
+        return None
+    depreciation = (net_cap_cost - residual) / months
+    rent_charge = (net_cap_cost + residual) * money_factor
+    base = depreciation + rent_charge
+    return LeasePayment(depreciation, rent_charge, base, base * tax_rate)
+
+
+def derive_money_factor(total_rent_charge: float, net_cap_cost: float, residual: float, months: float) -> Optional[float]:
+    denominator = (net_cap_cost + residual) * months
+    if total_rent_charge < 0 or denominator <= 0:
+        return None
+    return total_rent_charge / denominator
+
+
+# ─── Reconciliation against parsed deals ───
+
+@dataclass(frozen=True)
+class PaymentCheck:
+    expected: float
+    actual: float
+    tax_included: bool = False
+
+    @property
+    def delta(self) -> float:
+        """Stated minus expected; positive means the deal charges more than the math."""
+        return self.actual - self.expected
+
+
+def _positive(value: Any) -> Optional[float]:
+    number = _safe_float(value)
+    return number if number is not None and number > 0 else None
+
+
+def _fraction(value: Any) -> Optional[float]:
+    # Rates and residual percents show up both as 0.0825 and 8.25
+    number = _safe_float(value)
+    if number is None or number < 0:
+        return None
+    return number / 100.0 if number >= 1 else number
+
+
+def _stated_apr(parsed: dict) -> Optional[float]:
+    apr = parsed.get("apr")
+    if isinstance(apr, dict):
+        if apr.get("estimated"):
+            return None
+        return _safe_float(apr.get("rate"))
+    return _safe_float(apr)
+
+
+def reconcile_loan(parsed: dict) -> Optional[PaymentCheck]:
+    """Expected vs stated payment for a retail installment deal."""
+    actual = _positive(parsed.get("monthly_payment"))
+    principal = _positive((parsed.get("normalized_pricing") or {}).get("amount_financed") or parsed.get("amount_financed"))
+    months = _positive((parsed.get("term") or {}).get("months"))
+    apr = _stated_apr(parsed)
+    if actual is None or principal is None or months is None or apr is None:
+        return None
+    expected = amortized_payment(principal, apr, months)
+    if expected is None:
+        return None
+    return PaymentCheck(expected=expected, actual=actual)
+
+
+def _lease_money_factor(parsed: dict, net_cap_cost: float, residual: float, months: float) -> Optional[float]:
+    apr = parsed.get("apr") if isinstance(parsed.get("apr"), dict) else {}
+    money_factor = _safe_float(parsed.get("money_factor"))
+    if money_factor is None:
+        money_factor = _safe_float(apr.get("money_factor"))
+    if money_factor is not None:
+        return money_factor
+    stated_apr = _stated_apr(parsed)
+    if stated_apr is not None:
+        return apr_to_money_factor(stated_apr)
+    rent_charge = _safe_float(parsed.get("total_rent_charge"))
+    if rent_charge is not None:
+        return derive_money_factor(rent_charge, net_cap_cost, residual, months)
+    return None
+
+
+def reconcile_lease(parsed: dict) -> Optional[PaymentCheck]:
+    """
+    Expected vs stated payment for a closed-end lease.
+
+    Lease payments are quoted both before and after monthly use tax, so when a
+    tax rate is known the stated payment is compared against whichever of the
+    two it is closer to.
+    """
+    actual = _positive(parsed.get("monthly_payment"))
+    net_cap_cost = _positive(parsed.get("net_cap_cost"))
+    months = _positive((parsed.get("term") or {}).get("months"))
+    if actual is None or net_cap_cost is None or months is None:
+        return None
+
+    residual = _positive(parsed.get("residual_value"))
+    if residual is None:
+        percent = _fraction(parsed.get("residual_percent"))
+        msrp = _positive((parsed.get("normalized_pricing") or {}).get("msrp"))
+        if percent is None or msrp is None:
+            return None
+        residual = msrp * percent
+
+    money_factor = _lease_money_factor(parsed, net_cap_cost, residual, months)
+    if money_factor is None:
+        return None
+    payment = lease_payment(net_cap_cost, residual, money_factor, months, _fraction(parsed.get("tax_rate")) or 0.0)
+    if payment is None:
+        return None
+    if payment.tax and abs(actual - payment.total_payment) < abs(actual - payment.base_payment):
+        return PaymentCheck(expected=payment.total_payment, actual=actual, tax_included=True)
+    return PaymentCheck(expected=payment.base_payment, actual=actual)
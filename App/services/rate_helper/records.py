@@ -0,0 +1,36 @@
+from typing import NamedTuple, Optional, Union
+
+from .ocr_normalization_schema import NormalizedLineItem
+
+
+class LineItemRecord(NamedTuple):
+    """
+    Internal line-item record used on the deterministic scoring path.
+
+    Field-for-field compatible with NormalizedLineItem, but a plain tuple:
+    no validation and no per-instance dict. Convert with to_model() only when
+    the item has to leave the service (API response, audit payloads).
+    """
+    raw_text: str
+    amount_raw: str
+    amount_normalized: float
+    normalized_category: str
+    normalized_label: str
+    matched_keyword: Optional[str]
+    confidence_score: float
+
+    def to_model(self) -> NormalizedLineItem:
+        return NormalizedLineItem(**self._asdict())
+
+
+class KeywordRule(NamedTuple):
+    """Flattened KeywordPattern, pre-lowered for substring matching."""
+    pattern: str
+    match_text: str
+    normalized_category: str
+    normalized_label: str
+    default_sign: str
+
+
+# Consumers that only read attributes accept either representation.
+LineItemLike = Union[LineItemRecord, NormalizedLineItem]
@@ -0,0 +1,470 @@
+"""
+Rules-change impact report.
+
+Compares two RuleSets, works out which flag sections and suppression rules a
+rules change can reach, and rescores stored parsed deals incrementally: deals
+whose inputs never touch a changed section are skipped outright, and for the
+rest only the changed sections are recomputed under the new rules.
+
+Usage:
+    python -m App.services.rate_helper.rules_impact OLD_RULES_DIR NEW_RULES_DIR DEALS_PATH [--mode CONTRACT] [--json]
+
+DEALS_PATH is a directory of parsed deal JSON files (e.g. App/core/.contract_cache)
+or a JSONL file with one deal per line.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .json_to_parsed import convert_extracted_json_to_parsed
+from .flag_rules import CompiledSection
+from .scoring_engine import (
+    ActiveFlag,
+    FlagDefinition,
+    InvalidAuditStatusError,
+    RuleSet,
+    build_active_flags,
+    compute_flags_by_section,
+    load_rules,
+    merge_flags,
+    score_flags,
+)
+
+
+@dataclass
+class RulesDiff:
+    old_hash: str
+    new_hash: str
+    changed_flag_ids: Set[str] = field(default_factory=set)
+    changed_rule_paths: Set[Tuple[str, str]] = field(default_factory=set)
+    changed_doc_fee_states: Set[str] = field(default_factory=set)
+    suppression_flag_ids: Set[str] = field(default_factory=set)
+    changed_sections: Set[str] = field(default_factory=set)
+    # Sections of the new program, plus any the new rules dropped
+    sections: List[CompiledSection] = field(default_factory=list)
+
+    @property
+    def identical(self) -> bool:
+        return self.old_hash == self.new_hash
+
+    @property
+    def suppression_changed(self) -> bool:
+        return bool(self.suppression_flag_ids)
+
+    def dirty_sections(self) -> List[CompiledSection]:
+        """Sections whose output can differ under the new rules."""
+        dirty = []
+        for section in self.sections:
+            if section.name in self.changed_sections:
+                dirty.append(section)
+            elif self.changed_rule_paths.intersection(section.rule_paths):
+                dirty.append(section)
+            elif self.changed_flag_ids.intersection(section.flag_ids):
+                dirty.append(section)
+        return dirty
+
+    def unmapped_rule_paths(self) -> List[str]:
+        """Changed rule sections that no scoring-engine section reads."""
+        mapped = {path for section in self.sections for path in section.rule_paths}
+        return sorted(".".join(path) for path in self.changed_rule_paths - mapped)
+
+
+@dataclass
+class DealImpact:
+    deal_id: str
+    old_score: int
+    new_score: int
+    delta: int
+    added_flags: List[str]
+    removed_flags: List[str]
+    # flags suppressed only under the new rules -> suppressing rule
+    newly_suppressed: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class ImpactReport:
+    diff: RulesDiff
+    total_deals: int
+    screened_out: int
+    rescored: int
+    histogram: Dict[int, int]
+    changed: List[DealImpact]
+    errors: Dict[str, str]
+    elapsed_seconds: float
+
+    def to_dict(self) -> dict:
+        return {
+            "old_rules_hash": self.diff.old_hash,
+            "new_rules_hash": self.diff.new_hash,
+            "changed_flag_ids": sorted(self.diff.changed_flag_ids),
+            "changed_rule_paths": sorted(".".join(p) for p in self.diff.changed_rule_paths),
+            "changed_doc_fee_states": sorted(self.diff.changed_doc_fee_states),
+            "suppression_flag_ids": sorted(self.diff.suppression_flag_ids),
+            "changed_sections": sorted(self.diff.changed_sections),
+            "dirty_sections": [s.name for s in self.diff.dirty_sections()],
+            "unmapped_rule_paths": self.diff.unmapped_rule_paths(),
+            "total_deals": self.total_deals,
+            "screened_out": self.screened_out,
+            "rescored": self.rescored,
+            "histogram": {str(k): v for k, v in sorted(self.histogram.items())},
+            "changed": [vars(d) for d in self.changed],
+            "errors": self.errors,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+def _definition_key(definition: Optional[FlagDefinition]) -> Optional[tuple]:
+    if definition is None:
+        return None
+    return (
+        definition.group,
+        definition.points,
+        definition.severity,
+        tuple(definition.modes),
+        definition.description,
+        definition.scoring_eligible,
+    )
+
+
+def diff_rulesets(old: RuleSet, new: RuleSet) -> RulesDiff:
+    old_sections = {s.name: s for s in old.flag_program.sections}
+    new_sections = {s.name: s for s in new.flag_program.sections}
+    diff = RulesDiff(
+        old_hash=old.rules_hash,
+        new_hash=new.rules_hash,
+        sections=list(new_sections.values()) + [s for name, s in old_sections.items() if name not in new_sections],
+    )
+    if diff.identical:
+        return diff
+
+    for name in set(old_sections) | set(new_sections):
+        before = old_sections.get(name)
+        after = new_sections.get(name)
+        if before is None or after is None or before.definition != after.definition:
+            diff.changed_sections.add(name)
+
+    for flag_id in set(old.flag_registry) | set(new.flag_registry):
+        if _definition_key(old.flag_registry.get(flag_id)) != _definition_key(new.flag_registry.get(flag_id)):
+            diff.changed_flag_ids.add(flag_id)
+
+    for key in set(old.pricing_caps) | set(new.pricing_caps):
+        if old.pricing_caps.get(key) != new.pricing_caps.get(key):
+            diff.changed_rule_paths.add(("pricing_caps", key))
+
+    for key in set(old.doc_fee_caps) | set(new.doc_fee_caps):
+        if key == "states":
+            continue
+        if old.doc_fee_caps.get(key) != new.doc_fee_caps.get(key):
+            diff.changed_rule_paths.add(("doc_fee_caps", key))
+    old_states = old.doc_fee_caps.get("states") or {}
+    new_states = new.doc_fee_caps.get("states") or {}
+    for state in set(old_states) | set(new_states):
+        if old_states.get(state) != new_states.get(state):
+            diff.changed_doc_fee_states.add(str(state).upper())
+    if diff.changed_doc_fee_states:
+        diff.changed_rule_paths.add(("doc_fee_caps", "states"))
+
+    old_graph = old.suppression_graph
+    new_graph = new.suppression_graph
+    for trigger in set(old_graph.edges) | set(new_graph.edges):
+        before = old_graph.edges.get(trigger)
+        after = new_graph.edges.get(trigger)
+        if (before and before.targets) != (after and after.targets):
+            diff.suppression_flag_ids.add(trigger)
+            for edge in (before, after):
+                if edge:
+                    diff.suppression_flag_ids.update(edge.targets)
+    if (old_graph.backend_flag, old_graph.backend_compare) != (new_graph.backend_flag, new_graph.backend_compare):
+        for graph in (old_graph, new_graph):
+            diff.suppression_flag_ids.add(graph.backend_flag)
+            diff.suppression_flag_ids.update(graph.backend_compare)
+    diff.suppression_flag_ids.discard("")
+
+    return diff
+
+
+def _lookup(parsed: dict, dotted: str) -> Any:
+    current: Any = parsed
+    for key in dotted.split("."):
+        if not isinstance(current, dict):
+            return None
+        current = current.get(key)
+    return current
+
+
+def _has_input(parsed: dict, section: CompiledSection) -> bool:
+    # A section that reads no deal inputs can fire on any deal
+    if not section.inputs:
+        return True
+    for path in section.inputs:
+        value = _lookup(parsed, path)
+        if value not in (None, "", [], {}):
+            return True
+    return False
+
+
+def _section_affects_deal(parsed: dict, section: CompiledSection, diff: RulesDiff, mode: str) -> bool:
+    if section.modes and mode not in section.modes:
+        return False
+    if not _has_input(parsed, section):
+        return False
+    # A doc fee change limited to individual states only reaches deals in those states.
+    if section.name == "doc_fee":
+        only_states = (
+            section.name not in diff.changed_sections
+            and not diff.changed_flag_ids.intersection(section.flag_ids)
+            and diff.changed_rule_paths.intersection(section.rule_paths) == {("doc_fee_caps", "states")}
+        )
+        if only_states:
+            state = str(parsed.get("state") or "").upper().strip()
+            return state in diff.changed_doc_fee_states
+    return True
+
+
+def _upstream_flag_ids(parsed: dict) -> Set[str]:
+    ids: Set[str] = set()
+    for raw in parsed.get("flags") or []:
+        if isinstance(raw, dict):
+            for key in ("flag_id", "id", "flag", "name"):
+                if raw.get(key):
+                    ids.add(str(raw[key]).strip().upper())
+                    break
+    return ids
+
+
+def deal_needs_rescore(parsed: dict, diff: RulesDiff, mode: str) -> Tuple[bool, List[str]]:
+    """Cheap input-only screen. Returns (needs_rescore, dirty_section_names)."""
+    if diff.identical:
+        return False, []
+    mode = (mode or "").upper()
+    dirty = [s.name for s in diff.dirty_sections() if _section_affects_deal(parsed, s, diff, mode)]
+    if dirty:
+        return True, dirty
+    upstream = _upstream_flag_ids(parsed)
+    if upstream & (diff.changed_flag_ids | diff.suppression_flag_ids):
+        return True, []
+    if diff.suppression_changed:
+        for section in diff.sections:
+            if diff.suppression_flag_ids.intersection(section.flag_ids) and _section_affects_deal(parsed, section, diff, mode):
+                return True, []
+    return False, []
+
+
+def _score(flags: List[ActiveFlag], rules: RuleSet, audit_status: str) -> Tuple[int, Set[str], Dict[str, str]]:
+    result = score_flags(flags, rules, audit_status)
+    visible = {f.flag_id for f in result.flags if not f.suppressed}
+    suppressed_by = {f.flag_id: f.suppressed_by for f in result.flags if f.suppressed and f.suppressed_by}
+    return result.score_int, visible, suppressed_by
+
+
+def _merged(parsed: dict, rules: RuleSet, by_section: Dict[str, List[ActiveFlag]]) -> List[ActiveFlag]:
+    upstream = build_active_flags(parsed.get("flags", []), rules.flag_registry, "upstream")
+    computed = [flag for section in rules.flag_program.sections for flag in by_section.get(section.name, [])]
+    return merge_flags(upstream, computed, rules)
+
+
+def rescore_deal(
+    deal_id: str,
+    parsed: dict,
+    old: RuleSet,
+    new: RuleSet,
+    dirty_sections: List[str],
+    mode: str,
+) -> DealImpact:
+    """Score a deal under both rule sets, recomputing only ``dirty_sections`` for the new one."""
+    audit_status = parsed.get("audit_status", "COMPLETE")
+    old_by_section = compute_flags_by_section(parsed, old, mode)
+    new_by_section = {
+        name: [replace(flag) for flag in flags]
+        for name, flags in old_by_section.items()
+        if name not in dirty_sections
+    }
+    if dirty_sections:
+        new_by_section.update(compute_flags_by_section(parsed, new, mode, sections=dirty_sections))
+
+    # Same merge as score_parsed(), so a rescored deal scores as it would live
+    old_flags = _merged(parsed, old, old_by_section)
+    new_flags = _merged(parsed, new, new_by_section)
+
+    old_score, old_visible, old_suppressed = _score(old_flags, old, audit_status)
+    new_score, new_visible, new_suppressed = _score(new_flags, new, audit_status)
+    return DealImpact(
+        deal_id=deal_id,
+        old_score=old_score,
+        new_score=new_score,
+        delta=new_score - old_score,
+        added_flags=sorted(new_visible - old_visible),
+        removed_flags=sorted(old_visible - new_visible),
+        newly_suppressed={fid: by for fid, by in sorted(new_suppressed.items()) if fid not in old_suppressed},
+    )
+
+
+def _as_parsed(record: Any) -> Optional[dict]:
+    if not isinstance(record, dict):
+        return None
+    if "normalized_pricing" in record:
+        return record
+    return convert_extracted_json_to_parsed(record)
+
+
+def iter_stored_deals(path: str) -> Iterator[Tuple[str, dict]]:
+    """Yield (deal_id, parsed) from a cache directory, a JSONL file or a JSON file."""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            # flags_*.json are translation caches, not deals
+            if not name.endswith(".json") or name.startswith("flags_"):
+                continue
+            try:
+                with open(os.path.join(path, name), "r", encoding="utf-8") as f:
+                    parsed = _as_parsed(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                continue
+            if parsed is not None:
+                yield name[:-len(".json")], parsed
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                parsed = _as_parsed(record)
+                if parsed is not None:
+                    yield str(record.get("deal_id") or record.get("id") or line_no), parsed
+        else:
+            data = json.load(f)
+            records = data if isinstance(data, list) else [data]
+            for index, record in enumerate(records, 1):
+                parsed = _as_parsed(record)
+                if parsed is not None:
+                    yield str(record.get("deal_id") or record.get("id") or index), parsed
+
+
+def build_impact_report(
+    old: RuleSet,
+    new: RuleSet,
+    deals: Iterable[Tuple[str, dict]],
+    mode: str = "CONTRACT",
+) -> ImpactReport:
+    started = time.perf_counter()
+    mode = (mode or "").upper()
+    diff = diff_rulesets(old, new)
+    histogram: Counter = Counter()
+    changed: List[DealImpact] = []
+    errors: Dict[str, str] = {}
+    total = screened_out = rescored = 0
+
+    for deal_id, parsed in deals:
+        total += 1
+        needs_rescore, dirty = deal_needs_rescore(parsed, diff, mode)
+        if not needs_rescore:
+            screened_out += 1
+            histogram[0] += 1
+            continue
+        try:
+            impact = rescore_deal(deal_id, parsed, old, new, dirty, mode)
+        except (InvalidAuditStatusError, RuntimeError) as exc:
+            errors[deal_id] = str(exc)
+            continue
+        rescored += 1
+        histogram[impact.delta] += 1
+        if impact.delta or impact.added_flags or impact.removed_flags or impact.newly_suppressed:
+            changed.append(impact)
+
+    changed.sort(key=lambda d: (-abs(d.delta), d.deal_id))
+    return ImpactReport(
+        diff=diff,
+        total_deals=total,
+        screened_out=screened_out,
+        rescored=rescored,
+        histogram=dict(histogram),
+        changed=changed,
+        errors=errors,
+        elapsed_seconds=time.perf_counter() - started,
+    )
+
+
+def format_impact_report(report: ImpactReport) -> str:
+    diff = report.diff
+    lines = [
+        f"Rules {diff.old_hash[:12]} -> {diff.new_hash[:12]}",
+    ]
+    if diff.identical:
+        lines.append("Rule sets are identical; no deal can change.")
+        return "\n".join(lines)
+    lines.append(f"Changed flags: {', '.join(sorted(diff.changed_flag_ids)) or '-'}")
+    lines.append(f"Changed rule paths: {', '.join(sorted('.'.join(p) for p in diff.changed_rule_paths)) or '-'}")
+    if diff.changed_sections:
+        lines.append(f"Changed flag rule sections: {', '.join(sorted(diff.changed_sections))}")
+    if diff.changed_doc_fee_states:
+        lines.append(f"Changed doc fee states: {', '.join(sorted(diff.changed_doc_fee_states))}")
+    if diff.suppression_changed:
+        lines.append(f"Suppression rules touching: {', '.join(sorted(diff.suppression_flag_ids))}")
+    unmapped = diff.unmapped_rule_paths()
+    if unmapped:
+        lines.append(f"Not read by the scoring engine: {', '.join(unmapped)}")
+    lines.append(f"Dirty sections: {', '.join(s.name for s in diff.dirty_sections()) or '-'}")
+    lines.append(
+        f"Deals: {report.total_deals} total, {report.screened_out} screened out, "
+        f"{report.rescored} rescored, {len(report.changed)} changed, "
+        f"{len(report.errors)} errors ({report.elapsed_seconds:.2f}s)"
+    )
+
+    lines.append("")
+    lines.append("Score delta histogram:")
+    peak = max(report.histogram.values()) if report.histogram else 0
+    for delta, count in sorted(report.histogram.items()):
+        bar = "#" * max(1, round(40 * count / peak)) if peak else ""
+        lines.append(f"  {delta:+4d} | {count:6d} {bar}")
+
+    if report.changed:
+        lines.append("")
+        lines.append("Changed deals:")
+        for impact in report.changed:
+            detail = []
+            if impact.added_flags:
+                detail.append("+" + ",".join(impact.added_flags))
+            if impact.removed_flags:
+                detail.append("-" + ",".join(impact.removed_flags))
+            for fid, by in impact.newly_suppressed.items():
+                detail.append(f"{fid} suppressed by {by}")
+            lines.append(
+                f"  {impact.deal_id}: {impact.old_score} -> {impact.new_score} "
+                f"({impact.delta:+d}) {' '.join(detail)}".rstrip()
+            )
+    for deal_id, error in sorted(report.errors.items()):
+        lines.append(f"  {deal_id}: ERROR {error}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report which stored deals a rules change would rescore.")
+    parser.add_argument("old_rules_dir")
+    parser.add_argument("new_rules_dir")
+    parser.add_argument("deals_path", help="Directory of parsed deal JSON files, or a .jsonl/.json file")
+    parser.add_argument("--mode", default="CONTRACT", choices=["QUOTE", "CONTRACT", "LEASE"])
+    parser.add_argument("--json", action="store_true", help="Emit the report as JSON")
+    args = parser.parse_args(argv)
+
+    old = load_rules(args.old_rules_dir)
+    new = load_rules(args.new_rules_dir)
+    report = build_impact_report(old, new, iter_stored_deals(args.deals_path), mode=args.mode)
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print(format_impact_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Rules-engine output shared by the rating, contract and lease analyzers.
+
+output_flags() is the red / green / blue flag lists every analyzer returns
+for a ScoringResult; score_only_response() is the whole mode="score_only"
+response. Both analysis paths go through them, so a score-only call and a
+full analysis of the same deal report the same flags.
+"""
+from typing import Callable, Dict, List, Type, TypeVar
+
+from .gap_logic import GAPLogic
+from .scoring_engine import ScoringResult, flag_groups, score_parsed
+
+Response = TypeVar("Response")
+
+
+def output_flags(parsed: dict, result: ScoringResult, gap_review: bool = True) -> Dict[str, List[dict]]:
+    """flag_groups(result), plus the GAP review blue flag when gap_review is set and no GAP product is listed."""
+    groups = flag_groups(result)
+    if gap_review:
+        gap_flag = GAPLogic.review_flag(parsed.get("line_items", []))
+        if gap_flag:
+            groups["blue_flags"].append(gap_flag)
+    return groups
+
+
+def score_only_response(
+    parsed: dict,
+    mode: str,
+    response_cls: Type[Response],
+    badge: Callable[[float], str],
+    skipped_pages: List[dict],
+    gap_review: bool = True,
+) -> Response:
+    """Score, badge and flags from the rules engine alone: no narrative, no translation, no model calls."""
+    result = score_parsed(parsed, mode=mode)
+    score_value = float(result.score_int)
+    return response_cls(
+        score=score_value,
+        badge=badge(score_value),
+        dealer_name=parsed.get("dealer_name"),
+        vin_number=parsed.get("vin_number"),
+        selling_price=parsed.get("selling_price"),
+        **output_flags(parsed, result, gap_review),
+        skipped_pages=skipped_pages,
+        rules_hash=result.rules_hash,
+        audit_status=result.audit_status,
+    )
@@ -1,10 +1,12 @@
 import json
 import hashlib
+import heapq
 import os
 from dataclasses import dataclass
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from .ocr_normalizer import OCRNormalizer
+from .records import LineItemRecord
 
 RULES_DIR = os.path.join(os.path.dirname(__file__), "rules")
 BASE_SCORE = 100.0
@@ -30,7 +32,7 @@ class InvalidAuditStatusError(ValueError):
     """Raised when an audit status is outside the locked enum."""
 
 
-@dataclass
+@dataclass(slots=True)
 class FlagDefinition:
     flag_id: str
     group: str
@@ -41,7 +43,7 @@ class FlagDefinition:
     scoring_eligible: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class ActiveFlag:
     flag_id: str
     group: str
@@ -55,6 +57,7 @@ class ActiveFlag:
     message: str
     adjusted_points: float
     suppressed: bool = False
+    suppressed_by: Optional[str] = None
 
 
 @dataclass
@@ -71,12 +74,26 @@ class ScoringResult:
 
 
 class RuleSet:
-    def __init__(self, flag_registry: Dict[str, FlagDefinition], suppression: dict, pricing_caps: dict, doc_fee_caps: dict, rules_hash: str):
+    def __init__(self, flag_registry: Dict[str, FlagDefinition], suppression: dict, pricing_caps: dict, doc_fee_caps: dict, rules_hash: str, flag_rules: Optional[dict] = None):
         self.flag_registry = flag_registry
         self.suppression = suppression
         self.pricing_caps = pricing_caps
         self.doc_fee_caps = doc_fee_caps
         self.rules_hash = rules_hash
+        self.flag_rules = flag_rules if flag_rules is not None else _read_json(os.path.join(RULES_DIR, "flag_rules.json"))
+
+    @property
+    def flag_program(self):
+        from .flag_rules import get_program
+        return get_program(self)
+
+    @property
+    def suppression_graph(self) -> "SuppressionGraph":
+        graph = _SUPPRESSION_GRAPHS.get(self.rules_hash)
+        if graph is None:
+            graph = SuppressionGraph(self.suppression)
+            _SUPPRESSION_GRAPHS[self.rules_hash] = graph
+        return graph
 
     def require_pricing_cap(self, path: Iterable[str]) -> Any:
         return _require_path(self.pricing_caps, path, "pricing_caps")
@@ -115,12 +132,14 @@ def _require_float(value: Any, label: str) -> float:
     return result
 
 
-def load_rules() -> RuleSet:
+def load_rules(rules_dir: Optional[str] = None) -> RuleSet:
+    rules_dir = rules_dir or RULES_DIR
     paths = {
-        "flag_registry": os.path.join(RULES_DIR, "flag_registry.json"),
-        "suppression": os.path.join(RULES_DIR, "suppression_pairs.json"),
-        "pricing_caps": os.path.join(RULES_DIR, "pricing_caps.json"),
-        "doc_fee_caps": os.path.join(RULES_DIR, "doc_fee_state_rules.json"),
+        "flag_registry": os.path.join(rules_dir, "flag_registry.json"),
+        "suppression": os.path.join(rules_dir, "suppression_pairs.json"),
+        "pricing_caps": os.path.join(rules_dir, "pricing_caps.json"),
+        "doc_fee_caps": os.path.join(rules_dir, "doc_fee_state_rules.json"),
+        "flag_rules": os.path.join(rules_dir, "flag_rules.json"),
     }
 
     contents = []
@@ -154,10 +173,15 @@ def load_rules() -> RuleSet:
     suppression = _read_json(paths["suppression"])
     pricing_caps = _read_json(paths["pricing_caps"])
     doc_fee_caps = _read_json(paths["doc_fee_caps"])
+    flag_rules = _read_json(paths["flag_rules"])
     _validate_pricing_caps(pricing_caps)
     _validate_doc_fee_caps(doc_fee_caps)
 
-    return RuleSet(registry, suppression, pricing_caps, doc_fee_caps, rules_hash)
+    rules = RuleSet(registry, suppression, pricing_caps, doc_fee_caps, rules_hash, flag_rules)
+    # Compile (or fetch the cached program/graph) now so malformed rules fail at load time
+    rules.flag_program
+    rules.suppression_graph
+    return rules
 
 
 def _validate_pricing_caps(pricing_caps: dict) -> None:
@@ -256,6 +280,18 @@ def build_active_flags(flags_payload: List[dict], registry: Dict[str, FlagDefini
     return active_flags
 
 
+def merge_flags(upstream: List[ActiveFlag], computed: List[ActiveFlag], rules: RuleSet) -> List[ActiveFlag]:
+    """
+    Upstream + computed flags for scoring. Where a deterministic section has
+    decided a check (e.g. payment math), upstream copies of its flags are
+    dropped so the same condition is not counted twice.
+    """
+    superseded = rules.flag_program.superseded_flag_ids(computed)
+    if not superseded:
+        return upstream + computed
+    return [flag for flag in upstream if flag.flag_id not in superseded] + computed
+
+
 def _make_flag(flag_id: str, rules: RuleSet, confidence: float = 1.0, message: Optional[str] = None, source: str = "computed") -> Optional[ActiveFlag]:
     definition = rules.flag_registry.get(flag_id)
     if not definition:
@@ -290,11 +326,14 @@ def _safe_float(value: Optional[object]) -> Optional[float]:
         return None
 
 
-def _normalize_line_items(parsed: dict) -> List[dict]:
+_NORMALIZER = OCRNormalizer()
+
+
+def _normalize_line_items(parsed: dict) -> List[LineItemRecord]:
     line_items = parsed.get("line_items", [])
     if not isinstance(line_items, list):
         return []
-    normalizer = OCRNormalizer()
+    normalize = _NORMALIZER.normalize_line_item_record
     normalized = []
     for item in line_items:
         if not isinstance(item, dict):
@@ -303,209 +342,53 @@ def _normalize_line_items(parsed: dict) -> List[dict]:
         amount_raw = str(item.get("amount") or item.get("price") or item.get("cost") or "0")
         if not raw_text:
             continue
-        normalized_item = normalizer.normalize_line_item(raw_text=raw_text, amount_raw=amount_raw)
-        normalized.append(normalized_item)
+        normalized.append(normalize(raw_text, amount_raw))
     return normalized
 
 
-def compute_flags_from_parsed(parsed: dict, rules: RuleSet, mode: str) -> List[ActiveFlag]:
-    flags: List[ActiveFlag] = []
-    mode = (mode or "").upper()
-
-    msrp = _safe_float((parsed.get("normalized_pricing") or {}).get("msrp"))
-    selling_price = _safe_float(parsed.get("selling_price"))
-    if msrp is None and selling_price is not None:
-        new_used_flag = _make_flag("NEW_USED_NOT_CONFIRMED", rules, source="system")
-        if new_used_flag:
-            flags.append(new_used_flag)
-        msrp = selling_price
-
-    doc_fee = _safe_float((parsed.get("normalized_pricing") or {}).get("doc_fee"))
-    if doc_fee is not None:
-        state = str(parsed.get("state") or "").upper().strip()
-        caps = rules.require_doc_fee_rule(("states",))
-        benchmark = _require_float(
-            rules.require_doc_fee_rule(("benchmark_default",)),
-            "doc_fee_state_rules.benchmark_default",
-        )
-        cap = None
-        if state in caps:
-            cap = _require_float(
-                _require_path(caps[state], ("cap",), f"doc_fee_state_rules.states.{state}"),
-                f"doc_fee_state_rules.states.{state}.cap",
-            )
-        else:
-            no_cap_flag = _make_flag("NO_CAP", rules, source="system")
-            if no_cap_flag:
-                flags.append(no_cap_flag)
-        if cap is not None and doc_fee > cap:
-            excessive = _make_flag("DOC_FEE_ABOVE_STATE_CAP", rules)
-            if excessive:
-                flags.append(excessive)
-        else:
-            if benchmark is not None and doc_fee > benchmark:
-                elevated = _make_flag("DOC_FEE_ELEVATED", rules)
-                if elevated:
-                    flags.append(elevated)
-            else:
-                within = _make_flag("DOC_FEE_WITHIN_CAP", rules)
-                if within:
-                    flags.append(within)
-
-    normalized_items = _normalize_line_items(parsed)
-    gap_total = 0.0
-    vsc_total = 0.0
-    maintenance_total = 0.0
-    addon_total = 0.0
-    tire_wheel_total = 0.0
-    dca_present = False
-
-    for item in normalized_items:
+def _line_item_totals(parsed: dict) -> Dict[str, Any]:
+    totals: Dict[str, Any] = {
+        "gap": 0.0,
+        "vsc": 0.0,
+        "maintenance": 0.0,
+        "addon": 0.0,
+        "tire_wheel": 0.0,
+        "dca_present": False,
+    }
+    for item in _normalize_line_items(parsed):
         amount = abs(float(item.amount_normalized))
         category = str(item.normalized_category or "")
         raw = str(item.raw_text or "").lower()
         if category == "GAP":
-            gap_total += amount
+            totals["gap"] += amount
             if "debt cancellation" in raw or "dca" in raw:
-                dca_present = True
+                totals["dca_present"] = True
         elif category == "VSC":
-            vsc_total += amount
+            totals["vsc"] += amount
         elif category == "MAINTENANCE":
-            maintenance_total += amount
+            totals["maintenance"] += amount
         elif category == "TIRE_WHEEL_PROTECTION":
-            tire_wheel_total += amount
+            totals["tire_wheel"] += amount
         elif category == "ADDON_PACKAGE":
-            addon_total += amount
+            totals["addon"] += amount
+    totals["backend"] = totals["gap"] + totals["vsc"] + totals["maintenance"] + totals["tire_wheel"]
+    return totals
 
-    backend_total = gap_total + vsc_total + maintenance_total + tire_wheel_total
 
-    # GAP / DCA caps
-    if gap_total > 0 and msrp is not None:
-        msrp_threshold = _require_float(rules.require_pricing_cap(("gap_dca", "msrp_threshold")), "pricing_caps.gap_dca.msrp_threshold")
-        cap_under = _require_float(rules.require_pricing_cap(("gap_dca", "cap_under_threshold")), "pricing_caps.gap_dca.cap_under_threshold")
-        cap_over = _require_float(rules.require_pricing_cap(("gap_dca", "cap_over_threshold")), "pricing_caps.gap_dca.cap_over_threshold")
-        percent_under = _require_float(rules.require_pricing_cap(("gap_dca", "percent_under_threshold")), "pricing_caps.gap_dca.percent_under_threshold")
+def compute_flags_by_section(
+    parsed: dict,
+    rules: RuleSet,
+    mode: str,
+    sections: Optional[Iterable[str]] = None,
+) -> Dict[str, List[ActiveFlag]]:
+    """Evaluate the compiled flag_rules sections in order, optionally only the named ones."""
+    return rules.flag_program.evaluate(parsed, mode, sections)
 
-        if msrp < msrp_threshold:
-            gap_cap = min(cap_under, msrp * percent_under)
-        else:
-            gap_cap = cap_over
-
-        if gap_total > gap_cap:
-            overpriced_id = "DEBT_CANCELLATION_OVERPRICED" if dca_present else "GAP_OVERPRICED"
-            overpriced = _make_flag(overpriced_id, rules)
-            if overpriced:
-                flags.append(overpriced)
-        else:
-            within = _make_flag("GAP_WITHIN_CAP", rules)
-            if within:
-                flags.append(within)
-        if dca_present:
-            info = _make_flag("DEBT_CANCELLATION_DETECTED", rules, source="informational")
-            if info:
-                flags.append(info)
-
-    # VSC caps
-    if vsc_total > 0 and msrp is not None:
-        msrp_threshold = _require_float(rules.require_pricing_cap(("vsc", "msrp_threshold")), "pricing_caps.vsc.msrp_threshold")
-        vehicle_condition = _vehicle_condition(parsed)
-        if msrp <= msrp_threshold:
-            section = "used_under" if vehicle_condition == "USED" else "new_under"
-            percent = _require_float(rules.require_pricing_cap(("vsc", section, "percent")), f"pricing_caps.vsc.{section}.percent")
-            cap_limit = _require_float(rules.require_pricing_cap(("vsc", section, "cap")), f"pricing_caps.vsc.{section}.cap")
-            cap = min(msrp * percent, cap_limit)
-        else:
-            section = "used_over" if vehicle_condition == "USED" else "new_over"
-            percent = _require_float(rules.require_pricing_cap(("vsc", section, "percent")), f"pricing_caps.vsc.{section}.percent")
-            cap = msrp * percent
-
-        mileage = _safe_float(parsed.get("mileage") or parsed.get("odometer") or parsed.get("vehicle_mileage"))
-        high_mileage_min = _require_float(rules.require_pricing_cap(("vsc", "high_mileage", "miles_min")), "pricing_caps.vsc.high_mileage.miles_min")
-        if mileage is not None and mileage >= high_mileage_min:
-            high_mileage_percent = _require_float(rules.require_pricing_cap(("vsc", "high_mileage", "percent")), "pricing_caps.vsc.high_mileage.percent")
-            cap = msrp * high_mileage_percent
-
-        if vsc_total > cap:
-            overpriced = _make_flag("VSC_OVERPRICED", rules)
-            if overpriced:
-                flags.append(overpriced)
-        else:
-            within = _make_flag("VSC_WITHIN_CAP", rules)
-            if within:
-                flags.append(within)
-
-    # Maintenance caps
-    if maintenance_total > 0 and msrp is not None:
-        percent = _require_float(rules.require_pricing_cap(("maintenance", "percent")), "pricing_caps.maintenance.percent")
-        cap = _require_float(rules.require_pricing_cap(("maintenance", "cap")), "pricing_caps.maintenance.cap")
-        maintenance_cap = min(cap, msrp * percent)
-        if maintenance_total > maintenance_cap:
-            overpriced = _make_flag("MAINTENANCE_OVERPRICED", rules)
-            if overpriced:
-                flags.append(overpriced)
-        else:
-            within = _make_flag("MAINTENANCE_WITHIN_CAP", rules)
-            if within:
-                flags.append(within)
-
-    # Add-on combined cap (front-end)
-    add_on_cap = _require_float(rules.require_pricing_cap(("add_ons", "combined_cap")), "pricing_caps.add_ons.combined_cap")
-    if addon_total > add_on_cap:
-        cap_exceeded = _make_flag("ADDON_CAP_EXCEEDED", rules)
-        if cap_exceeded:
-            flags.append(cap_exceeded)
-
-    if backend_total > 0 and msrp is not None:
-        backend_percent = _require_float(
-            rules.require_pricing_cap(("backend_total", "max_percent_of_msrp")),
-            "pricing_caps.backend_total.max_percent_of_msrp",
-        )
-        if backend_total / msrp > backend_percent:
-            overloaded = _make_flag("BACKEND_OVERLOAD_DETECTED", rules)
-            if overloaded:
-                flags.append(overloaded)
-        else:
-            within = _make_flag("BACKEND_WITHIN_THRESHOLD", rules)
-            if within:
-                flags.append(within)
-
-    # Term-based structural flags
-    term_months = _safe_float((parsed.get("term") or {}).get("months"))
-    if term_months is not None:
-        high_risk_min = _require_float(rules.require_pricing_cap(("term", "high_risk_min_months")), "pricing_caps.term.high_risk_min_months")
-        extended_min = _require_float(rules.require_pricing_cap(("term", "extended_min_months")), "pricing_caps.term.extended_min_months")
-        extended_max = _require_float(rules.require_pricing_cap(("term", "extended_max_months")), "pricing_caps.term.extended_max_months")
-        if term_months >= high_risk_min:
-            high_term = _make_flag("HIGH_RISK_TERM", rules)
-            if high_term:
-                flags.append(high_term)
-        elif extended_min <= term_months <= extended_max:
-            extended = _make_flag("EXTENDED_TERM", rules)
-            if extended:
-                flags.append(extended)
-
-    # Negative equity disclosed
-    neg_equity = _safe_float((parsed.get("trade") or {}).get("negative_equity"))
-    if neg_equity is not None and neg_equity > 0:
-        neg_flag = _make_flag("NEGATIVE_EQUITY_DISCLOSED", rules)
-        if neg_flag:
-            flags.append(neg_flag)
-
-    # Lease mileage program flags
-    if mode == "LEASE":
-        annual_miles = _safe_float(parsed.get("annual_miles"))
-        if annual_miles is not None:
-            standard_min = _require_float(rules.require_pricing_cap(("lease_mileage", "standard_min")), "pricing_caps.lease_mileage.standard_min")
-            standard_max = _require_float(rules.require_pricing_cap(("lease_mileage", "standard_max")), "pricing_caps.lease_mileage.standard_max")
-            if annual_miles < standard_min:
-                low_miles = _make_flag("MILEAGE_BELOW_STANDARD", rules)
-                if low_miles:
-                    flags.append(low_miles)
-            elif standard_min <= annual_miles <= standard_max:
-                standard = _make_flag("STANDARD_MILEAGE_PROGRAM", rules)
-                if standard:
-                    flags.append(standard)
 
+def compute_flags_from_parsed(parsed: dict, rules: RuleSet, mode: str) -> List[ActiveFlag]:
+    flags: List[ActiveFlag] = []
+    for section_flags in compute_flags_by_section(parsed, rules, mode).values():
+        flags.extend(section_flags)
     return flags
 
 
@@ -521,43 +404,120 @@ def _vehicle_condition(parsed: dict) -> str:
     return "NEW"
 
 
-def apply_suppression(flags: List[ActiveFlag], suppression_rules: dict) -> List[str]:
-    by_id = {f.flag_id: f for f in flags}
-    suppressed: List[str] = []
-
-    for rule in suppression_rules.get("pairs", []):
-        trigger = str(rule.get("if_active", "")).upper()
-        if not trigger or trigger not in by_id:
-            continue
-        trigger_flag = by_id[trigger]
-        if trigger_flag.suppressed:
-            continue
-        for target in rule.get("suppress", []):
-            target_id = str(target).upper()
-            if target_id in by_id:
-                by_id[target_id].suppressed = True
-                suppressed.append(target_id)
-
-    backend_rule = suppression_rules.get("backend_overload") or {}
-    backend_flag_id = str(backend_rule.get("flag", "")).upper()
-    compare_ids = [str(fid).upper() for fid in backend_rule.get("compare_to_sum_of", [])]
-    if backend_flag_id in by_id:
-        backend_flag = by_id[backend_flag_id]
-        if not backend_flag.suppressed:
+@dataclass(frozen=True)
+class SuppressionEdge:
+    trigger: str
+    targets: Tuple[str, ...]
+    reason: str
+
+
+class SuppressionGraph:
+    """
+    suppression_pairs.json compiled into a trigger -> targets index.
+
+    Triggers are applied in resolved chain order: a trigger that can itself be
+    suppressed is only applied after every trigger that can suppress it, so a
+    suppressed flag never suppresses anything (e.g. APR_UNCERTAIN silences
+    SUBVENTED_RATE_DETECTED before it can hide APR_ABOVE_BENCHMARK).
+    """
+
+    def __init__(self, suppression_rules: dict):
+        edges: Dict[str, SuppressionEdge] = {}
+        for rule in suppression_rules.get("pairs", []):
+            trigger = str(rule.get("if_active", "")).upper()
+            if not trigger:
+                continue
+            targets = tuple(str(t).upper() for t in rule.get("suppress", []))
+            existing = edges.get(trigger)
+            if existing:
+                targets = existing.targets + tuple(t for t in targets if t not in existing.targets)
+                edges[trigger] = SuppressionEdge(trigger, targets, existing.reason)
+            else:
+                edges[trigger] = SuppressionEdge(trigger, targets, str(rule.get("reason", "")))
+        self.edges = edges
+        self.order = self._resolve_order(edges)
+        self.rank = {trigger: index for index, trigger in enumerate(self.order)}
+
+        backend_rule = suppression_rules.get("backend_overload") or {}
+        self.backend_flag = str(backend_rule.get("flag", "")).upper()
+        self.backend_compare = tuple(str(fid).upper() for fid in backend_rule.get("compare_to_sum_of", []))
+        self.backend_label = f"{self.backend_flag}:{backend_rule.get('rule', 'apply_higher_absolute')}"
+
+    @staticmethod
+    def _resolve_order(edges: Dict[str, SuppressionEdge]) -> List[str]:
+        # Kahn's algorithm over trigger -> trigger edges, file order breaks ties.
+        position = {trigger: index for index, trigger in enumerate(edges)}
+        pending = {trigger: 0 for trigger in edges}
+        for edge in edges.values():
+            for target in edge.targets:
+                if target in pending and target != edge.trigger:
+                    pending[target] += 1
+        order: List[str] = []
+        ready = [position[trigger] for trigger in edges if pending[trigger] == 0]
+        heapq.heapify(ready)
+        triggers = list(edges)
+        while ready:
+            trigger = triggers[heapq.heappop(ready)]
+            order.append(trigger)
+            for target in edges[trigger].targets:
+                if target in pending and target != trigger:
+                    pending[target] -= 1
+                    if pending[target] == 0:
+                        heapq.heappush(ready, position[target])
+        if len(order) != len(edges):
+            cyclic = sorted(t for t in edges if t not in order)
+            raise RuleLoadError(f"RULE_LOAD_FAILURE: suppression_pairs cycle between {', '.join(cyclic)}")
+        return order
+
+    def apply(self, flags: List[ActiveFlag]) -> List[str]:
+        by_id: Dict[str, List[ActiveFlag]] = {}
+        for flag in flags:
+            by_id.setdefault(flag.flag_id, []).append(flag)
+        suppressed: List[str] = []
+
+        def suppress(flag_id: str, instances: List[ActiveFlag], by: str) -> None:
+            hit = False
+            for flag in instances:
+                if not flag.suppressed:
+                    flag.suppressed = True
+                    flag.suppressed_by = by
+                    hit = True
+            if hit and flag_id not in suppressed:
+                suppressed.append(flag_id)
+
+        rank = self.rank
+        for trigger in sorted((fid for fid in by_id if fid in rank), key=rank.__getitem__):
+            if all(flag.suppressed for flag in by_id[trigger]):
+                continue
+            for target in self.edges[trigger].targets:
+                instances = by_id.get(target)
+                if instances:
+                    suppress(target, instances, trigger)
+
+        backend_flags = [f for f in by_id.get(self.backend_flag, []) if not f.suppressed]
+        if backend_flags:
             total = 0.0
-            for fid in compare_ids:
-                if fid in by_id and not by_id[fid].suppressed:
-                    total += abs(by_id[fid].adjusted_points)
-            if total > abs(backend_flag.adjusted_points):
-                backend_flag.suppressed = True
-                suppressed.append(backend_flag_id)
+            for fid in self.backend_compare:
+                for flag in by_id.get(fid, []):
+                    if not flag.suppressed:
+                        total += abs(flag.adjusted_points)
+            if total > max(abs(f.adjusted_points) for f in backend_flags):
+                suppress(self.backend_flag, backend_flags, self.backend_label)
             else:
-                for fid in compare_ids:
-                    if fid in by_id and not by_id[fid].suppressed:
-                        by_id[fid].suppressed = True
-                        suppressed.append(fid)
+                for fid in self.backend_compare:
+                    if fid in by_id:
+                        suppress(fid, by_id[fid], self.backend_label)
+
+        return suppressed
+
 
-    return suppressed
+_SUPPRESSION_GRAPHS: Dict[str, SuppressionGraph] = {}
+
+
+def apply_suppression(flags: List[ActiveFlag], suppression_rules) -> List[str]:
+    """Mark suppressed flags in place; accepts the raw suppression dict or a compiled SuppressionGraph."""
+    graph = suppression_rules if isinstance(suppression_rules, SuppressionGraph) else SuppressionGraph(suppression_rules)
+    return graph.apply(flags)
 
 
 def compute_trust_score_delta(flags: List[ActiveFlag]) -> Tuple[float, bool]:
@@ -608,7 +568,7 @@ def score_flags(
             eligible_for_scoring=False,
         )
 
-    suppressed_ids = apply_suppression(flags, rules.suppression)
+    suppressed_ids = apply_suppression(flags, rules.suppression_graph)
     total = BASE_SCORE
     for flag in flags:
         if flag.suppressed or not flag.scoring_eligible:
@@ -631,3 +591,45 @@ def score_flags(
         audit_status=audit_status,
         eligible_for_scoring=True,
     )
+
+
+# Analyzer modes: the full analysis, the full response with a template narrative
+# (narrative_templates.py, no narrative or translation calls), or score_parsed + flag_groups only
+ANALYSIS_MODES = ("full", "template", "score_only")
+
+
+def score_parsed(parsed: dict, mode: str, rules: Optional[RuleSet] = None) -> ScoringResult:
+    """The whole deterministic path for one parsed deal: upstream + computed flags, merged and scored."""
+    rules = rules or load_rules()
+    upstream_flags = build_active_flags(parsed.get("flags", []), rules.flag_registry, "upstream")
+    computed_flags = compute_flags_from_parsed(parsed, rules, mode=mode)
+    all_flags = merge_flags(upstream_flags, computed_flags, rules)
+    return score_flags(all_flags, rules, parsed.get("audit_status", "COMPLETE"))
+
+
+def flag_groups(result: ScoringResult) -> Dict[str, List[dict]]:
+    """Visible flags as output dicts, grouped the way the analyzers present them."""
+    groups: Dict[str, List[dict]] = {"red_flags": [], "green_flags": [], "blue_flags": []}
+    for flag in result.flags:
+        if flag.suppressed or flag.group == "SYSTEM":
+            continue
+        deduction = None
+        bonus = None
+        if flag.points < 0:
+            deduction = int(round(abs(flag.adjusted_points)))
+        elif flag.points > 0:
+            bonus = int(round(abs(flag.points)))
+        if flag.group == "POSITIVE":
+            key = "green_flags"
+        elif flag.group == "DEALER_CONDUCT":
+            key = "red_flags"
+        else:
+            key = "blue_flags"
+        groups[key].append({
+            "type": flag.flag_id,
+            "message": flag.message,
+            "item": flag.group,
+            "deduction": deduction,
+            "bonus": bonus,
+        })
+    return groups
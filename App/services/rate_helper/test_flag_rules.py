@@ -0,0 +1,159 @@
+import copy
+
+import pytest
+
+from App.services.rate_helper.flag_rules import compile_flag_rules
+from App.services.rate_helper.scoring_engine import RuleLoadError, compute_flags_from_parsed, load_rules
+
+MODES = ("QUOTE", "CONTRACT", "LEASE")
+
+
+def _items(*pairs):
+    return [{"description": description, "amount": amount} for description, amount in pairs]
+
+
+# Expected flags were produced by the hand-written flag functions this rule file replaced
+GOLDEN_DEALS = [
+    (
+        "no_msrp_ca_doc_fee_ok",
+        {"selling_price": 30000, "state": "CA", "normalized_pricing": {"doc_fee": 85}},
+        ["NEW_USED_NOT_CONFIRMED", "DOC_FEE_WITHIN_CAP"],
+    ),
+    (
+        "ca_doc_fee_over_cap",
+        {"selling_price": 30000, "state": "CA", "normalized_pricing": {"msrp": 32000, "doc_fee": 499}},
+        ["DOC_FEE_ABOVE_STATE_CAP"],
+    ),
+    (
+        "no_state_doc_fee_elevated",
+        {"selling_price": 30000, "normalized_pricing": {"msrp": 32000, "doc_fee": 1200}},
+        ["NO_CAP", "DOC_FEE_ELEVATED"],
+    ),
+    (
+        "gap_over_cap_long_term",
+        {"selling_price": 28000, "normalized_pricing": {"msrp": 30000}, "term": {"months": 84},
+         "line_items": _items(("GAP Insurance", "1995"))},
+        ["GAP_OVERPRICED", "BACKEND_WITHIN_THRESHOLD", "HIGH_RISK_TERM"],
+    ),
+    (
+        "gap_within_cap",
+        {"selling_price": 28000, "normalized_pricing": {"msrp": 30000}, "term": {"months": 60},
+         "line_items": _items(("GAP Insurance", "595"))},
+        ["GAP_WITHIN_CAP", "BACKEND_WITHIN_THRESHOLD"],
+    ),
+    (
+        "debt_cancellation",
+        {"selling_price": 28000, "normalized_pricing": {"msrp": 30000},
+         "line_items": _items(("Debt Cancellation Agreement", "2500"))},
+        ["DEBT_CANCELLATION_OVERPRICED", "DEBT_CANCELLATION_DETECTED", "BACKEND_WITHIN_THRESHOLD"],
+    ),
+    (
+        "vsc_used_over_cap",
+        {"selling_price": 18000, "condition": "used", "normalized_pricing": {"msrp": 20000},
+         "line_items": _items(("Vehicle Service Contract", "4500"))},
+        ["VSC_OVERPRICED", "BACKEND_OVERLOAD_DETECTED"],
+    ),
+    (
+        "vsc_new_within_cap_high_miles",
+        {"selling_price": 45000, "mileage": 90000, "normalized_pricing": {"msrp": 50000},
+         "line_items": _items(("Extended Warranty", "1500"))},
+        ["VSC_WITHIN_CAP", "BACKEND_WITHIN_THRESHOLD"],
+    ),
+    (
+        "maintenance_and_addons",
+        {"selling_price": 35000, "normalized_pricing": {"msrp": 36000}, "term": {"months": 75},
+         "line_items": _items(("Prepaid Maintenance Plan", "2200"), ("Nitrogen Fill", "499"),
+                              ("Window Etching", "899"), ("Tire & Wheel Protection", "1895"))},
+        ["MAINTENANCE_OVERPRICED", "BACKEND_WITHIN_THRESHOLD", "EXTENDED_TERM"],
+    ),
+    (
+        "backend_overload",
+        {"selling_price": 25000, "normalized_pricing": {"msrp": 26000},
+         "line_items": _items(("GAP Insurance", "1200"), ("Vehicle Service Contract", "3900"),
+                              ("Prepaid Maintenance Plan", "1500"), ("Tire & Wheel Protection", "1500"))},
+        ["GAP_OVERPRICED", "VSC_WITHIN_CAP", "MAINTENANCE_OVERPRICED", "BACKEND_OVERLOAD_DETECTED"],
+    ),
+    (
+        "addon_package_over_cap",
+        {"selling_price": 30000, "normalized_pricing": {"msrp": 31000},
+         "line_items": _items(("ProPack Appearance", "1495"), ("Dealer Accessories", "350"))},
+        ["ADDON_CAP_EXCEEDED"],
+    ),
+    (
+        "negative_equity",
+        {"selling_price": 30000, "normalized_pricing": {"msrp": 31000}, "trade": {"negative_equity": 4200}},
+        ["NEGATIVE_EQUITY_DISCLOSED"],
+    ),
+]
+
+# Lease-only sections: (deal, flags added in LEASE mode)
+LEASE_DEALS = [
+    (
+        "lease_low_mileage",
+        {"selling_price": 40000, "normalized_pricing": {"msrp": 42000}, "annual_miles": 7500, "term": {"months": 36}},
+        ["MILEAGE_BELOW_STANDARD"],
+    ),
+    (
+        "lease_standard_mileage",
+        {"selling_price": 40000, "normalized_pricing": {"msrp": 42000}, "annual_miles": 12000},
+        ["STANDARD_MILEAGE_PROGRAM"],
+    ),
+]
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return load_rules()
+
+
+def _flag_ids(deal, rules, mode):
+    return [flag.flag_id for flag in compute_flags_from_parsed(copy.deepcopy(deal), rules, mode)]
+
+
+@pytest.mark.parametrize("name,deal,expected", GOLDEN_DEALS, ids=[d[0] for d in GOLDEN_DEALS])
+def test_golden_deal_flags(rules, name, deal, expected):
+    for mode in MODES:
+        assert _flag_ids(deal, rules, mode) == expected, mode
+
+
+@pytest.mark.parametrize("name,deal,expected", LEASE_DEALS, ids=[d[0] for d in LEASE_DEALS])
+def test_lease_only_sections(rules, name, deal, expected):
+    assert _flag_ids(deal, rules, "LEASE") == expected
+    assert _flag_ids(deal, rules, "QUOTE") == []
+    assert _flag_ids(deal, rules, "CONTRACT") == []
+
+
+def _rule_stats(program):
+    return {row["rule_id"]: row for row in program.stats()}
+
+
+def test_rule_counters(rules):
+    program = compile_flag_rules(rules.flag_rules, rules)
+    deal = {"selling_price": 30000, "state": "CA", "normalized_pricing": {"msrp": 32000, "doc_fee": 499}}
+    for _ in range(3):
+        program.evaluate(copy.deepcopy(deal), "QUOTE")
+    stats = _rule_stats(program)
+
+    assert stats["doc_fee_no_state_cap"]["evaluations"] == 3
+    assert stats["doc_fee_no_state_cap"]["matches"] == 0
+    assert stats["doc_fee_above_state_cap"]["matches"] == 3
+    # Rules after a taken exclusive branch are skipped, not evaluated
+    assert stats["doc_fee_elevated"]["evaluations"] == 0
+    assert stats["doc_fee_within_cap"]["evaluations"] == 0
+    assert stats["doc_fee_above_state_cap"]["total_ms"] >= 0
+
+    program.reset_stats()
+    assert all(row["evaluations"] == 0 and row["matches"] == 0 for row in program.stats())
+
+
+def test_sections_skipped_by_guard_or_mode_are_not_counted(rules):
+    program = compile_flag_rules(rules.flag_rules, rules)
+    program.evaluate({"selling_price": 30000, "annual_miles": 7500}, "QUOTE")
+    stats = _rule_stats(program)
+    assert all(row["evaluations"] == 0 for row in stats.values() if row["section"] in ("doc_fee", "lease_mileage"))
+
+
+def test_unknown_constant_fails_at_compile_time(rules):
+    raw = {"sections": [{"name": "bad", "rules": [{"flag": "GAP_OVERPRICED", "when": {"gt": ["$gap_total", "@pricing_caps.nope"]}}]}]}
+    with pytest.raises(RuleLoadError):
+        compile_flag_rules(raw, rules)
@@ -0,0 +1,15 @@
+from App.services.rate_helper.gap_logic import GAPLogic
+
+
+def test_review_flag_when_gap_is_missing():
+    flag = GAPLogic.review_flag([{"description": "Doc Fee", "amount": 85}, "not a line item"])
+    assert flag == {"type": "Protection Review", "message": "GAP not shown on quote — ask before finalizing", "item": "GAP"}
+    assert GAPLogic.review_flag([]) == flag
+
+
+def test_no_review_flag_when_gap_is_listed():
+    assert GAPLogic.review_flag([{"description": "GAP Insurance", "amount": 895}]) is None
+    assert GAPLogic.review_flag([{"item": "Guaranteed Asset Protection"}]) is None
+    assert GAPLogic.review_flag([{"description": "Debt Cancellation Agreement"}]) is None
+    # "gap" must be a word of its own
+    assert GAPLogic.review_flag([{"description": "Gapless trim"}]) is not None
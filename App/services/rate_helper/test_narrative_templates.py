@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from App.services.rate_helper.narrative_templates import build_narrative
+
+PARSED = {"dealer_name": "Sunrise Motors", "apr": {"rate": 6.9}, "term": {"months": 72}}
+
+
+def _flag(type, message, item="", deduction=None, bonus=None):
+    return SimpleNamespace(type=type, message=message, item=item, deduction=deduction, bonus=bonus)
+
+
+def _apr_paragraph(red_flags, green_flags=()):
+    narrative, _ = build_narrative(PARSED, 80.0, list(red_flags), list(green_flags), [])
+    return narrative["apr_bonus_rule"]
+
+
+def test_gap_and_doc_fee_flags_stay_out_of_the_apr_paragraph():
+    red_flags = [
+        _flag("GAP_OVERPRICED", "GAP is priced separately at $1,995, above the $900 cap", "BACKEND", deduction=5),
+        _flag("DOC_FEE_ABOVE_STATE_CAP", "Doc fee exceeds the state rate cap of $85", "FEES", deduction=3),
+        _flag("OVERAGE_RATE_NOT_DISCLOSED", "Mileage overage rate is not disclosed", "LEASE", deduction=2),
+    ]
+    text = _apr_paragraph(red_flags)
+    assert text == "APR listed at 6.9%. Term: 72 months."
+    assert "Rate concern" not in text
+
+
+def test_rate_flags_are_described():
+    red_flags = [
+        _flag("GAP_OVERPRICED", "GAP is priced separately", "BACKEND", deduction=5),
+        _flag("APR_ABOVE_BENCHMARK", "APR is 3 points above the lender benchmark", "FINANCING", deduction=8),
+    ]
+    green_flags = [_flag("SUBVENTED_RATE_DETECTED", "Manufacturer-subsidized financing", "POSITIVE", bonus=3)]
+    text = _apr_paragraph(red_flags, green_flags)
+    assert "Rate bonus: Manufacturer-subsidized financing" in text
+    assert "Rate concern: APR is 3 points above the lender benchmark" in text
+
+
+def test_rate_markup_wording_from_the_model():
+    red_flags = [_flag("red", "Dealer added a rate markup of 2 points", "Financing")]
+    assert "Rate concern: Dealer added a rate markup" in _apr_paragraph(red_flags)
@@ -0,0 +1,215 @@
+import pytest
+
+from App.services.rate_helper.payment_math import (
+    amortized_payment,
+    apr_to_money_factor,
+    derive_money_factor,
+    lease_payment,
+    money_factor_to_apr,
+    reconcile_lease,
+    reconcile_loan,
+)
+from App.services.rate_helper.scoring_engine import compute_flags_by_section, load_rules, score_parsed
+
+
+@pytest.fixture(scope="module")
+def rules():
+    return load_rules()
+
+
+def _section_flags(parsed, rules, mode, section):
+    return [flag.flag_id for flag in compute_flags_by_section(parsed, rules, mode, [section])[section]]
+
+
+# ─── Formulas ───
+
+def test_amortized_payment():
+    assert amortized_payment(30000, 6.0, 60) == pytest.approx(579.98, abs=0.01)
+    assert amortized_payment(18500, 4.9, 72) == pytest.approx(297.08, abs=0.01)
+
+
+def test_amortized_payment_zero_apr():
+    assert amortized_payment(24000, 0.0, 48) == 500.0
+
+
+@pytest.mark.parametrize("principal,apr,months", [(0, 5.0, 60), (20000, 5.0, 0), (20000, -1.0, 60)])
+def test_amortized_payment_invalid_inputs(principal, apr, months):
+    assert amortized_payment(principal, apr, months) is None
+
+
+def test_lease_payment():
+    payment = lease_payment(35000, 21000, 0.0025, 36, tax_rate=0.0825)
+    assert payment.depreciation == pytest.approx(388.89, abs=0.01)
+    assert payment.rent_charge == pytest.approx(140.0)
+    assert payment.base_payment == pytest.approx(528.89, abs=0.01)
+    assert payment.total_payment == pytest.approx(528.89 * 1.0825, abs=0.01)
+
+
+def test_lease_payment_invalid_inputs():
+    assert lease_payment(35000, 21000, 0.0025, 0) is None
+    assert lease_payment(0, 21000, 0.0025, 36) is None
+    assert lease_payment(35000, 21000, -0.001, 36) is None
+
+
+def test_money_factor_conversions():
+    assert apr_to_money_factor(6.0) == pytest.approx(0.0025)
+    assert money_factor_to_apr(0.0025) == pytest.approx(6.0)
+    # 36 months of rent charge at MF 0.0025 on (35000 + 21000)
+    assert derive_money_factor(140.0 * 36, 35000, 21000, 36) == pytest.approx(0.0025)
+    assert derive_money_factor(5040, 0, 0, 36) is None
+
+
+# ─── Reconciliation ───
+
+def test_reconcile_loan():
+    check = reconcile_loan({
+        "monthly_payment": "$600.00",
+        "normalized_pricing": {"amount_financed": "30,000"},
+        "apr": {"rate": 6.0},
+        "term": {"months": 60},
+    })
+    assert check.expected == pytest.approx(579.98, abs=0.01)
+    assert check.delta == pytest.approx(20.02, abs=0.01)
+
+
+@pytest.mark.parametrize("parsed", [
+    {"monthly_payment": 500, "amount_financed": 24000, "apr": 0, "term": {"months": 0}},
+    {"monthly_payment": 500, "amount_financed": 24000, "apr": 0, "term": {}},
+    {"monthly_payment": 500, "amount_financed": 24000, "term": {"months": 48}},
+    {"monthly_payment": 500, "amount_financed": 24000, "apr": {"rate": 5.0, "estimated": True}, "term": {"months": 48}},
+    {"monthly_payment": 0, "amount_financed": 24000, "apr": 0, "term": {"months": 48}},
+    {"monthly_payment": 500, "apr": 0, "term": {"months": 48}},
+])
+def test_reconcile_loan_skips_missing_or_zero_fields(parsed):
+    assert reconcile_loan(parsed) is None
+
+
+def test_reconcile_lease_with_residual_percent():
+    check = reconcile_lease({
+        "monthly_payment": 528.89,
+        "net_cap_cost": 35000,
+        "residual_percent": 50,
+        "normalized_pricing": {"msrp": 42000},
+        "money_factor": 0.0025,
+        "term": {"months": 36},
+    })
+    assert check.expected == pytest.approx(528.89, abs=0.01)
+    assert not check.tax_included
+
+
+def test_reconcile_lease_matches_tax_included_payment():
+    check = reconcile_lease({
+        "monthly_payment": 572.52,
+        "net_cap_cost": 35000,
+        "residual_value": 21000,
+        "apr": {"rate": 6.0},
+        "tax_rate": 8.25,
+        "term": {"months": 36},
+    })
+    assert check.tax_included
+    assert check.delta == pytest.approx(0.0, abs=0.01)
+
+
+def test_reconcile_lease_zero_money_factor():
+    check = reconcile_lease({
+        "monthly_payment": 500, "net_cap_cost": 30000, "residual_value": 12000, "money_factor": 0, "term": {"months": 36},
+    })
+    assert check.expected == pytest.approx(500.0)
+
+
+def test_reconcile_lease_derives_money_factor_from_rent_charge():
+    check = reconcile_lease({
+        "monthly_payment": 528.89, "net_cap_cost": 35000, "residual_value": 21000, "total_rent_charge": 5040,
+        "term": {"months": 36},
+    })
+    assert check.expected == pytest.approx(528.89, abs=0.01)
+
+
+@pytest.mark.parametrize("parsed", [
+    {"monthly_payment": 500, "net_cap_cost": 30000, "money_factor": 0.002, "term": {"months": 36}},
+    {"monthly_payment": 500, "net_cap_cost": 30000, "residual_percent": 55, "money_factor": 0.002, "term": {"months": 36}},
+    {"monthly_payment": 500, "net_cap_cost": 30000, "residual_value": 12000, "term": {"months": 36}},
+    {"monthly_payment": 500, "net_cap_cost": 30000, "residual_value": 12000, "money_factor": 0.002, "term": {"months": 0}},
+])
+def test_reconcile_lease_skips_missing_fields(parsed):
+    assert reconcile_lease(parsed) is None
+
+
+# ─── Tolerances (pricing_caps.payment_tolerance) ───
+
+def _loan(payment):
+    # 0% APR keeps the expected payment at exactly 500.00
+    return {"monthly_payment": payment, "amount_financed": 24000, "apr": 0, "term": {"months": 48}}
+
+
+@pytest.mark.parametrize("payment,quote,contract", [
+    (505.00, ["PAYMENT_MATH_PASS"], ["PAYMENT_MATH_PASS"]),
+    (495.00, ["PAYMENT_MATH_PASS"], ["PAYMENT_MATH_PASS"]),
+    (505.01, [], ["PAYMENT_VARIANCE"]),
+    (494.99, [], []),
+    (525.00, [], ["PAYMENT_VARIANCE"]),
+    (525.01, ["PAYMENT_CONFLICT"], ["PAYMENT_CONFLICT"]),
+    (474.99, ["PAYMENT_CONFLICT"], ["PAYMENT_CONFLICT"]),
+])
+def test_loan_tolerance_boundaries(rules, payment, quote, contract):
+    assert _section_flags(_loan(payment), rules, "QUOTE", "loan_payment") == quote
+    assert _section_flags(_loan(payment), rules, "CONTRACT", "loan_payment") == contract
+
+
+def test_loan_percent_tolerance_above_absolute(rules):
+    # Expected 1000.00: pass within max(5, 1%) = 10, conflict beyond max(25, 5%) = 50
+    parsed = {"amount_financed": 48000, "apr": 0, "term": {"months": 48}}
+    assert _section_flags({**parsed, "monthly_payment": 1010}, rules, "QUOTE", "loan_payment") == ["PAYMENT_MATH_PASS"]
+    assert _section_flags({**parsed, "monthly_payment": 1050}, rules, "QUOTE", "loan_payment") == []
+    assert _section_flags({**parsed, "monthly_payment": 1050.01}, rules, "QUOTE", "loan_payment") == ["PAYMENT_CONFLICT"]
+
+
+def test_loan_section_skipped_without_inputs(rules):
+    assert _section_flags({"monthly_payment": 500, "term": {"months": 0}}, rules, "CONTRACT", "loan_payment") == []
+
+
+def _lease(payment, **extra):
+    # Zero money factor keeps the expected payment at exactly 500.00
+    return {"monthly_payment": payment, "net_cap_cost": 30000, "residual_value": 12000, "money_factor": 0,
+            "term": {"months": 36}, **extra}
+
+
+@pytest.mark.parametrize("payment,expected", [
+    (510.00, ["LEASE_PAYMENT_MATH_PASS"]),
+    (490.00, ["LEASE_PAYMENT_MATH_PASS"]),
+    (510.01, ["LEASE_PAYMENT_VARIANCE"]),
+    (525.00, ["LEASE_PAYMENT_VARIANCE"]),
+    (525.01, ["LEASE_PAYMENT_CONFLICT"]),
+])
+def test_lease_tolerance_boundaries(rules, payment, expected):
+    assert _section_flags(_lease(payment), rules, "LEASE", "lease_payment") == expected
+
+
+def test_lease_math_skipped_when_residual_missing(rules):
+    parsed = _lease(500)
+    del parsed["residual_value"]
+    assert _section_flags(parsed, rules, "LEASE", "lease_payment") == ["LEASE_PAYMENT_MATH_SKIPPED"]
+    assert _section_flags(_lease(500, term={"months": 0}), rules, "LEASE", "lease_payment") == ["LEASE_PAYMENT_MATH_SKIPPED"]
+
+
+# ─── Upstream supersession ───
+
+def _visible(result):
+    return [flag.flag_id for flag in result.flags if not flag.suppressed]
+
+
+def test_passing_math_replaces_upstream_conflict(rules):
+    parsed = {**_loan(500), "flags": [{"flag_id": "PAYMENT_CONFLICT"}]}
+    result = score_parsed(parsed, "QUOTE", rules)
+    assert "PAYMENT_CONFLICT" not in _visible(result)
+    assert "PAYMENT_MATH_PASS" in _visible(result)
+
+
+def test_math_skipped_keeps_the_upstream_flag(rules):
+    parsed = {"monthly_payment": 500, "money_factor": 0, "term": {"months": 36},
+              "flags": [{"flag_id": "LEASE_PAYMENT_CONFLICT"}]}
+    result = score_parsed(parsed, "LEASE", rules)
+    assert "LEASE_PAYMENT_MATH_SKIPPED" in [flag.flag_id for flag in result.flags]
+    assert "LEASE_PAYMENT_CONFLICT" in _visible(result)
+    assert result.score_int == 85
+
@@ -0,0 +1,34 @@
+from App.services.rate_helper.audit_classifier import AuditClassifier
+from App.services.rate_helper.audit_flags import AuditFlagBuilder
+from App.services.rate_helper.ocr_normalizer import OCRNormalizer
+
+ITEMS = [
+    ("GAP Insurance", "895.00"),
+    ("Vehicle Service Contract", "$2,450"),
+    ("Manufacturer Rebate", "-1500"),
+    ("Doc Fee", "85"),
+    ("Finance Certificate", "-1000"),
+    ("ProPack Plus Protection Package", "2995"),
+]
+
+
+def test_record_matches_pydantic_model():
+    normalizer = OCRNormalizer()
+    for text, amount in ITEMS:
+        record = normalizer.normalize_line_item_record(text, amount)
+        assert record.to_model() == normalizer.normalize_line_item(text, amount)
+
+
+def test_audit_records_are_slotted():
+    normalizer = OCRNormalizer()
+    classifier = AuditClassifier()
+    certificate = classifier.classify_for_audit(normalizer.normalize_line_item_record("Finance Certificate", "-1000"), 30000)
+    bundle = classifier.classify_for_audit(normalizer.normalize_line_item_record("ProPack Plus Protection Package", "3995"), 30000)
+
+    assert certificate.classification == "CONDITIONAL_FINANCE_INCENTIVE"
+    assert bundle.classification == "BUNDLED_ADDON_PACKAGE"
+    for record in (certificate, bundle, AuditFlagBuilder.build_bundled_package_flag(bundle)):
+        assert not hasattr(record, "__dict__")
+
+    flag = AuditFlagBuilder.build_finance_certificate_flag(certificate)
+    assert (flag.type, flag.item, flag.deduction) == ("blue", "Finance Certificate", certificate.penalty_points)
@@ -0,0 +1,113 @@
+import json
+import shutil
+
+import pytest
+
+from App.services.rate_helper.rules_impact import build_impact_report, deal_needs_rescore, diff_rulesets, rescore_deal
+from App.services.rate_helper.scoring_engine import RULES_DIR, load_rules, score_parsed
+
+
+def _items(*pairs):
+    return [{"description": description, "amount": amount} for description, amount in pairs]
+
+
+DEALS = [
+    ("empty", {}),
+    ("ca_doc_fee", {"selling_price": 30000, "state": "CA", "normalized_pricing": {"msrp": 32000, "doc_fee": 85}}),
+    ("tx_doc_fee", {"selling_price": 30000, "state": "TX", "normalized_pricing": {"msrp": 32000, "doc_fee": 200}}),
+    ("gap_1100", {"selling_price": 40000, "normalized_pricing": {"msrp": 42000}, "line_items": _items(("GAP Insurance", "1100"))}),
+    ("gap_1400", {"selling_price": 40000, "normalized_pricing": {"msrp": 42000}, "line_items": _items(("GAP Insurance", "1400"))}),
+    ("loan_payment", {"monthly_payment": 500, "amount_financed": 24000, "apr": 0, "term": {"months": 48}}),
+    ("upstream_only", {"flags": [{"flag_id": "MARKET_ADJUSTMENT_DETECTED"}]}),
+    ("upstream_conflict_math_passes", {"monthly_payment": 500, "amount_financed": 24000, "apr": 0, "term": {"months": 48},
+                                       "flags": [{"flag_id": "PAYMENT_CONFLICT"}]}),
+]
+
+
+def _edited_rules(tmp_path, edit):
+    """load_rules() of a copy of the shipped rules with edit(name -> parsed json) applied."""
+    rules_dir = tmp_path / "rules"
+    shutil.copytree(RULES_DIR, rules_dir)
+    files = {path.stem: json.loads(path.read_text()) for path in rules_dir.glob("*.json")}
+    edit(files)
+    for name, data in files.items():
+        (rules_dir / f"{name}.json").write_text(json.dumps(data))
+    return load_rules(str(rules_dir))
+
+
+def _lower_gap_cap(files):
+    files["pricing_caps"]["gap_dca"]["cap_under_threshold"] = 1000.0
+
+
+def _raise_tx_doc_fee_cap(files):
+    files["doc_fee_state_rules"]["states"]["TX"]["cap"] = 150.0
+
+
+def _reweight_market_adjustment(files):
+    for flag in files["flag_registry"]["flags"]:
+        if flag["id"] == "MARKET_ADJUSTMENT_DETECTED":
+            flag["points"] = -5
+
+
+def _add_unconditional_section(files):
+    files["flag_rules"]["sections"].append(
+        {"name": "always", "rules": [{"id": "always_high_ltv", "flag": "HIGH_LTV_RISK"}]}
+    )
+
+
+def _full_rescore(old, new, mode):
+    sections = [section.name for section in new.flag_program.sections]
+    impacts = (rescore_deal(deal_id, parsed, old, new, sections, mode) for deal_id, parsed in DEALS)
+    return {
+        impact.deal_id: (impact.delta, impact.added_flags, impact.removed_flags)
+        for impact in impacts
+        if impact.delta or impact.added_flags or impact.removed_flags or impact.newly_suppressed
+    }
+
+
+@pytest.mark.parametrize("edit", [_lower_gap_cap, _raise_tx_doc_fee_cap, _reweight_market_adjustment, _add_unconditional_section])
+def test_incremental_rescore_matches_full_rescore(tmp_path, edit):
+    old = load_rules()
+    new = _edited_rules(tmp_path, edit)
+    report = build_impact_report(old, new, DEALS, mode="QUOTE")
+
+    incremental = {impact.deal_id: (impact.delta, impact.added_flags, impact.removed_flags) for impact in report.changed}
+    assert incremental == _full_rescore(old, new, "QUOTE")
+    assert incremental
+    assert report.screened_out + report.rescored == len(DEALS)
+
+
+@pytest.mark.parametrize("edit", [_lower_gap_cap, _add_unconditional_section])
+def test_rescore_matches_live_scoring(tmp_path, edit):
+    old = load_rules()
+    new = _edited_rules(tmp_path, edit)
+    dirty = [section.name for section in diff_rulesets(old, new).dirty_sections()]
+    for deal_id, parsed in DEALS:
+        impact = rescore_deal(deal_id, parsed, old, new, dirty, "QUOTE")
+        assert impact.old_score == score_parsed(parsed, "QUOTE", old).score_int, deal_id
+        assert impact.new_score == score_parsed(parsed, "QUOTE", new).score_int, deal_id
+
+
+def test_state_only_doc_fee_change_screens_other_deals(tmp_path):
+    old = load_rules()
+    report = build_impact_report(old, _edited_rules(tmp_path, _raise_tx_doc_fee_cap), DEALS, mode="QUOTE")
+    assert [impact.deal_id for impact in report.changed] == ["tx_doc_fee"]
+    assert report.rescored == 1
+
+
+def test_section_without_inputs_reaches_every_deal(tmp_path):
+    old = load_rules()
+    new = _edited_rules(tmp_path, _add_unconditional_section)
+    diff = diff_rulesets(old, new)
+    assert deal_needs_rescore({}, diff, "QUOTE") == (True, ["always"])
+
+    report = build_impact_report(old, new, DEALS, mode="QUOTE")
+    assert report.screened_out == 0
+    assert {impact.deal_id for impact in report.changed} == {deal_id for deal_id, _ in DEALS}
+    assert all(impact.added_flags == ["HIGH_LTV_RISK"] for impact in report.changed)
+
+
+def test_identical_rules_rescore_nothing():
+    report = build_impact_report(load_rules(), load_rules(), DEALS, mode="QUOTE")
+    assert report.screened_out == len(DEALS)
+    assert report.changed == []
@@ -0,0 +1,42 @@
+from App.services.rate_helper.score_response import output_flags, score_only_response
+from App.services.rate_helper.scoring_engine import flag_groups, score_parsed
+from App.services.rating.rating_schema import ScoreResponse
+
+DEAL = {
+    "dealer_name": "Sunrise Motors",
+    "selling_price": 30000,
+    "state": "CA",
+    "normalized_pricing": {"msrp": 32000, "doc_fee": 499},
+    "flags": [{"flag_id": "MARKET_ADJUSTMENT_DETECTED"}],
+    "line_items": [{"description": "Vehicle Service Contract", "amount": "1500"}],
+}
+
+
+def _badge(score: float) -> str:
+    return "Gold" if score >= 90 else "Red"
+
+
+def test_output_flags_adds_the_gap_review_flag():
+    result = score_parsed(DEAL, mode="QUOTE")
+    groups = output_flags(DEAL, result)
+    assert groups["red_flags"] == flag_groups(result)["red_flags"]
+    assert groups["blue_flags"][-1]["type"] == "Protection Review"
+
+    assert output_flags(DEAL, result, gap_review=False) == flag_groups(result)
+    with_gap = {**DEAL, "line_items": DEAL["line_items"] + [{"description": "GAP Insurance", "amount": "795"}]}
+    assert output_flags(with_gap, result) == flag_groups(result)
+
+
+def test_score_only_response_matches_the_full_path_flags():
+    result = score_parsed(DEAL, mode="QUOTE")
+    response = score_only_response(DEAL, "QUOTE", ScoreResponse, _badge, skipped_pages=[])
+    assert response.score == float(result.score_int)
+    assert response.badge == _badge(response.score)
+    assert response.dealer_name == "Sunrise Motors"
+    assert response.rules_hash == result.rules_hash
+    groups = output_flags(DEAL, result)
+    for key in ("red_flags", "green_flags", "blue_flags"):
+        assert [flag.model_dump() for flag in getattr(response, key)] == [
+            {"deduction": None, "bonus": None, **flag} for flag in groups[key]
+        ]
+    assert {"MARKET_ADJUSTMENT_DETECTED", "DOC_FEE_ABOVE_STATE_CAP"} <= {flag.type for flag in response.red_flags}
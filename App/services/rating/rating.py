@@ -1,11 +1,18 @@
 from App.services.rate_helper.ocr_normalizer import OCRNormalizer
-from App.services.rate_helper.ocr_normalization_schema import NormalizedLineItem
+from App.services.rate_helper.records import LineItemRecord
+from App.services.extraction.document_bundle import DocumentBundle, VisionImage, anthropic_source_block, ingest_uploads
+from App.services.extraction.image_preprocess import preprocess_bundle, vision_pages
+from App.services.extraction.image_quality import UnreadablePageError, check_bundle
+from App.services.extraction.page_dedupe import dedupe_bundle, merged_uploads
+from App.services.extraction.page_selection import select_pages
+from App.services.extraction.request_body import JsonBody
+from App.core.progress import EXTRACTING, INGESTING, NARRATIVE, SCORING, report_progress
+from App.core.deadline import DeadlineExceeded, NARRATIVE_SECONDS, TRANSLATION_SECONDS, budget_timeout, has_budget, remaining
 from App.services.rate_helper.discount_detector import DiscountDetector
 from App.services.rate_helper.discount_schema import DiscountLineItem, DiscountTotals
 from typing import List, Optional, Dict, Tuple
 import os
 import re
-import base64
 import json
 
 import requests
@@ -13,19 +20,16 @@ from dotenv import load_dotenv
 from fastapi import UploadFile
 from .rating_schema import (
     MultiImageAnalysisResponse, Flag, NormalizedPricing, 
-    APRData, TermData, TradeData, Narrative
+    APRData, TermData, TradeData, Narrative, ScoreResponse
 )
 from App.services.rate_helper.audit_classifier import AuditClassifier, AuditClassification
 from App.services.rate_helper.gap_logic import GAPLogic, GAPRecommendation
 from App.services.rate_helper.audit_flags import AuditFlagBuilder, AuditFlag
 from App.services.rate_helper.audit_summary import AuditSummary
 from App.services.rate_helper.json_to_parsed import convert_extracted_json_to_parsed
-from App.services.rate_helper.scoring_engine import (
-    load_rules,
-    build_active_flags,
-    compute_flags_from_parsed,
-    score_flags,
-)
+from App.services.rate_helper.narrative_templates import build_narrative, fill_narrative
+from App.services.rate_helper.scoring_engine import score_parsed, ANALYSIS_MODES
+from App.services.rate_helper.score_response import output_flags, score_only_response
 
 load_dotenv()
 
@@ -86,6 +90,9 @@ class MultiImageAnalyzer:
         """Translate flag text fields to the requested language (no scoring changes)."""
         if not language or language.lower() == "english":
             return flags
+        if not has_budget(TRANSLATION_SECONDS):
+            print(f"[deadline] {remaining():.0f}s left, flags stay untranslated")
+            return flags
 
         flags_payload = [
             {"type": f.type, "message": f.message, "item": f.item}
@@ -119,7 +126,7 @@ class MultiImageAnalyzer:
                 "temperature": 0.0,
                 "max_tokens": 1000
             }
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=120)
+            response = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(120))
             response.raise_for_status()
             parsed_translation = self._parse_api_response(response.json())
             translated_list = parsed_translation.get("flags", []) if isinstance(parsed_translation, dict) else []
@@ -482,31 +489,16 @@ Before returning JSON:
 - If selling_price seems too high (> $100k for normal vehicle), re-check extraction
 """
     
-    async def _validate_files(self, files: List[UploadFile]) -> List[UploadFile]:
-        """Validate uploaded files"""
-        validated = []
-        for file in files:
-            file_ext = os.path.splitext(file.filename)[1].lower()
-            if file_ext not in self.ALLOWED_EXTENSIONS:
-                raise ValueError(f"Invalid file type: {file.filename}")
-            contents = await file.read()
-            if len(contents) > self.MAX_FILE_SIZE:
-                raise ValueError(f"File too large: {file.filename}")
-            await file.seek(0)
-            validated.append(file)
-        return validated
-    
-    async def _convert_files_to_base64(self, files: List[UploadFile]) -> List[str]:
-        """Convert files to base64"""
-        base64_images = []
-        for file in files:
-            contents = await file.read()
-            base64_content = base64.b64encode(contents).decode('utf-8')
-            base64_images.append(base64_content)
-            await file.seek(0)
-        return base64_images
+    async def _ingest_files(self, files: List[UploadFile]) -> DocumentBundle:
+        """
+        Read each upload once (type/size checks, hash, MIME sniffing), reject
+        illegible photos as uploaded, then preprocess the images and merge retakes
+        """
+        documents = await ingest_uploads(files, self.MAX_FILE_SIZE, self.ALLOWED_EXTENSIONS)
+        await check_bundle(documents)
+        return await dedupe_bundle(await preprocess_bundle(documents))
     
-    def _normalize_line_items(self, line_items: List[Dict]) -> List[NormalizedLineItem]:
+    def _normalize_line_items(self, line_items: List[Dict]) -> List[LineItemRecord]:
         """
         Normalize OCR line items before scoring.
         
@@ -515,7 +507,7 @@ Before returning JSON:
                        Expected format: [{"description": "...", "amount": "..."}, ...]
         
         Returns:
-            List of normalized line items with proper classification
+            List of normalized line item records with proper classification
         """
         normalized = []
         for item in line_items:
@@ -523,7 +515,7 @@ Before returning JSON:
             amount_raw = str(item.get("amount", "0"))
             
             if raw_text:  # Only process if we have text
-                normalized_item = self.ocr_normalizer.normalize_line_item(
+                normalized_item = self.ocr_normalizer.normalize_line_item_record(
                     raw_text=raw_text,
                     amount_raw=amount_raw
                 )
@@ -531,7 +523,7 @@ Before returning JSON:
         
         return normalized
     
-    def _call_openai_api(self, base64_images: List[str], language: str = "English") -> dict:
+    def _call_openai_api(self, base64_images: List[VisionImage], language: str = "English") -> dict:
         """Call Claude Messages API with contract documents (with retry logic)"""
         headers = {
             "x-api-key": self.api_key or "",
@@ -582,14 +574,7 @@ Return ONLY valid JSON matching the exact schema. No markdown, no explanation.
 
         if base64_images:
             for base64_image in base64_images:
-                user_content.append({
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": base64_image
-                    }
-                })
+                user_content.append(anthropic_source_block(base64_image))
 
         system_text = f"""!!!CRITICAL - LANGUAGE REQUIREMENT - HIGHEST PRIORITY!!!
 
@@ -636,8 +621,8 @@ Write fluently and naturally in {language}. This overrides all other instruction
                 response = requests.post(
                     self.api_url,
                     headers=headers,
-                    json=payload,
-                    timeout=self.API_TIMEOUT
+                    data=JsonBody(payload),
+                    timeout=budget_timeout(self.API_TIMEOUT)
                 )
                 response.raise_for_status()
                 print(f"API call successful on attempt {attempt + 1}")
@@ -656,8 +641,11 @@ Write fluently and naturally in {language}. This overrides all other instruction
 
         raise RuntimeError(f"Claude API failed after {self.MAX_RETRIES} attempts: {str(last_error)}")
 
-    def _call_openai_api_chunked(self, base64_images: List[str], language: str = "English") -> dict:
-        """Call Claude Messages API in smaller batches to reduce JSON errors."""
+    def _call_openai_api_chunked(self, base64_images: List[VisionImage], language: str = "English", single_call: bool = False) -> dict:
+        """Call Claude Messages API in smaller batches to reduce JSON errors.
+
+        single_call asks for the core fields and the line items in one request (score-only mode).
+        """
         headers = {
             "x-api-key": self.api_key or "",
             "anthropic-version": "2023-06-01",
@@ -725,14 +713,7 @@ Rules:
         def _post_prompt(prompt_text: str, max_tokens: int) -> dict:
             user_content = [{"type": "text", "text": prompt_text}]
             for base64_image in base64_images or []:
-                user_content.append({
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": base64_image
-                    }
-                })
+                user_content.append(anthropic_source_block(base64_image))
             payload = {
                 "model": self.model,
                 "system": system_text,
@@ -740,10 +721,20 @@ Rules:
                 "temperature": 0.0,
                 "max_tokens": max_tokens
             }
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=self.API_TIMEOUT)
+            response = requests.post(self.api_url, headers=headers, data=JsonBody(payload), timeout=budget_timeout(self.API_TIMEOUT))
             response.raise_for_status()
             return response.json()
 
+        if single_call:
+            # One request for both field sets
+            combined_prompt = core_prompt.replace(
+                "- Do NOT include flags, narrative, or line_items.",
+                '- Also include "line_items": [{"description": "", "amount": ""}] with ALL line items '
+                "(description exact text from the document, amount numeric without $ or commas).\n"
+                "- Do NOT include flags or narrative.",
+            )
+            return self._parse_api_response_strict(_post_prompt(combined_prompt, max_tokens=3400))
+
         core_response = _post_prompt(core_prompt, max_tokens=1400)
         core = self._parse_api_response_strict(core_response)
 
@@ -782,6 +773,9 @@ Rules:
         trade_data: Optional[TradeData],
         language: str
     ) -> Dict[str, str]:
+        if not has_budget(NARRATIVE_SECONDS):
+            print(f"[deadline] {remaining():.0f}s left, keeping the deterministic narrative")
+            return {}
         headers = {
             "x-api-key": self.api_key or "",
             "anthropic-version": "2023-06-01",
@@ -846,7 +840,7 @@ Rules:
                 "temperature": 0.2,
                 "max_tokens": max_tokens
             }
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=self.API_TIMEOUT)
+            response = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(self.API_TIMEOUT))
             response.raise_for_status()
             response_json = response.json()
             if "content" in response_json and isinstance(response_json["content"], list):
@@ -896,158 +890,6 @@ Rules:
             print(f"[DEBUG] Narrative batch call failed: {str(e)}")
         return result
 
-    def _build_narrative_from_parsed(
-        self,
-        parsed: dict,
-        score: float,
-        red_flags: List[Flag],
-        green_flags: List[Flag],
-        blue_flags: List[Flag],
-        trade_data: Optional[TradeData]
-    ) -> Dict[str, str]:
-        pricing = parsed.get("normalized_pricing", {}) if isinstance(parsed.get("normalized_pricing"), dict) else {}
-        apr_data = parsed.get("apr", {}) if isinstance(parsed.get("apr"), dict) else {}
-        term_data = parsed.get("term", {}) if isinstance(parsed.get("term"), dict) else {}
-
-        def _coerce_float(value) -> Optional[float]:
-            try:
-                if value is None or value == "":
-                    return None
-                return float(str(value).replace(",", "").replace("$", ""))
-            except (ValueError, TypeError):
-                return None
-
-        def _money(value) -> Optional[str]:
-            num = _coerce_float(value)
-            if num is None:
-                return None
-            return f"${num:,.2f}"
-
-        selling_price = parsed.get("selling_price") or pricing.get("selling_price")
-        msrp = pricing.get("msrp")
-        amount_financed = pricing.get("amount_financed")
-        apr_rate = apr_data.get("rate") or apr_data.get("listed")
-        term_months = term_data.get("months")
-
-        line_items = parsed.get("line_items", []) if isinstance(parsed.get("line_items"), list) else []
-        item_texts = []
-        for item in line_items[:8]:
-            if not isinstance(item, dict):
-                continue
-            desc = item.get("description") or item.get("item") or item.get("name") or ""
-            amount = item.get("amount")
-            if desc:
-                if amount is None or amount == "":
-                    item_texts.append(desc)
-                else:
-                    item_texts.append(f"{desc} ({amount})")
-
-        def _has_keyword(words: List[str]) -> bool:
-            for item in line_items:
-                if not isinstance(item, dict):
-                    continue
-                desc = str(item.get("description") or item.get("item") or item.get("name") or "").lower()
-                for w in words:
-                    if w in desc:
-                        return True
-            return False
-
-        doc_fee = None
-        for item in line_items:
-            if not isinstance(item, dict):
-                continue
-            desc = str(item.get("description") or item.get("item") or item.get("name") or "").lower()
-            if "doc fee" in desc or "documentation" in desc or "documentary" in desc:
-                doc_fee = _money(item.get("amount"))
-                if doc_fee:
-                    break
-
-        red_count = sum(1 for f in red_flags if f.deduction is not None)
-        green_count = sum(1 for f in green_flags if f.bonus is not None)
-
-        score_lines = ["Start at 100."]
-        for f in red_flags:
-            if f.deduction is not None:
-                score_lines.append(f"-{f.deduction} {f.item}: {f.message}")
-        for f in green_flags:
-            if f.bonus is not None:
-                score_lines.append(f"+{f.bonus} {f.item}: {f.message}")
-        score_lines.append(f"Final Score: {score:.1f}")
-
-        vehicle_overview = f"Deal analysis for {parsed.get('dealer_name', 'this dealer')}."
-        if parsed.get("vin_number"):
-            vehicle_overview += f" VIN: {parsed.get('vin_number')}."
-        if selling_price is not None:
-            vehicle_overview += f" Selling price: {_money(selling_price) or selling_price}."
-
-        smartbuyer_score_summary = f"SmartBuyer Score: {score:.1f}/100."
-        smartbuyer_score_summary += f" Red flags: {red_count}, green flags: {green_count}."
-
-        score_breakdown = "\n".join(score_lines)
-
-        if msrp is not None and selling_price is not None:
-            msrp_f = _coerce_float(msrp)
-            sp_f = _coerce_float(selling_price)
-            if msrp_f and sp_f:
-                diff_pct = ((sp_f - msrp_f) / msrp_f) * 100
-                market_comparison = (
-                    f"Selling price {_money(sp_f)} vs MSRP {_money(msrp_f)} "
-                    f"({diff_pct:+.1f}% vs MSRP)."
-                )
-            else:
-                market_comparison = "MSRP comparison available but could not be normalized."
-        elif selling_price is not None:
-            market_comparison = "MSRP not found; market comparison is limited."
-        else:
-            market_comparison = "Pricing fields not found; market comparison is limited."
-
-        gap_logic = "GAP coverage not found in line items." if not _has_keyword(["gap"]) else "GAP coverage appears in the line items."
-        vsc_logic = (
-            "VSC or service contract not found in line items."
-            if not _has_keyword(["vsc", "service contract", "warranty", "extended"]) else
-            "VSC or warranty appears in the line items."
-        )
-        if doc_fee:
-            vsc_logic += f" Doc fee noted at {doc_fee}."
-
-        if apr_rate is not None:
-            apr_bonus_rule = f"APR listed at {apr_rate}%."
-        else:
-            apr_bonus_rule = "APR not found in the document."
-
-        lease_audit = "N/A - Purchase Agreement"
-        if str(parsed.get("quote_type", "")).lower().find("lease") >= 0:
-            lease_audit = "Lease detected; review money factor, residual, and cap cost."
-
-        trade_text = trade_data.status if trade_data else "No trade identified"
-
-        negotiation_insight = "Review itemized add-ons and fees."
-        if item_texts:
-            negotiation_insight = "Review these line items: " + "; ".join(item_texts[:5]) + "."
-
-        if score >= 90:
-            final_recommendation = "Strong score. Verify itemized fees and add-ons before signing."
-        elif score >= 80:
-            final_recommendation = "Good overall. Negotiate flagged items and verify fees."
-        elif score >= 70:
-            final_recommendation = "Mixed deal. Focus on lowering add-ons and fees."
-        else:
-            final_recommendation = "High risk. Proceed cautiously and verify all charges."
-
-        return {
-            "vehicle_overview": vehicle_overview,
-            "smartbuyer_score_summary": smartbuyer_score_summary,
-            "score_breakdown": score_breakdown,
-            "market_comparison": market_comparison,
-            "gap_logic": gap_logic,
-            "vsc_logic": vsc_logic,
-            "apr_bonus_rule": apr_bonus_rule,
-            "lease_audit": lease_audit,
-            "trade": trade_text,
-            "negotiation_insight": negotiation_insight,
-            "final_recommendation": final_recommendation,
-        }
-
     def _build_narrative(
         self,
         parsed: dict,
@@ -1058,8 +900,9 @@ Rules:
         trade_data: Optional[TradeData],
         language: str
     ) -> Tuple[Dict[str, str], str]:
-        base_narrative = self._build_narrative_from_parsed(parsed, score, red_flags, green_flags, blue_flags, trade_data)
-        buyer_msg = f"Your SmartBuyer score is {score:.1f}/100 — review the flags above."
+        base_narrative, buyer_msg = build_narrative(
+            parsed, score, red_flags, green_flags, blue_flags, trade_data.status if trade_data else None, kind="quote"
+        )
 
         ai_lines = self._call_narrative_sections_kv(parsed, score, red_flags, green_flags, blue_flags, trade_data, language)
         if ai_lines:
@@ -1336,7 +1179,7 @@ Rules:
                 "temperature": 0.0,
                 "max_tokens": 2000
             }
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=self.API_TIMEOUT)
+            response = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(self.API_TIMEOUT))
             response.raise_for_status()
             response_json = response.json()
             if "content" in response_json and isinstance(response_json["content"], list):
@@ -1356,6 +1199,13 @@ Rules:
     
     def _call_narrative_api(self, parsed: dict, score: float, red_flags: list, green_flags: list, blue_flags: list, language: str) -> dict:
         """Call Claude to generate narrative sections from the full parsed data and final flags."""
+        if not has_budget(NARRATIVE_SECONDS):
+            print(f"[deadline] {remaining():.0f}s left, building the narrative from the parsed data")
+            trade_data = self._extract_trade_data(parsed)
+            narrative, buyer_message = build_narrative(
+                parsed, score, red_flags, green_flags, blue_flags, trade_data.status if trade_data else None, kind="quote"
+            )
+            return {"narrative": narrative, "buyer_message": buyer_message}
         flags_payload = {
             "red_flags": [{"type": f.type, "message": f.message, "item": f.item, "deduction": f.deduction} for f in red_flags],
             "green_flags": [{"type": f.type, "message": f.message, "item": f.item, "bonus": f.bonus} for f in green_flags],
@@ -1413,7 +1263,7 @@ Return ONLY a JSON object with exactly these keys:
             "max_tokens": 2000
         }
         try:
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=self.API_TIMEOUT)
+            response = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(self.API_TIMEOUT))
             response.raise_for_status()
             raw = self._parse_api_response(response.json())
             return raw
@@ -1478,55 +1328,18 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
         for attempt in range(self.MAX_RETRIES):
             try:
                 print(f"JSON full-analysis API call attempt {attempt + 1}/{self.MAX_RETRIES}...")
-                resp = requests.post(self.api_url, headers=headers, json=payload, timeout=self.API_TIMEOUT)
+                resp = requests.post(self.api_url, headers=headers, json=payload, timeout=budget_timeout(self.API_TIMEOUT))
                 resp.raise_for_status()
                 print("JSON full-analysis API call successful.")
                 return resp.json()
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 last_error = e
                 if attempt < self.MAX_RETRIES - 1:
                     import time; time.sleep(2)
         raise RuntimeError(f"JSON analysis API failed after {self.MAX_RETRIES} attempts: {last_error}")
     
-    async def _optimize_images(self, files: List[UploadFile]) -> List[UploadFile]:
-        """Optimize images before encoding (optional enhancement)"""
-        from PIL import Image
-        import io
-        
-        optimized = []
-        for file in files:
-            try:
-                # Read image
-                contents = await file.read()
-                image = Image.open(io.BytesIO(contents))
-                
-                # Resize if too large (max 2048px on longest side)
-                max_dimension = 2048
-                if max(image.size) > max_dimension:
-                    ratio = max_dimension / max(image.size)
-                    new_size = tuple(int(dim * ratio) for dim in image.size)
-                    image = image.resize(new_size, Image.Resampling.LANCZOS)
-                
-                # Convert to JPEG with compression
-                output = io.BytesIO()
-                image.convert('RGB').save(output, format='JPEG', quality=85, optimize=True)
-                output.seek(0)
-                
-                # Create new UploadFile from optimized bytes
-                from fastapi import UploadFile
-                optimized_file = UploadFile(
-                    filename=file.filename,
-                    file=output
-                )
-                optimized.append(optimized_file)
-                
-            except Exception as e:
-                # If optimization fails, use original
-                await file.seek(0)
-                optimized.append(file)
-        
-        return optimized
-    
     def _extract_trade_data(self, parsed: dict) -> TradeData:
         """
         Extract trade data using simple keyword detection from OCR text.
@@ -1746,8 +1559,19 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
             status=trade_status
         )
 
-    async def analyze_images(self, files: List[UploadFile] = None, language: str = "English", base64_images: List[str] = None, parsed_data: dict = None) -> MultiImageAnalysisResponse:
-        """Main analysis entry point. Accepts files, base64_images, or pre-extracted parsed_data dict."""
+    async def analyze_images(self, files: List[UploadFile] = None, language: str = "English", base64_images: List[str] = None, parsed_data: dict = None, mode: str = "full") -> MultiImageAnalysisResponse:
+        """Main analysis entry point. Accepts files, base64_images, or pre-extracted parsed_data dict.
+
+        mode="score_only" returns a ScoreResponse: score, badge and flags from the rules
+        engine, with no narrative or translation calls. mode="template" returns the full
+        response with the template narrative (English, untranslated flags, no model call
+        after extraction).
+        """
+        if mode not in ANALYSIS_MODES:
+            raise ValueError(f"Invalid mode: {mode} (expected one of {', '.join(ANALYSIS_MODES)})")
+        score_only = mode == "score_only"
+        template = mode == "template"
+        skipped_pages: List[dict] = []
         try:
             if parsed_data is not None:
                 # Always run through converter for consistent structure
@@ -1757,7 +1581,11 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
                 # Route to AI ONLY when no pre-existing flags are supplied.
                 # If the caller already provided red/green/blue flags, their deductions/bonuses
                 # ARE the authoritative score — use Python math, never AI re-scoring.
-                should_use_ai = not parsed.get("has_precomputed_flags", False)
+                should_use_ai = not score_only and not template and not parsed.get("has_precomputed_flags", False)
+                if should_use_ai and not has_budget(NARRATIVE_SECONDS):
+                    # The AI pass only adds narrative and flag wording; scoring is deterministic either way
+                    print(f"[deadline] {remaining():.0f}s left, skipping the AI analysis pass")
+                    should_use_ai = False
                 if should_use_ai:
                     print("JSON path: calling AI for full prompt-based analysis...")
                     # ── Save FULL converter output before AI overwrites parsed ──
@@ -1802,78 +1630,39 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
                     ai_result["has_precomputed_flags"] = True
                     parsed = ai_result
             elif base64_images is None:
-                validated_files = await self._validate_files(files)
-                if not validated_files:
+                report_progress(INGESTING)
+                documents = await self._ingest_files(files)
+                if not len(documents):
                     raise ValueError("No valid image files provided")
                 
-                # Optional: Optimize images before base64 encoding
-                # optimized_files = await self._optimize_images(validated_files)
-                # base64_images = await self._convert_files_to_base64(optimized_files)
-                
-                base64_images = await self._convert_files_to_base64(validated_files)
-                api_response = self._call_openai_api_chunked(base64_images, language=language)
+                selection = await select_pages(documents)
+                skipped_pages = merged_uploads(documents) + selection.skipped_pages()
+                report_progress(EXTRACTING)
+                # Documents, not base64 strings: each page is encoded only while the request body is sent
+                base64_images = list(await vision_pages(selection.bundle))
+                api_response = self._call_openai_api_chunked(base64_images, language=language, single_call=score_only or template)
                 parsed = api_response
             else:
                 base64_images = [img.split(",", 1)[1] if img.startswith("data:") and "," in img else img for img in base64_images]
-                api_response = self._call_openai_api_chunked(base64_images, language=language)
+                api_response = self._call_openai_api_chunked(base64_images, language=language, single_call=score_only or template)
                 parsed = api_response
+
+            if score_only:
+                return score_only_response(parsed, "QUOTE", ScoreResponse, self._assign_badge, skipped_pages)
             
+            report_progress(SCORING)
             # --- SmartBuyer scoring engine (rules-driven) ---
-            rules = load_rules()
-            upstream_flags = build_active_flags(parsed.get("flags", []), rules.flag_registry, "upstream")
-            computed_flags = compute_flags_from_parsed(parsed, rules, mode="QUOTE")
-            all_flags = upstream_flags + computed_flags
-
-            scoring_result = score_flags(
-                all_flags,
-                rules,
-                parsed.get("audit_status", "COMPLETE")
-            )
-
-            def _to_output_flag(active_flag: "ActiveFlag") -> Flag:
-                deduction = None
-                bonus = None
-                if active_flag.points < 0:
-                    deduction = int(round(abs(active_flag.adjusted_points)))
-                elif active_flag.points > 0:
-                    bonus = int(round(abs(active_flag.points)))
-                return Flag(
-                    type=active_flag.flag_id,
-                    message=active_flag.message,
-                    item=active_flag.group,
-                    deduction=deduction,
-                    bonus=bonus
-                )
-
-            red_flags: List[Flag] = []
-            green_flags: List[Flag] = []
-            blue_flags: List[Flag] = []
-            for active_flag in scoring_result.flags:
-                if active_flag.suppressed or active_flag.group == "SYSTEM":
-                    continue
-                flag_obj = _to_output_flag(active_flag)
-                if active_flag.group == "POSITIVE":
-                    green_flags.append(flag_obj)
-                elif active_flag.group == "DEALER_CONDUCT":
-                    red_flags.append(flag_obj)
-                else:
-                    blue_flags.append(flag_obj)
-
-            # Manually inject the GAP blue flag if GAP is missing from line items
-            has_gap = False
-            for item in parsed.get("line_items", []):
-                if isinstance(item, dict):
-                    desc = str(item.get("description") or item.get("item") or "").lower()
-                    if "gap" in desc.split() or "guaranteed asset" in desc or "debt cancellation" in desc:
-                        has_gap = True
-                        break
-            if not has_gap:
-                blue_flags.append(Flag(type="Protection Review", message="GAP not shown on quote — ask before finalizing", item="GAP"))
-
-
-            red_flags = self._translate_flags(red_flags, language)
-            green_flags = self._translate_flags(green_flags, language)
-            blue_flags = self._translate_flags(blue_flags, language)
+            scoring_result = score_parsed(parsed, mode="QUOTE")
+            groups = output_flags(parsed, scoring_result)
+            red_flags = [Flag(**flag) for flag in groups["red_flags"]]
+            green_flags = [Flag(**flag) for flag in groups["green_flags"]]
+            blue_flags = [Flag(**flag) for flag in groups["blue_flags"]]
+
+            report_progress(NARRATIVE)
+            if not template:
+                red_flags = self._translate_flags(red_flags, language)
+                green_flags = self._translate_flags(green_flags, language)
+                blue_flags = self._translate_flags(blue_flags, language)
 
             if not red_flags:
                 red_flags.append(Flag(type="General", message="No major issues identified — verify all terms and pricing before finalizing.", item="General"))
@@ -1885,7 +1674,11 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
             score_value = float(scoring_result.score_int)
             trade_data = self._extract_trade_data(parsed)
 
-            if not parsed.get("_ai_narrative_done"):
+            if template:
+                narrative_obj, buyer_msg = build_narrative(
+                    parsed, score_value, red_flags, green_flags, blue_flags, trade_data.status if trade_data else None, kind="quote"
+                )
+            elif not parsed.get("_ai_narrative_done"):
                 narrative_obj, buyer_msg = self._build_narrative(
                     parsed,
                     score_value,
@@ -1896,11 +1689,15 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
                     language,
                 )
             else:
-                narrative_obj = parsed.get("narrative", {}) if isinstance(parsed.get("narrative"), dict) else {}
-                buyer_msg = parsed.get("buyer_message") or f"Your SmartBuyer score is {score_value}/100 — review the flags above."
+                narrative_obj = dict(parsed["narrative"]) if isinstance(parsed.get("narrative"), dict) else {}
+                if "trust_score_summary" in narrative_obj and "smartbuyer_score_summary" not in narrative_obj:
+                    narrative_obj["smartbuyer_score_summary"] = narrative_obj.pop("trust_score_summary")
+                template_obj, template_msg = build_narrative(
+                    parsed, score_value, red_flags, green_flags, blue_flags, trade_data.status if trade_data else None, kind="quote"
+                )
+                fill_narrative(narrative_obj, template_obj)
+                buyer_msg = parsed.get("buyer_message") or template_msg
 
-            if "trust_score_summary" in narrative_obj and "smartbuyer_score_summary" not in narrative_obj:
-                narrative_obj["smartbuyer_score_summary"] = narrative_obj.pop("trust_score_summary")
             narrative = Narrative(**narrative_obj)
 
             return MultiImageAnalysisResponse(
@@ -1932,7 +1729,8 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
                     status=(trade_data.status if trade_data else "No trade identified")
                 ),
                 bundle_abuse=parsed.get("bundle_abuse", {"active": False, "deduction": 0}),
-                narrative=narrative
+                narrative=narrative,
+                skipped_pages=skipped_pages
             )
 
             # Step 1: OCR Normalization
@@ -2451,5 +2249,7 @@ Return ONLY valid JSON matching the exact output schema. No markdown, no explana
                 bundle_abuse=parsed.get("bundle_abuse", {"active": False, "deduction": 0}),
                 narrative=narrative
             )
+        except UnreadablePageError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Contract analysis failed: {str(e)}")
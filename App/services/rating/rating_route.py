@@ -1,49 +1,79 @@
 from fastapi import APIRouter, HTTPException, File, UploadFile, Form
-from typing import List
-from .rating_schema import MultiImageAnalysisResponse, RatingJsonRequest
+from typing import List, Union
+from .rating_schema import MultiImageAnalysisResponse, RatingJsonRequest, ScoreResponse
 from .rating import MultiImageAnalyzer
+from App.services.rate_helper.flag_rules import flag_rule_stats
 
 router = APIRouter(prefix="/api", tags=["Rating"])
 analyzer = MultiImageAnalyzer()
 
 
-@router.post("/rating", response_model=MultiImageAnalysisResponse)
+@router.post("/rating", response_model=Union[MultiImageAnalysisResponse, ScoreResponse])
 async def analyze_rating_upload(
     files: List[UploadFile] = File(
         ...,
         description="Upload image files (jpg, png, gif, bmp, webp, pdf, tiff)"
     ),
-    language: str = Form(default="English", description="Language for narrative parts")
+    language: str = Form(default="English", description="Language for narrative parts"),
+    mode: str = Form(default="full", description="full, template for a template narrative without model calls, or score_only for score, badge and flags only")
 ):
     """
     Analyze multiple contract image files (file upload) and provide a comprehensive rating.
 
     - **files**: Multiple image files (jpg, png, gif, bmp, webp, pdf, tiff) — up to 10MB per file
     - **language**: Language for narrative parts (default: English)
+    - **mode**: `score_only` skips narrative and translation (one extraction call); `template` also skips them but returns the full response with a template narrative (English)
     """
     try:
-        result = await analyzer.analyze_images(files, language=language)
+        result = await analyzer.analyze_images(files, language=language, mode=mode)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        error_msg = str(e)
+        if "timeout" in error_msg.lower():
+            raise HTTPException(status_code=504, detail=f"Analysis timeout: {error_msg}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {error_msg}")
 
 
-@router.post("/rating/json", response_model=MultiImageAnalysisResponse)
+@router.post("/rating/json", response_model=Union[MultiImageAnalysisResponse, ScoreResponse])
 async def analyze_rating_json(request: RatingJsonRequest):
     """
     Analyze contract via JSON body.
 
     - **data**: Pre-extracted JSON data dict for rating analysis
     - **language**: Language for narrative parts (default: English)
+    - **mode**: `template` (full response, template narrative in English) and `score_only` skip every model call
     """
     try:
-        result = await analyzer.analyze_images(language=request.language, parsed_data=request.data)
+        result = await analyzer.analyze_images(language=request.language, parsed_data=request.data, mode=request.mode)
         return result
     except HTTPException:
         raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        error_msg = str(e)
+        if "timeout" in error_msg.lower():
+            raise HTTPException(status_code=504, detail=f"Analysis timeout: {error_msg}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {error_msg}")
+
+
+@router.get("/rating/rule_stats")
+async def rule_stats():
+    """Per-rule evaluation counters and timings of the compiled flag rules, keyed by rules_hash."""
+    return {"programs": flag_rule_stats()}
+
+
+@router.post("/rating/score", response_model=ScoreResponse)
+async def score_rating_json(request: RatingJsonRequest):
+    """
+    Score pre-extracted contract JSON with the rules engine only: score, badge and flags,
+    no model calls. `language` and `mode` are ignored.
+    """
+    try:
+        return await analyzer.analyze_images(parsed_data=request.data, mode="score_only")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Scoring failed: {str(e)}")
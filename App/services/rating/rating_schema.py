@@ -53,6 +53,12 @@ class Narrative(BaseModel):
 class RatingJsonRequest(BaseModel):
     data: dict = Field(..., description="Pre-extracted JSON data for rating analysis")
     language: str = Field(default="English", description="Language for narrative parts")
+    mode: str = Field(default="full", description="full, template for a template narrative without model calls, or score_only for score, badge and flags only")
+
+class SkippedPage(BaseModel):
+    filename: str
+    page: Optional[int] = None
+    reason: str
 
 class MultiImageAnalysisResponse(BaseModel):
     score: float = Field(..., description="Overall score 0-95")
@@ -80,3 +86,19 @@ class MultiImageAnalysisResponse(BaseModel):
     quote_type: str = "Audit"
     bundle_abuse: dict = Field(default_factory=dict)
     narrative: Narrative
+    skipped_pages: List[SkippedPage] = Field(default_factory=list)
+
+class ScoreResponse(BaseModel):
+    """mode=score_only: SmartBuyer score, badge and flags without narrative or translation."""
+    mode: str = "score_only"
+    score: float = Field(..., description="Overall score 0-95")
+    badge: str = Field(..., description="Gold|Silver|Bronze|Red")
+    dealer_name: Optional[str] = None
+    vin_number: Optional[str] = None
+    selling_price: Optional[float] = None
+    red_flags: List[Flag] = Field(default_factory=list)
+    green_flags: List[Flag] = Field(default_factory=list)
+    blue_flags: List[Flag] = Field(default_factory=list)
+    skipped_pages: List[SkippedPage] = Field(default_factory=list)
+    rules_hash: str = Field(..., description="Version of the scoring rules that produced the score")
+    audit_status: str
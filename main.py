@@ -1,6 +1,7 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
@@ -12,6 +13,9 @@ from App.services.chatbot.chatbot_routes import router as chatbot_router
 from App.services.quiz.quiz_routes import router as quiz_router
 from App.services.contract.multi_image_analysis_route import router as contract_router
 from App.services.lease.lease_analysis_route import router as lease_router
+from App.services.jobs.jobs_route import router as jobs_router, manager as jobs_manager
+from App.core.admission import AdmissionMiddleware
+from App.core.deadline import DeadlineMiddleware
 from App.services.rate_helper.discount_schema import DiscountLineItem, DiscountTotals
 from typing import List, Optional, Dict
 from fastapi import UploadFile
@@ -28,9 +32,18 @@ from App.services.contract.multi_image_analysis_schema import (
 )
 from App.services.rate_helper.audit_classifier import AuditClassifier, AuditClassification
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop the background job workers; jobs cut off here are reported as interrupted after restart
+    await jobs_manager.shutdown()
+
+
 app = FastAPI(
     title="Document-AI FastAPI", 
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -95,6 +108,12 @@ app.include_router(chatbot_router)
 app.include_router(quiz_router)
 app.include_router(contract_router)
 app.include_router(lease_router)
+app.include_router(jobs_router)
+
+# Per-route concurrency caps and early 503s under load; added before CORS so rejections carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+# Request deadline from X-Request-Timeout; outside admission so time spent queued counts against it
+app.add_middleware(DeadlineMiddleware)
 
 # Add CORS middleware if needed
 app.add_middleware(